@@ -0,0 +1,267 @@
+"""
+Двухуровневый кеш: небольшой LRU в памяти процесса перед общим
+бэкендом (файловым, базой данных или сетевым), защита от «лавины»
+пересчётов и счётчики попаданий по префиксам ключей.
+
+Локальный уровень используется только для ключей с префиксами из
+LOCAL_PREFIXES. Туда стоит относить версионированные ключи, значение
+которых под данным ключом никогда не меняется (карточки постов,
+страницы лент с поколением в ключе): тогда локальные копии в разных
+процессах не могут устареть. Изменяемые значения, например счётчики
+поколений, читаются только из общего уровня.
+
+Счётчики поколений и версий меняются через incr, поэтому он должен
+быть атомарным между процессами. У memcached и Redis incr атомарен
+сам по себе. Для остальных бэкендов (файлового, базы данных) incr -
+это get и set, и TwoTierCache выполняет его под эксклюзивной
+блокировкой файла INCR_LOCK_FILE. Для файлового кеша файл по
+умолчанию лежит в его каталоге; для прочих неатомарных бэкендов
+параметр обязателен.
+"""
+import os
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.cache.backends.memcached import BaseMemcachedCache
+from django.core.cache.backends.redis import RedisCache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files import locks
+
+from .metrics import record_cache
+
+# Бэкенды с атомарным incr. LocMemCache атомарен внутри процесса, а
+# другим процессам его значения всё равно не видны.
+ATOMIC_INCR_BACKENDS = (BaseMemcachedCache, RedisCache, LocMemCache)
+
+_metrics = defaultdict(Counter)
+_metrics_lock = threading.Lock()
+
+
+def key_prefix(key):
+    return key.split(':', 1)[0]
+
+
+def record(key, event, count=1):
+    """Учитывает событие кеша (hit, miss, stale...) для префикса ключа."""
+    with _metrics_lock:
+        _metrics[key_prefix(key)][event] += count
+    record_cache(event, count)
+
+
+def stats():
+    """Снимок счётчиков кеша текущего процесса: {префикс: {событие: n}}."""
+    with _metrics_lock:
+        return {prefix: dict(events) for prefix, events in _metrics.items()}
+
+
+def reset_stats():
+    with _metrics_lock:
+        _metrics.clear()
+
+
+class TwoTierCache(BaseCache):
+    """
+    Бэкенд кеша Django. Параметры OPTIONS:
+    SHARED - алиас общего кеша из CACHES;
+    LOCAL_PREFIXES - префиксы ключей, копируемых в локальный уровень;
+    LOCAL_MAX_ENTRIES, LOCAL_TIMEOUT - размер и время жизни локального
+    уровня;
+    INCR_LOCK_FILE - файл блокировки для incr (см. описание модуля).
+    """
+
+    def __init__(self, name, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._shared_alias = options['SHARED']
+        self._local_prefixes = tuple(options.get('LOCAL_PREFIXES', ()))
+        self._incr_lock_file = options.get('INCR_LOCK_FILE')
+        self._local = LocMemCache(f'two-tier:{name}', {
+            'TIMEOUT': options.get('LOCAL_TIMEOUT', 300),
+            'OPTIONS': {
+                'MAX_ENTRIES': options.get('LOCAL_MAX_ENTRIES', 1000),
+                'CULL_FREQUENCY': 10,
+            },
+        })
+
+    @property
+    def shared(self):
+        return caches[self._shared_alias]
+
+    def _is_local(self, key):
+        return key.startswith(self._local_prefixes)
+
+    def _local_timeout(self, timeout):
+        if timeout is DEFAULT_TIMEOUT or timeout is None:
+            return DEFAULT_TIMEOUT
+        return min(timeout, self._local.default_timeout)
+
+    def get(self, key, default=None, version=None):
+        if self._is_local(key):
+            value = self._local.get(key, self, version=version)
+            if value is not self:
+                record(key, 'local_hit')
+                return value
+        value = self.shared.get(key, self, version=version)
+        if value is self:
+            record(key, 'miss')
+            return default
+        record(key, 'hit')
+        if self._is_local(key):
+            self._local.set(key, value, version=version)
+        return value
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        found = {}
+        local_keys = [key for key in keys if self._is_local(key)]
+        if local_keys:
+            found = self._local.get_many(local_keys, version=version)
+            for key in found:
+                record(key, 'local_hit')
+        rest = [key for key in keys if key not in found]
+        shared = self.shared.get_many(rest, version=version)
+        for key in rest:
+            record(key, 'hit' if key in shared else 'miss')
+        local = {
+            key: value for key, value in shared.items()
+            if self._is_local(key)
+        }
+        if local:
+            self._local.set_many(local, version=version)
+        found.update(shared)
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.shared.set(key, value, timeout, version=version)
+        if self._is_local(key):
+            self._local.set(
+                key, value, self._local_timeout(timeout), version=version
+            )
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        failed = self.shared.set_many(data, timeout, version=version)
+        local = {
+            key: value for key, value in data.items()
+            if self._is_local(key) and key not in failed
+        }
+        if local:
+            self._local.set_many(
+                local, self._local_timeout(timeout), version=version
+            )
+        return failed
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        added = self.shared.add(key, value, timeout, version=version)
+        if added and self._is_local(key):
+            self._local.set(
+                key, value, self._local_timeout(timeout), version=version
+            )
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.shared.touch(key, timeout, version=version)
+
+    def delete(self, key, version=None):
+        self._local.delete(key, version=version)
+        return self.shared.delete(key, version=version)
+
+    def delete_many(self, keys, version=None):
+        keys = list(keys)
+        self._local.delete_many(keys, version=version)
+        self.shared.delete_many(keys, version=version)
+
+    def has_key(self, key, version=None):
+        return self.get(key, self, version=version) is not self
+
+    @contextmanager
+    def _incr_lock(self):
+        shared = self.shared
+        if isinstance(shared, ATOMIC_INCR_BACKENDS):
+            yield
+            return
+        path = self._incr_lock_file
+        if path is None:
+            if not isinstance(shared, FileBasedCache):
+                raise ImproperlyConfigured(
+                    f'{type(shared).__name__} не умеет атомарный incr: '
+                    'задайте INCR_LOCK_FILE в OPTIONS кеша'
+                )
+            path = os.path.join(shared._dir, 'incr.lock')
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # flock на отдельно открытом файле исключает и другие процессы,
+        # и другие потоки этого процесса.
+        with open(path, 'ab') as file:
+            locks.lock(file, locks.LOCK_EX)
+            try:
+                yield
+            finally:
+                locks.unlock(file)
+
+    def incr(self, key, delta=1, version=None):
+        self._local.delete(key, version=version)
+        with self._incr_lock():
+            return self.shared.incr(key, delta, version=version)
+
+    def clear(self):
+        self._local.clear()
+        self.shared.clear()
+
+
+class SingleFlight:
+    """
+    Чтение с пересчётом «в один поток»: значение хранится вместе со
+    сроком свежести, и после его истечения пересчитывает только процесс,
+    захвативший блокировку через cache.add; остальные отдают устаревшее
+    значение. При полном отсутствии значения ожидают пересчёта не дольше
+    wait секунд.
+    """
+
+    def __init__(self, cache, lock_timeout=30, wait=2.0, poll=0.05):
+        self.cache = cache
+        self.lock_timeout = lock_timeout
+        self.wait = wait
+        self.poll = poll
+
+    def _lock_key(self, key):
+        return f'{key}:lock'
+
+    def _compute(self, key, compute, timeout, stale_timeout):
+        # Блокировку снимаем и при ошибке compute(), иначе остальные
+        # запросы до lock_timeout ждали бы пересчёта, которого не будет.
+        try:
+            value = compute()
+            fresh_until = time.time() + timeout
+            self.cache.set(
+                key, (value, fresh_until), timeout + stale_timeout
+            )
+        finally:
+            self.cache.delete(self._lock_key(key))
+        record(key, 'recomputed')
+        return value
+
+    def get_or_compute(self, key, compute, timeout, stale_timeout=60):
+        entry = self.cache.get(key)
+        if entry is not None:
+            value, fresh_until = entry
+            if fresh_until > time.time():
+                return value
+            if not self.cache.add(self._lock_key(key), 1, self.lock_timeout):
+                record(key, 'stale')
+                return value
+            return self._compute(key, compute, timeout, stale_timeout)
+        if self.cache.add(self._lock_key(key), 1, self.lock_timeout):
+            return self._compute(key, compute, timeout, stale_timeout)
+        deadline = time.monotonic() + self.wait
+        while time.monotonic() < deadline:
+            time.sleep(self.poll)
+            entry = self.cache.get(key)
+            if entry is not None:
+                record(key, 'coalesced')
+                return entry[0]
+        return self._compute(key, compute, timeout, stale_timeout)
@@ -0,0 +1,18 @@
+"""
+Настройка новых соединений с базой данных.
+
+Обработчик сигнала connection_created выполняет для каждого нового
+соединения SQLite команды PRAGMA из settings.SQLITE_PRAGMAS. Часть
+из них (journal_mode) сохраняется в файле базы, остальные действуют
+только в пределах соединения, поэтому выполняются при каждом
+подключении. С постоянными соединениями (CONN_MAX_AGE) это происходит
+редко.
+"""
+from django.conf import settings
+
+
+def configure_sqlite(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    for name, value in settings.SQLITE_PRAGMAS.items():
+        connection.connection.execute(f'PRAGMA {name} = {value}')
@@ -0,0 +1,45 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+from core.replicas import LaggedReplication
+
+
+class Command(BaseCommand):
+    help = (
+        'Обновляет реплики-копии SQLite из основной базы с заданным '
+        'отставанием, имитируя асинхронную репликацию.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--lag', type=float, default=2,
+            help='Отставание реплик в секундах.'
+        )
+        parser.add_argument('--interval', type=float, default=0.5)
+        parser.add_argument(
+            '--iterations', type=int, default=0,
+            help='Число обновлений; 0 - работать до остановки.'
+        )
+
+    def handle(self, *args, **options):
+        if not settings.DATABASE_REPLICAS:
+            raise CommandError(
+                'Реплики не настроены: задайте DATABASE_REPLICA_PATHS.'
+            )
+        replication = LaggedReplication(
+            settings.DATABASES[DEFAULT_DB_ALIAS]['NAME'],
+            [settings.DATABASES[alias]['NAME']
+             for alias in settings.DATABASE_REPLICAS],
+            options['lag']
+        )
+        iteration = 0
+        while not options['iterations'] or iteration < options['iterations']:
+            iteration += 1
+            if replication.tick():
+                self.stdout.write(
+                    f'Реплики обновлены: {len(replication.replicas)}'
+                )
+            time.sleep(options['interval'])
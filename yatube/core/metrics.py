@@ -0,0 +1,254 @@
+"""
+Метрики представлений в формате Prometheus.
+
+MetricsMiddleware для каждого запроса измеряет время обработки, число
+и время SQL-запросов, время рендеринга шаблонов и события кеша и
+добавляет их к гистограммам и счётчикам представления (view_name из
+resolver_match). Данные копятся в памяти процесса. Раз в
+METRICS_FLUSH_INTERVAL секунд процесс сбрасывает свой снимок в файл
+METRICS_DIR/<pid>-<токен>.json. Страница /internal/metrics/ сливает
+файлы всех процессов, поэтому при нескольких воркерах видны суммарные
+значения. Снимки других процессов могут отставать на интервал сброса.
+Файлы завершившихся процессов не удаляются, чтобы счётчики не
+уменьшались.
+"""
+import json
+import os
+import threading
+import time
+import uuid
+from collections import Counter, defaultdict
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.template.backends.django import DjangoTemplates, Template
+
+TIME_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+HISTOGRAMS = {
+    'duration_seconds': ('Время обработки запроса', TIME_BUCKETS),
+    'db_queries': ('Число SQL-запросов', COUNT_BUCKETS),
+    'db_seconds': ('Время SQL-запросов', TIME_BUCKETS),
+    'template_seconds': ('Время рендеринга шаблонов', TIME_BUCKETS),
+}
+PREFIX = 'yatube'
+
+_current = ContextVar('request_metrics', default=None)
+_lock = threading.Lock()
+# {view: {гистограмма: [счётчики по корзинам и +Inf, сумма]}}
+_histograms = defaultdict(dict)
+# {view: {событие кеша: n}}
+_cache_events = defaultdict(Counter)
+_process_token = f'{os.getpid()}-{uuid.uuid4().hex[:8]}'
+_last_flush = time.monotonic()
+
+
+class RequestMetrics:
+    """Измерения одного запроса."""
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.template_seconds = 0.0
+        self.template_depth = 0
+        self.cache_events = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        """Обёртка выполнения SQL для connection.execute_wrapper."""
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_seconds += time.perf_counter() - start
+            self.queries += 1
+
+
+def start_request():
+    metrics = RequestMetrics()
+    return metrics, _current.set(metrics)
+
+
+def finish_request(token):
+    _current.reset(token)
+
+
+def record_cache(event, count=1):
+    """Учитывает событие кеша в метриках текущего запроса."""
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.cache_events[event] += count
+
+
+def _observe(series, name, value):
+    buckets = HISTOGRAMS[name][1]
+    values = series.get(name)
+    if values is None:
+        values = series[name] = [0] * (len(buckets) + 2)
+    for index, bound in enumerate(buckets):
+        if value <= bound:
+            break
+    else:
+        index = len(buckets)
+    values[index] += 1
+    values[-1] += value
+
+
+def observe(view, metrics, duration):
+    """Добавляет измерения запроса к метрикам представления."""
+    with _lock:
+        series = _histograms[view]
+        _observe(series, 'duration_seconds', duration)
+        _observe(series, 'db_queries', metrics.queries)
+        _observe(series, 'db_seconds', metrics.db_seconds)
+        _observe(series, 'template_seconds', metrics.template_seconds)
+        _cache_events[view].update(metrics.cache_events)
+
+
+def snapshot():
+    """Метрики текущего процесса в виде, пригодном для JSON."""
+    from .cache import stats
+
+    with _lock:
+        return {
+            'views': {
+                view: {name: list(values) for name, values in series.items()}
+                for view, series in _histograms.items()
+            },
+            'view_cache': {
+                view: dict(events) for view, events in _cache_events.items()
+            },
+            'cache': stats(),
+        }
+
+
+def reset():
+    global _last_flush
+    with _lock:
+        _histograms.clear()
+        _cache_events.clear()
+        _last_flush = time.monotonic()
+
+
+def flush():
+    """Атомарно записывает снимок процесса в METRICS_DIR."""
+    global _last_flush
+    _last_flush = time.monotonic()
+    os.makedirs(settings.METRICS_DIR, exist_ok=True)
+    path = os.path.join(settings.METRICS_DIR, f'{_process_token}.json')
+    temp_path = f'{path}.tmp'
+    with open(temp_path, 'w') as file:
+        json.dump(snapshot(), file)
+    os.replace(temp_path, path)
+
+
+def maybe_flush():
+    if time.monotonic() - _last_flush >= settings.METRICS_FLUSH_INTERVAL:
+        flush()
+
+
+def collect():
+    """Сумма снимков всех процессов; свой снимок сбрасывается заново."""
+    flush()
+    merged = {
+        'views': defaultdict(dict),
+        'view_cache': defaultdict(Counter),
+        'cache': defaultdict(Counter),
+    }
+    for name in os.listdir(settings.METRICS_DIR):
+        if not name.endswith('.json'):
+            continue
+        try:
+            with open(os.path.join(settings.METRICS_DIR, name)) as file:
+                data = json.load(file)
+        except (OSError, ValueError):
+            continue
+        for view, series in data['views'].items():
+            target = merged['views'][view]
+            for metric, values in series.items():
+                if metric in target:
+                    target[metric] = [
+                        a + b for a, b in zip(target[metric], values)
+                    ]
+                else:
+                    target[metric] = values
+        for key in ('view_cache', 'cache'):
+            for label, events in data[key].items():
+                merged[key][label].update(events)
+    return merged
+
+
+def _escape(value):
+    return (
+        str(value).replace('\\', r'\\').replace('"', r'\"')
+        .replace('\n', r'\n')
+    )
+
+
+def _labels(**labels):
+    return ','.join(
+        f'{name}="{_escape(value)}"' for name, value in labels.items()
+    )
+
+
+def render(merged):
+    """Текстовый формат экспозиции Prometheus 0.0.4."""
+    lines = []
+    for name, (help_text, buckets) in HISTOGRAMS.items():
+        metric = f'{PREFIX}_view_{name}'
+        lines.append(f'# HELP {metric} {help_text}.')
+        lines.append(f'# TYPE {metric} histogram')
+        for view, series in sorted(merged['views'].items()):
+            values = series.get(name)
+            if values is None:
+                continue
+            cumulative = 0
+            for bound, count in zip(buckets + ('+Inf',), values):
+                cumulative += count
+                lines.append(
+                    f'{metric}_bucket{{{_labels(view=view, le=bound)}}} '
+                    f'{cumulative}'
+                )
+            lines.append(
+                f'{metric}_sum{{{_labels(view=view)}}} {values[-1]}'
+            )
+            lines.append(
+                f'{metric}_count{{{_labels(view=view)}}} {cumulative}'
+            )
+    for metric, label, help_text in (
+        ('view_cache_events_total', 'view', 'События кеша по представлениям'),
+        ('cache_events_total', 'prefix', 'События кеша по префиксам ключей'),
+    ):
+        key = 'view_cache' if label == 'view' else 'cache'
+        lines.append(f'# HELP {PREFIX}_{metric} {help_text}.')
+        lines.append(f'# TYPE {PREFIX}_{metric} counter')
+        for value, events in sorted(merged[key].items()):
+            for event, count in sorted(events.items()):
+                labels = _labels(**{label: value, 'event': event})
+                lines.append(f'{PREFIX}_{metric}{{{labels}}} {count}')
+    return '\n'.join(lines) + '\n'
+
+
+class TimedTemplate(Template):
+    def render(self, context=None, request=None):
+        metrics = _current.get()
+        if metrics is None:
+            return super().render(context, request)
+        metrics.template_depth += 1
+        start = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            metrics.template_depth -= 1
+            if not metrics.template_depth:
+                metrics.template_seconds += time.perf_counter() - start
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """Бэкенд шаблонов Django, учитывающий время рендеринга в метриках."""
+
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        template = super().get_template(template_name)
+        return TimedTemplate(template.template, self)
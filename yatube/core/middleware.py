@@ -0,0 +1,38 @@
+import time
+from contextlib import ExitStack
+
+from django.db import connections
+
+from . import metrics
+
+
+class MetricsMiddleware:
+    """
+    Собирает метрики каждого запроса по имени представления
+    (см. core.metrics). Должен стоять первым в MIDDLEWARE, чтобы
+    учитывать и время остальных middleware.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request_metrics, token = metrics.start_request()
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(request_metrics)
+                    )
+                response = self.get_response(request)
+        finally:
+            metrics.finish_request(token)
+        match = request.resolver_match
+        metrics.observe(
+            match.view_name if match else '<unresolved>',
+            request_metrics,
+            time.perf_counter() - start
+        )
+        metrics.maybe_flush()
+        return response
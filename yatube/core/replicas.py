@@ -0,0 +1,180 @@
+"""
+Чтение лент и страниц постов с реплик базы данных.
+
+Реплики - алиасы из settings.DATABASE_REPLICAS. ReplicaRouter
+отправляет на случайную реплику только чтения моделей REPLICA_APPS
+внутри представлений, обёрнутых в use_replica; все записи и прочие
+чтения идут в основную базу 'default', как и чтения внутри транзакции.
+
+Чтобы пользователь сразу видел свои изменения несмотря на отставание
+реплик, представления с записью обёрнуты в pins_primary: ответ ставит
+cookie, и в течение REPLICA_STICKY_SECONDS запросы этого браузера
+читают из основной базы.
+
+Для локальной проверки репликами служат копии файла SQLite, которые
+команда simulate_replication обновляет с заданным отставанием
+(см. LaggedReplication).
+"""
+import asyncio
+import random
+import sqlite3
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+PIN_COOKIE = 'primary_until'
+# Приложения, чьи таблицы читаются с реплик. Сессии, пользователи и
+# типы содержимого всегда читаются из основной базы: иначе сессия
+# только что вошедшего пользователя не находится на отстающей
+# реплике, и SessionMiddleware удаляет cookie сессии.
+REPLICA_APPS = {'posts', 'taggit'}
+
+_replica_reads = ContextVar('replica_reads', default=False)
+
+
+def replica_reads_allowed():
+    return (
+        _replica_reads.get()
+        and bool(settings.DATABASE_REPLICAS)
+        and not connections[DEFAULT_DB_ALIAS].in_atomic_block
+    )
+
+
+@contextmanager
+def primary_reads():
+    """
+    Чтения внутри блока идут в основную базу. Нужен там, где
+    результат сохраняется под ключом, посчитанным по свежим данным
+    (страницы лент в feed_cache): иначе данные отстающей реплики
+    закешировались бы под новым ключом.
+    """
+    token = _replica_reads.set(False)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+def _pinned(request):
+    try:
+        return float(request.COOKIES.get(PIN_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+
+def use_replica(view):
+    """Чтения представления идут на реплики, если браузер не закреплён."""
+    if asyncio.iscoroutinefunction(view):
+        @wraps(view)
+        async def async_wrapper(request, *args, **kwargs):
+            token = _replica_reads.set(not _pinned(request))
+            try:
+                return await view(request, *args, **kwargs)
+            finally:
+                _replica_reads.reset(token)
+        return async_wrapper
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        token = _replica_reads.set(not _pinned(request))
+        try:
+            return view(request, *args, **kwargs)
+        finally:
+            _replica_reads.reset(token)
+    return wrapper
+
+
+def pins_primary(view):
+    """
+    Закрепляет браузер за основной базой на REPLICA_STICKY_SECONDS.
+    Изменения в обёрнутых представлениях завершаются редиректом
+    (POST/redirect/GET, подписка по ссылке) или ответом 201 на
+    AJAX-запрос, поэтому cookie ставится на такие ответы; показ формы
+    браузер не закрепляет.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        response = view(request, *args, **kwargs)
+        if response.status_code in (201, 301, 302, 303):
+            response.set_cookie(
+                PIN_COOKIE,
+                str(time.time() + settings.REPLICA_STICKY_SECONDS),
+                max_age=settings.REPLICA_STICKY_SECONDS,
+                httponly=True,
+                samesite='Lax',
+            )
+        return response
+    return wrapper
+
+
+class ReplicaRouter:
+    """Маршрутизатор баз данных для реплик (см. описание модуля)."""
+
+    def db_for_read(self, model, **hints):
+        if (
+            model._meta.app_label in REPLICA_APPS
+            and replica_reads_allowed()
+        ):
+            return random.choice(settings.DATABASE_REPLICAS)
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        pool = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        if obj1._state.db in pool and obj2._state.db in pool:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Схема реплик приходит вместе с данными из основной базы.
+        if db in settings.DATABASE_REPLICAS:
+            return False
+        return None
+
+
+class LaggedReplication:
+    """
+    Имитация асинхронной репликации для копий SQLite: tick() снимает
+    копию основной базы и применяет к репликам снимки, которым не
+    меньше lag секунд. Реплики отстают от основной базы на lag..lag +
+    интервал между вызовами tick().
+    """
+
+    def __init__(self, primary, replicas, lag):
+        self.primary = primary
+        self.replicas = list(replicas)
+        self.lag = lag
+        self.pending = deque()
+
+    def tick(self, now=None):
+        """Возвращает True, если реплики обновлены."""
+        now = time.monotonic() if now is None else now
+        snapshot = sqlite3.connect(':memory:')
+        source = sqlite3.connect(self.primary)
+        try:
+            source.backup(snapshot)
+        finally:
+            source.close()
+        self.pending.append((now, snapshot))
+        latest = None
+        while self.pending and self.pending[0][0] <= now - self.lag:
+            if latest is not None:
+                latest.close()
+            latest = self.pending.popleft()[1]
+        if latest is None:
+            return False
+        for path in self.replicas:
+            target = sqlite3.connect(path)
+            try:
+                latest.backup(target)
+            finally:
+                target.close()
+        latest.close()
+        return True
@@ -1,6 +1,29 @@
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
 from http import HTTPStatus
 
-from django.test import TestCase
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache, caches
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connections, router, transaction
+from django.test import (
+    RequestFactory, TestCase, TransactionTestCase, override_settings
+)
+from django.urls import reverse
+
+from posts.benchmarks import LOCMEM_CACHES
+from posts.models import Post
+
+from . import metrics, replicas
+from .cache import SingleFlight, TwoTierCache, reset_stats, stats
+
+User = get_user_model()
 
 
 class ViewTestClass(TestCase):
@@ -8,3 +31,352 @@ class ViewTestClass(TestCase):
         response = self.client.get('/nonexist-page/')
         self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
         self.assertTemplateUsed(response, 'core/404.html')
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class TwoTierCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        reset_stats()
+
+    def test_local_tier_serves_versioned_keys(self):
+        """Версионированные ключи читаются из памяти процесса."""
+        cache.set('post-card:index:1:1', 'карточка')
+        caches['shared'].delete('post-card:index:1:1')
+        self.assertEqual(cache.get('post-card:index:1:1'), 'карточка')
+        self.assertEqual(stats()['post-card'], {'local_hit': 1})
+
+    def test_mutable_keys_bypass_local_tier(self):
+        """Прочие ключи всегда читаются из общего кеша."""
+        cache.set('feed-gen:all', 1)
+        caches['shared'].set('feed-gen:all', 2)
+        self.assertEqual(cache.get('feed-gen:all'), 2)
+        cache.get('feed-gen:missing')
+        self.assertEqual(stats()['feed-gen'], {'hit': 1, 'miss': 1})
+
+    def test_single_flight_serves_stale_while_recomputing(self):
+        """Пока другой процесс пересчитывает ключ, отдаётся старое значение."""
+        flight = SingleFlight(cache)
+        cache.set('feed-page:hot', ('старое', time.time() - 1), 60)
+        cache.add('feed-page:hot:lock', 1, 30)
+        value = flight.get_or_compute('feed-page:hot', lambda: 'новое', 60)
+        self.assertEqual(value, 'старое')
+        cache.delete('feed-page:hot:lock')
+        value = flight.get_or_compute('feed-page:hot', lambda: 'новое', 60)
+        self.assertEqual(value, 'новое')
+        self.assertEqual(
+            stats()['feed-page'], {'local_hit': 2, 'stale': 1, 'recomputed': 1}
+        )
+
+    def test_single_flight_releases_lock_on_error(self):
+        """Ошибка пересчёта не заставляет следующий запрос ждать."""
+        flight = SingleFlight(cache, wait=2.0)
+
+        def fail():
+            raise RuntimeError('ошибка')
+
+        with self.assertRaises(RuntimeError):
+            flight.get_or_compute('feed-page:broken', fail, 60)
+        started = time.monotonic()
+        value = flight.get_or_compute('feed-page:broken', lambda: 'новое', 60)
+        self.assertEqual(value, 'новое')
+        self.assertLess(time.monotonic() - started, 1.0)
+
+    def test_concurrent_incr_loses_no_increments(self):
+        """incr поверх файлового кеша атомарен между потоками."""
+        cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, cache_dir, True)
+        settings_override = override_settings(CACHES={
+            **settings.CACHES,
+            'shared': {
+                'BACKEND':
+                    'django.core.cache.backends.filebased.FileBasedCache',
+                'LOCATION': cache_dir,
+            },
+        })
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        cache.set('feed-gen:all', 0)
+        threads = [
+            threading.Thread(target=lambda: [
+                cache.incr('feed-gen:all') for _ in range(25)
+            ])
+            for _ in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(cache.get('feed-gen:all'), 200)
+
+    def test_incr_requires_lock_file_for_non_atomic_backend(self):
+        """Без атомарного incr и INCR_LOCK_FILE настройка неверна."""
+        backend = TwoTierCache('test', {'OPTIONS': {'SHARED': 'database'}})
+        with override_settings(CACHES={
+            **settings.CACHES,
+            'database': {
+                'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+                'LOCATION': 'cache_table',
+            },
+        }):
+            with self.assertRaises(ImproperlyConfigured):
+                backend.incr('feed-gen:all')
+
+    def test_cache_stats_page(self):
+        """Счётчики кеша доступны сотрудникам."""
+        self.client.force_login(
+            User.objects.create_user(username='staff', is_staff=True)
+        )
+        cache.get('feed-gen:all')
+        response = self.client.get('/internal/cache-stats/')
+        self.assertEqual(response.json(), {'feed-gen': {'miss': 1}})
+
+
+@override_settings(INTERNAL_TOKEN='secret', CACHES=LOCMEM_CACHES)
+class MetricsTests(TestCase):
+    def setUp(self):
+        self.metrics_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.metrics_dir, True)
+        settings_override = override_settings(METRICS_DIR=self.metrics_dir)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        cache.clear()
+        reset_stats()
+        metrics.reset()
+
+    def _scrape(self, **extra):
+        response = self.client.get(
+            '/internal/metrics/', HTTP_AUTHORIZATION='Bearer secret', **extra
+        )
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        return response.content.decode()
+
+    def test_view_metrics(self):
+        """Гистограммы и события кеша учитываются по имени представления."""
+        user = User.objects.create_user(username='auth')
+        self.client.force_login(user)
+        for _ in range(3):
+            self.client.get('/')
+        text = self._scrape()
+        self.assertIn(
+            'yatube_view_duration_seconds_count{view="posts:index"} 3', text
+        )
+        self.assertIn(
+            'yatube_view_db_queries_bucket{view="posts:index",le="+Inf"} 3',
+            text
+        )
+        self.assertIn(
+            'yatube_view_template_seconds_count{view="posts:index"} 3', text
+        )
+        self.assertIn(
+            'yatube_view_cache_events_total{view="posts:index",'
+            'event="local_hit"}',
+            text
+        )
+        self.assertIn(
+            'yatube_cache_events_total{prefix="feed-page",event="miss"} 1',
+            text
+        )
+
+    def test_query_count_histogram(self):
+        """Число запросов попадает в свою корзину гистограммы."""
+        request_metrics, token = metrics.start_request()
+        metrics.finish_request(token)
+        request_metrics.queries = 4
+        metrics.observe('posts:test', request_metrics, 0.02)
+        text = metrics.render(metrics.collect())
+        self.assertIn(
+            'yatube_view_db_queries_bucket{view="posts:test",le="2"} 0', text
+        )
+        self.assertIn(
+            'yatube_view_db_queries_bucket{view="posts:test",le="5"} 1', text
+        )
+        self.assertIn('yatube_view_db_queries_sum{view="posts:test"} 4', text)
+
+    def test_snapshots_of_all_processes_are_merged(self):
+        """Страница метрик суммирует снимки всех процессов."""
+        self.client.get('/')
+        metrics.flush()
+        other = metrics.snapshot()
+        with open(os.path.join(self.metrics_dir, '1-other.json'), 'w') as f:
+            json.dump(other, f)
+        text = self._scrape()
+        self.assertIn(
+            'yatube_view_duration_seconds_count{view="posts:index"} 2', text
+        )
+
+    def test_metrics_page_is_internal(self):
+        """Без токена страница закрыта, в том числе для 127.0.0.1."""
+        for extra in ({}, {'HTTP_AUTHORIZATION': 'Bearer wrong'}):
+            with self.subTest(extra=extra):
+                response = self.client.get(
+                    '/internal/metrics/', REMOTE_ADDR='127.0.0.1', **extra
+                )
+                self.assertEqual(response.status_code, HTTPStatus.FORBIDDEN)
+        with override_settings(INTERNAL_TOKEN=''):
+            response = self.client.get(
+                '/internal/metrics/', HTTP_AUTHORIZATION='Bearer '
+            )
+            self.assertEqual(response.status_code, HTTPStatus.FORBIDDEN)
+
+
+@replicas.use_replica
+def read_database(request):
+    return Post.objects.all().db
+
+
+@override_settings(
+    DATABASE_REPLICAS=['replica1', 'replica2'], CACHES=LOCMEM_CACHES
+)
+class ReplicaRouterTests(TransactionTestCase):
+    # TestCase держит каждый тест в транзакции, а внутри транзакции
+    # чтения всегда идут в основную базу.
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def test_marked_views_read_from_replicas(self):
+        """Чтения в use_replica идут на реплики, остальные - в default."""
+        self.assertIn(
+            read_database(self.factory.get('/')), ('replica1', 'replica2')
+        )
+        self.assertEqual(Post.objects.all().db, 'default')
+        self.assertEqual(router.db_for_write(Post), 'default')
+
+    def test_reads_in_transaction_use_primary(self):
+        """Внутри транзакции чтения идут в основную базу."""
+        request = self.factory.get('/')
+        with transaction.atomic():
+            self.assertEqual(read_database(request), 'default')
+
+    def test_pinned_browser_reads_from_primary(self):
+        """Свежая cookie закрепления отключает реплики."""
+        request = self.factory.get('/')
+        request.COOKIES[replicas.PIN_COOKIE] = str(time.time() + 10)
+        self.assertEqual(read_database(request), 'default')
+        request.COOKIES[replicas.PIN_COOKIE] = str(time.time() - 1)
+        self.assertNotEqual(read_database(request), 'default')
+
+    def test_writes_pin_browser_to_primary(self):
+        """После записи браузер закрепляется за основной базой."""
+        user = User.objects.create_user(username='auth')
+        post = Post.objects.create(author=user, text='Пост')
+        self.client.force_login(user)
+        response = self.client.get(reverse('posts:post_create'))
+        self.assertNotIn(replicas.PIN_COOKIE, response.cookies)
+        response = self.client.post(
+            reverse('posts:add_comment', args=[post.pk]), {'text': 'Текст'}
+        )
+        self.assertIn(replicas.PIN_COOKIE, response.cookies)
+        request = self.factory.get('/')
+        request.COOKIES[replicas.PIN_COOKIE] = (
+            self.client.cookies[replicas.PIN_COOKIE].value
+        )
+        self.assertEqual(read_database(request), 'default')
+
+    def test_cached_feed_pages_are_built_from_primary(self):
+        """Страница, которая попадёт в общий кеш, читается из default."""
+        @replicas.use_replica
+        def view(request):
+            with replicas.primary_reads():
+                inner = Post.objects.all().db
+            return inner, Post.objects.all().db
+
+        inner, outer = view(self.factory.get('/'))
+        self.assertEqual(inner, 'default')
+        self.assertIn(outer, ('replica1', 'replica2'))
+
+
+@override_settings(DATABASE_REPLICAS=['replica1'], CACHES=LOCMEM_CACHES)
+class LaggedReplicaLoginTests(TransactionTestCase):
+    """Вход пользователя при реплике, которая ещё не видит его сессию."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='auth', password='pw')
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, True)
+        path = os.path.join(directory, 'replica.sqlite3')
+        # Снимок базы до входа: сессии в нём нет, как на отстающей
+        # реплике.
+        primary = connections['default']
+        primary.ensure_connection()
+        replica = sqlite3.connect(path)
+        primary.connection.backup(replica)
+        replica.close()
+        connections.settings['replica1'] = {
+            **primary.settings_dict, 'NAME': path
+        }
+        self.addCleanup(self._drop_replica)
+
+    @staticmethod
+    def _drop_replica():
+        connections['replica1'].close()
+        del connections._connections.replica1
+        del connections.settings['replica1']
+
+    def test_fresh_login_is_not_lost(self):
+        self.assertTrue(
+            self.client.login(username='auth', password='pw')
+        )
+        response = self.client.get(reverse('posts:index'))
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertTrue(response.wsgi_request.user.is_authenticated)
+        self.assertNotIn('sessionid', response.cookies)
+        # Посты при этом читаются с реплики.
+        self.assertEqual(
+            replicas.use_replica(
+                lambda request: Post.objects.all().db
+            )(RequestFactory().get('/')),
+            'replica1'
+        )
+
+
+class LaggedReplicationTests(TestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, True)
+        self.primary = os.path.join(directory, 'primary.sqlite3')
+        self.replica = os.path.join(directory, 'replica.sqlite3')
+        self._execute(self.primary, 'CREATE TABLE t (id INTEGER)')
+
+    def _execute(self, path, sql):
+        db = sqlite3.connect(path)
+        try:
+            with db:
+                return db.execute(sql).fetchall()
+        finally:
+            db.close()
+
+    def _replica_rows(self):
+        return self._execute(self.replica, 'SELECT count(*) FROM t')[0][0]
+
+    def test_replicas_lag_behind_primary(self):
+        """Реплика получает состояние основной базы lag секунд назад."""
+        replication = replicas.LaggedReplication(
+            self.primary, [self.replica], lag=2
+        )
+        self._execute(self.primary, 'INSERT INTO t VALUES (1)')
+        self.assertFalse(replication.tick(now=0))
+        self._execute(self.primary, 'INSERT INTO t VALUES (2)')
+        self.assertFalse(replication.tick(now=1))
+        self.assertTrue(replication.tick(now=2))
+        self.assertEqual(self._replica_rows(), 1)
+        self.assertTrue(replication.tick(now=3.5))
+        self.assertEqual(self._replica_rows(), 2)
+
+
+class SqlitePragmaTests(TestCase):
+    @override_settings(SQLITE_PRAGMAS={
+        'cache_size': -1024, 'busy_timeout': 1234, 'temp_store': 'MEMORY'
+    })
+    def test_pragmas_applied_to_new_connections(self):
+        """Новое соединение получает PRAGMA из SQLITE_PRAGMAS."""
+        connection = connections.create_connection('default')
+        try:
+            with connection.cursor() as cursor:
+                values = [
+                    cursor.execute(f'PRAGMA {name}').fetchone()[0]
+                    for name in ('cache_size', 'busy_timeout', 'temp_store')
+                ]
+        finally:
+            connection.close()
+        self.assertEqual(values, [-1024, 1234, 2])
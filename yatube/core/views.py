@@ -1,7 +1,13 @@
+import hmac
 from http import HTTPStatus
 
+from django.conf import settings
+from django.core.exceptions import PermissionDenied
+from django.http import HttpResponse, JsonResponse
 from django.shortcuts import render
 
+from . import cache, metrics
+
 
 def page_not_found(request, exception):
     return render(
@@ -26,3 +32,36 @@ def permission_denied(request, exception):
         request, 'core/403.html',
         status=HTTPStatus.FORBIDDEN
     )
+
+
+def is_internal(request):
+    """
+    Доступ к служебным страницам: сотрудники или запрос с токеном
+    INTERNAL_TOKEN в заголовке Authorization: Bearer. Адрес клиента
+    не учитывается: за обратным прокси все запросы приходят с
+    127.0.0.1.
+    """
+    if request.user.is_staff:
+        return True
+    token = settings.INTERNAL_TOKEN
+    header = request.META.get('HTTP_AUTHORIZATION', '')
+    return bool(token) and hmac.compare_digest(
+        header.encode(), f'Bearer {token}'.encode()
+    )
+
+
+def cache_stats(request):
+    """Счётчики кеша текущего процесса по префиксам ключей."""
+    if not is_internal(request):
+        raise PermissionDenied
+    return JsonResponse(cache.stats())
+
+
+def metrics_view(request):
+    """Метрики представлений всех процессов в формате Prometheus."""
+    if not is_internal(request):
+        raise PermissionDenied
+    return HttpResponse(
+        metrics.render(metrics.collect()),
+        content_type='text/plain; version=0.0.4; charset=utf-8'
+    )
@@ -1,15 +1,91 @@
+from django import forms
 from django.contrib import admin
+from django.contrib.admin.widgets import AutocompleteSelect
 
-from .models import Group, Post, Comment, Follow
+from . import search
+from .models import Group, Post, Comment, Follow, OutgoingEmail
+from .pagination import EstimatedCountPaginator
 
-class PostAdmin(admin.ModelAdmin):
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """
+    Общие настройки списков для больших таблиц: оценка числа строк
+    вместо COUNT(*) и без повторного подсчёта полного размера таблицы.
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+class LoadedAutocompleteSelect(AutocompleteSelect):
+    """
+    Автодополнение, которое подписывает выбранное значение уже
+    загруженным объектом, а не отдельным запросом: в списке с
+    list_editable иначе на каждую строку приходился бы свой запрос.
+    """
+    selected = None
+
+    def optgroups(self, name, value, attr=None):
+        obj = self.selected
+        if obj is None or list(value) != [str(obj.pk)]:
+            return super().optgroups(name, value, attr)
+        options = []
+        if not self.is_required:
+            options.append(self.create_option(name, '', '', False, 0))
+        options.append(self.create_option(
+            name, obj.pk, self.choices.field.label_from_instance(obj),
+            True, len(options)
+        ))
+        return [(None, options, 0)]
+
+
+class PostChangelistForm(forms.ModelForm):
+    """Строка списка постов: группа берётся из list_select_related."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        field = self.fields.get('group')
+        if field is not None and self.instance.group_id:
+            widget = getattr(field.widget, 'widget', field.widget)
+            widget.selected = self.instance.group
+
+
+class PostAdmin(LargeTableAdmin):
     """Кастомная админка для модели Post."""
-    list_display = ('pk', 'text', 'pub_date', 'author', 'group', 'image', 'tags')
-    list_editable = ('group', 'image', 'tags')
+    list_display = (
+        'pk', 'excerpt', 'pub_date', 'author', 'group', 'image', 'tag_list'
+    )
+    list_editable = ('group', 'image')
+    list_select_related = ('author', 'group')
     search_fields = ('text',)
     list_filter = ('pub_date',)
+    date_hierarchy = 'pub_date'
     empty_value_display = '-пусто-'
     raw_id_fields = ('author',)
+    autocomplete_fields = ('group',)
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).prefetch_related('tags')
+
+    def get_changelist_form(self, request, **kwargs):
+        kwargs.setdefault('form', PostChangelistForm)
+        return super().get_changelist_form(request, **kwargs)
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        if db_field.name in self.get_autocomplete_fields(request):
+            kwargs.setdefault('widget', LoadedAutocompleteSelect(
+                db_field, self.admin_site, using=kwargs.get('using')
+            ))
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+
+    def get_search_results(self, request, queryset, search_term):
+        """Поиск по полнотекстовому индексу вместо LIKE '%...%'."""
+        if not search_term:
+            return queryset, False
+        return search.filter_posts(queryset, search_term), False
+
+    @admin.display(description='Теги')
+    def tag_list(self, obj):
+        return ', '.join(tag.name for tag in obj.tags.all())
 
 
 class GroupAdmin(admin.ModelAdmin):
@@ -19,17 +95,32 @@ class GroupAdmin(admin.ModelAdmin):
     search_fields = ('title',)
 
 
-class CommentAdmin(admin.ModelAdmin):
+class CommentAdmin(LargeTableAdmin):
     """Кастомная админка для модели Comment."""
-    list_display = ('pk', 'post', 'author', 'text', 'created')
-    search_fields = ('author',)
+    list_display = ('pk', 'post', 'author', 'excerpt', 'created')
+    list_select_related = ('post', 'author')
+    search_fields = ('author__username',)
     list_filter = ('created',)
+    raw_id_fields = ('post', 'author')
 
 
-class FollowAdmin(admin.ModelAdmin):
+class FollowAdmin(LargeTableAdmin):
     """Кастомная админка для модели Follow."""
     list_display = ('user', 'author')
-    list_filter = ('author', 'user',)
+    list_select_related = ('user', 'author')
+    search_fields = ('user__username', 'author__username')
+    raw_id_fields = ('user', 'author')
+
+
+class OutgoingEmailAdmin(LargeTableAdmin):
+    """Кастомная админка для очереди писем."""
+    list_display = (
+        'pk', 'subject', 'to', 'status', 'attempts', 'next_attempt_at',
+        'sent_at'
+    )
+    list_filter = ('status',)
+    search_fields = ('to',)
+    readonly_fields = ('last_error', 'sent_at')
 
 
 admin.site.register(Post, PostAdmin)
@@ -39,3 +130,5 @@ admin.site.register(Group, GroupAdmin)
 admin.site.register(Comment, CommentAdmin)
 
 admin.site.register(Follow, FollowAdmin)
+
+admin.site.register(OutgoingEmail, OutgoingEmailAdmin)
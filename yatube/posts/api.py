@@ -0,0 +1,180 @@
+"""
+JSON API лент только для чтения.
+
+Страница выбирается курсорной пагинацией по (pub_date, id) в два шага:
+сначала по индексу читаются только id, pub_date, version и
+comments_count постов страницы, из них строятся ETag и Last-Modified,
+и при совпадении с заголовками клиента сразу возвращается 304. Полные
+строки постов загружаются, только если ответ действительно нужен.
+version увеличивается при изменении поста и его тегов, comments_count -
+при новых комментариях, поэтому ETag меняется не только при появлении
+новых постов; Last-Modified же отражает только даты публикации,
+и клиентам стоит присылать If-None-Match.
+
+Комментарии поста отдаются страницами по NUM_COMMENTS_PER_PAGE, новые
+сверху, как на HTML-странице поста; следующая страница - по ссылке
+comments_next. ETag поста строится из пути запроса, версии поста,
+числа его комментариев и поколения 'epoch' кеша лент: переименование
+пользователя, группы или тега увеличивает поколение, поэтому имена
+авторов комментариев в ответе не устаревают.
+"""
+import hashlib
+
+from django.conf import settings
+from django.db.models import Max
+from django.http import JsonResponse
+from django.shortcuts import get_object_or_404
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+from core.replicas import use_replica
+
+from . import feed_cache
+from .models import Group, Post, User
+from .pagination import cursor_page, cursor_pagination, decode_cursor
+
+JSON_PARAMS = {'ensure_ascii': False, 'separators': (',', ':')}
+POST_FIELDS = (
+    'pk', 'text', 'pub_date', 'image', 'comments_count', 'version',
+    'author__username', 'group__slug',
+)
+VALIDATOR_FIELDS = ('pk', 'pub_date', 'version', 'comments_count')
+
+
+def serialize_post(post):
+    return {
+        'id': post.pk,
+        'author': post.author.username,
+        'group': post.group.slug if post.group_id else None,
+        'text': post.text,
+        'pub_date': post.pub_date.isoformat(),
+        'image': post.image.url if post.image else None,
+        'comments_count': post.comments_count,
+    }
+
+
+def _validators(request, rows):
+    """
+    ETag и Last-Modified по (id, version, comments_count, pub_date)
+    строк ответа.
+    """
+    digest = hashlib.md5(request.get_full_path().encode())
+    for pk, version, comments_count, _ in rows:
+        digest.update(f'{pk}:{version}:{comments_count};'.encode())
+    dates = [row[-1] for row in rows]
+    last_modified = max(dates).timestamp() if dates else None
+    return quote_etag(digest.hexdigest()), last_modified
+
+
+def _post_etag(request, post):
+    """
+    ETag поста: путь запроса, версия и число комментариев поста,
+    поколение 'epoch'.
+    """
+    epoch = feed_cache.generations([feed_cache.EPOCH])[feed_cache.EPOCH]
+    digest = hashlib.md5(request.get_full_path().encode())
+    digest.update(
+        f'{post.pk}:{post.version}:{post.comments_count}:{epoch}'.encode()
+    )
+    return quote_etag(digest.hexdigest())
+
+
+def serialize_comment(comment):
+    return {
+        'id': comment.pk,
+        'author': comment.author.username,
+        'text': comment.text,
+        'created': comment.created.isoformat(),
+    }
+
+
+def _json(data, etag, last_modified):
+    response = JsonResponse(data, json_dumps_params=JSON_PARAMS)
+    response.headers['ETag'] = etag
+    if last_modified is not None:
+        response.headers['Last-Modified'] = http_date(last_modified)
+    return response
+
+
+def _page_url(request, param, cursor):
+    if cursor is None:
+        return None
+    return request.build_absolute_uri(f'{request.path}?{param}={cursor}')
+
+
+def feed_response(request, posts):
+    page_obj = cursor_pagination(
+        posts.only(*VALIDATOR_FIELDS), request
+    )
+    rows = [
+        (post.pk, post.version, post.comments_count, post.pub_date)
+        for post in page_obj
+    ]
+    etag, last_modified = _validators(request, rows)
+    conditional = get_conditional_response(
+        request, etag=etag, last_modified=last_modified
+    )
+    if conditional is not None:
+        return conditional
+    full = Post.objects.select_related('author', 'group').only(
+        *POST_FIELDS
+    ).in_bulk([row[0] for row in rows])
+    data = {
+        'results': [serialize_post(full[row[0]]) for row in rows
+                    if row[0] in full],
+        'next': _page_url(request, 'after', page_obj.next_cursor),
+        'previous': _page_url(request, 'before', page_obj.previous_cursor),
+    }
+    return _json(data, etag, last_modified)
+
+
+@use_replica
+def index(request):
+    """Лента всех постов."""
+    return feed_response(request, Post.objects.all())
+
+
+@use_replica
+def group_posts(request, slug):
+    """Лента сообщества."""
+    group = get_object_or_404(Group, slug=slug)
+    return feed_response(request, group.posts.all())
+
+
+@use_replica
+def profile(request, username):
+    """Лента автора."""
+    author = get_object_or_404(User, username=username)
+    return feed_response(request, author.posts.all())
+
+
+@use_replica
+def post_detail(request, post_id):
+    """Пост с тегами и страницей комментариев (?comments_after=)."""
+    post = get_object_or_404(
+        Post.objects.only(*VALIDATOR_FIELDS), pk=post_id
+    )
+    last_comment = post.comments.aggregate(last=Max('created'))['last']
+    last_modified = max(filter(None, (post.pub_date, last_comment)))
+    etag = _post_etag(request, post)
+    conditional = get_conditional_response(
+        request, etag=etag, last_modified=last_modified.timestamp()
+    )
+    if conditional is not None:
+        return conditional
+    post = Post.objects.select_related('author', 'group').only(
+        *POST_FIELDS
+    ).get(pk=post.pk)
+    data = serialize_post(post)
+    data['tags'] = list(post.tags.names())
+    comments = cursor_page(
+        post.comments.select_related('author'),
+        after=decode_cursor(request.GET.get('comments_after')),
+        per_page=settings.NUM_COMMENTS_PER_PAGE,
+        date_field='created',
+    )
+    data['comments'] = [serialize_comment(comment) for comment in comments]
+    data['comments_next'] = _page_url(
+        request, 'comments_after', comments.next_cursor
+    )
+    return _json(data, etag, last_modified.timestamp())
@@ -0,0 +1,223 @@
+"""Общие помощники для команд-бенчмарков приложения posts."""
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+from taggit.models import Tag
+
+from . import rendering
+from .models import Follow, Group, Post, TaggedPost, User
+from .utils import chunked
+
+BATCH_SIZE = 5000
+
+# Кеши отключены: замеряется работа представлений и базы, а не
+# попадания в кеш страниц и карточек.
+DUMMY_CACHES = {
+    alias: {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}
+    for alias in ('default', 'shared')
+}
+# Рабочие кеши в памяти процесса - для тестов, которые проверяют
+# кеширование: файловый кеш в BASE_DIR/cache они не очищают
+# и не заполняют.
+LOCMEM_CACHES = {
+    'default': settings.CACHES['default'],
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'tests-shared',
+    },
+}
+
+
+@contextmanager
+def benchmark_database(verbosity=0, name=None):
+    """
+    Временная тестовая база данных на время бенчмарка,
+    чтобы не засорять рабочую базу сгенерированными данными.
+    SQLite по умолчанию создаёт её в памяти; name задаёт путь к файлу.
+    """
+    old_name = connection.settings_dict['NAME']
+    test_settings = connection.settings_dict['TEST']
+    old_test_name = test_settings['NAME']
+    if name is not None:
+        test_settings['NAME'] = name
+    try:
+        connection.creation.create_test_db(
+            verbosity=verbosity, autoclobber=True, serialize=False
+        )
+        try:
+            yield
+        finally:
+            connection.creation.destroy_test_db(
+                old_name, verbosity=verbosity
+            )
+    finally:
+        test_settings['NAME'] = old_test_name
+
+
+def rendered(objs):
+    """
+    Заполняет text_html и excerpt постов или комментариев перед
+    bulk_create, который не вызывает save().
+    """
+    for obj in objs:
+        rendering.render(obj)
+        yield obj
+
+
+def seed_users(count, prefix='bench'):
+    User.objects.bulk_create(
+        (User(username=f'{prefix}{i}') for i in range(count)),
+        BATCH_SIZE
+    )
+    return list(User.objects.filter(username__startswith=prefix))
+
+
+def seed_groups(count):
+    Group.objects.bulk_create(
+        (Group(
+            title=f'Группа {i}', slug=f'group-{i}', description='-'
+        ) for i in range(count)),
+        BATCH_SIZE
+    )
+    return list(Group.objects.all())
+
+
+@contextmanager
+def explicit_pub_date():
+    """Временно отключает auto_now_add, чтобы задать pub_date вручную."""
+    field = Post._meta.get_field('pub_date')
+    field.auto_now_add = False
+    try:
+        yield
+    finally:
+        field.auto_now_add = True
+
+
+def seed_posts(count, authors, groups=(), text='Тестовый пост'):
+    """
+    Массовое создание постов с уникальными pub_date,
+    идущими в прошлое от текущего момента. text - строка
+    или функция от номера поста.
+    """
+    now = timezone.now()
+    groups = list(groups) or [None]
+    if not callable(text):
+        prefix = text
+
+        def text(i):
+            return f'{prefix} {i}'
+    objs = (Post(
+        text=text(i),
+        author=authors[i % len(authors)],
+        group=groups[i % len(groups)],
+        pub_date=now - timedelta(seconds=count - i),
+    ) for i in range(count))
+    with explicit_pub_date():
+        for batch in chunked(rendered(objs), BATCH_SIZE):
+            Post.objects.bulk_create(batch, BATCH_SIZE)
+    return count
+
+
+def seed_tags(count):
+    Tag.objects.bulk_create(
+        (Tag(name=f'tag{i}', slug=f'tag{i}') for i in range(count)),
+        BATCH_SIZE
+    )
+    return list(Tag.objects.values_list('pk', flat=True))
+
+
+def tag_posts(tag_ids, per_post, rng, weights=None):
+    """
+    Назначает каждому посту per_post различных тегов в обход
+    TaggableManager.add, случайно с весами weights.
+    """
+    post_ids = Post.objects.order_by('pk').values_list('pk', flat=True)
+
+    def items():
+        for post_id in post_ids.iterator():
+            chosen = set()
+            while len(chosen) < min(per_post, len(tag_ids)):
+                chosen.update(rng.choices(tag_ids, weights, k=per_post))
+            for tag_id in list(chosen)[:per_post]:
+                yield TaggedPost(content_object_id=post_id, tag_id=tag_id)
+
+    for batch in chunked(items(), BATCH_SIZE):
+        TaggedPost.objects.bulk_create(batch, BATCH_SIZE)
+
+
+def zipf_weights(count, exponent=1.0):
+    """Веса рангов 1..count по закону Ципфа."""
+    return [1 / rank ** exponent for rank in range(1, count + 1)]
+
+
+def seed_follows(users, per_user, rng, weights=None):
+    """
+    Каждый пользователь подписывается на per_user различных авторов
+    из users, выбранных с весами weights: при весах Ципфа число
+    подписчиков авторов распределено по степенному закону.
+    """
+    user_ids = [user.pk for user in users]
+    per_user = min(per_user, len(user_ids) - 1)
+
+    def follows():
+        for user_id in user_ids:
+            chosen = set()
+            while len(chosen) < per_user:
+                chosen.update(
+                    author_id for author_id in rng.choices(
+                        user_ids, weights, k=per_user
+                    ) if author_id != user_id
+                )
+            for author_id in list(chosen)[:per_user]:
+                yield Follow(user_id=user_id, author_id=author_id)
+
+    for batch in chunked(follows(), BATCH_SIZE):
+        Follow.objects.bulk_create(batch, BATCH_SIZE)
+
+
+def compare(results, baseline, threshold, min_delta_ms=1.0):
+    """
+    Регрессии results относительно baseline: время выросло больше
+    чем в 1 + threshold раз (и больше чем на min_delta_ms) или
+    выросло число запросов. Результаты - {набор: {метрика: {ms,
+    queries}}}; отсутствующие в baseline метрики не сравниваются.
+    """
+    regressions = []
+    for dataset, metrics in results.items():
+        for name, result in metrics.items():
+            old = baseline.get(dataset, {}).get(name)
+            if old is None:
+                continue
+            if (result['ms'] > old['ms'] * (1 + threshold)
+                    and result['ms'] - old['ms'] > min_delta_ms):
+                regressions.append(
+                    f'{dataset} {name}: {old["ms"]:.2f} -> '
+                    f'{result["ms"]:.2f} мс'
+                )
+            if result['queries'] > old['queries']:
+                regressions.append(
+                    f'{dataset} {name}: {old["queries"]} -> '
+                    f'{result["queries"]} запросов'
+                )
+    return regressions
+
+
+def analyze():
+    """Собирает статистику для планировщика после массовой загрузки."""
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+
+
+def timed(func, repeat=5):
+    """Медиана времени выполнения func в миллисекундах."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return timings[len(timings) // 2]
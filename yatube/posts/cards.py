@@ -0,0 +1,50 @@
+"""
+Кеш отрендеренных карточек постов в лентах.
+
+Ключ карточки включает id поста и его версию, поэтому устаревшие
+фрагменты не инвалидируются явно: при изменении поста, его тегов,
+группы или автора версия увеличивается и карточка рендерится заново.
+Карточки страницы читаются из кеша одним get_many.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F, prefetch_related_objects
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from .models import Post
+
+CARD_TEMPLATE = 'posts/includes/cards/{variant}.html'
+
+
+def card_key(post, variant):
+    return f'post-card:{variant}:{post.pk}:{post.version}'
+
+
+def bump_versions(posts):
+    """Увеличивает версию карточек для постов из queryset."""
+    posts.update(version=F('version') + 1)
+
+
+def bump_version(post):
+    bump_versions(Post.objects.filter(pk=post.pk))
+    post.version += 1
+
+
+def render_cards(posts, variant):
+    """Пары (пост, html карточки) для постов страницы."""
+    posts = list(posts)
+    keys = {post.pk: card_key(post, variant) for post in posts}
+    cached = cache.get_many(keys.values())
+    missing = [post for post in posts if keys[post.pk] not in cached]
+    if missing:
+        if variant == 'index':
+            prefetch_related_objects(missing, 'tags')
+        rendered = {
+            keys[post.pk]: render_to_string(
+                CARD_TEMPLATE.format(variant=variant), {'post': post}
+            ) for post in missing
+        }
+        cache.set_many(rendered, settings.POST_CARD_CACHE_TIMEOUT)
+        cached.update(rendered)
+    return [(post, mark_safe(cached[keys[post.pk]])) for post in posts]
@@ -0,0 +1,71 @@
+"""
+Условные GET-запросы (ETag/304) для HTML-страниц лент и поста.
+
+ETag строится без рендеринга и почти без обращений к базе:
+для лент - из ключа страницы в feed_cache (поколения области и
+'epoch', пользователь, путь с номером страницы или курсором), для
+поста - из его версии, числа комментариев, счётчика постов автора
+и версий похожих постов. Если ETag совпал с If-None-Match,
+сразу отдаётся 304, и ни кеш страниц, ни шаблоны не затрагиваются.
+Страницы зависят от пользователя, поэтому браузеру разрешено хранить
+их только у себя и перепроверять при каждом обращении.
+"""
+import hashlib
+
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import quote_etag
+
+from . import feed_cache
+from .models import Post, SimilarPost
+
+
+def _etag(value):
+    return quote_etag(hashlib.md5(value.encode()).hexdigest())
+
+
+def feed_etag(request, scope):
+    return _etag(feed_cache.page_key(request, scope))
+
+
+def post_etag(request, post_id):
+    """ETag страницы поста или None, если поста нет."""
+    post = Post.objects.filter(pk=post_id).values_list(
+        'version', 'comments_count', 'author__counters__posts_count'
+    ).first()
+    if post is None:
+        return None
+    similar = SimilarPost.objects.filter(post_id=post_id).values_list(
+        'similar_id', 'similar__version'
+    )
+    epoch = feed_cache.generations([feed_cache.EPOCH])[feed_cache.EPOCH]
+    user_id = request.user.pk if request.user.is_authenticated else 0
+    return _etag(f'post:{post_id}:{post}:{list(similar)}:{epoch}:{user_id}')
+
+
+def _not_modified(request, etag):
+    if etag is None:
+        return None
+    return get_conditional_response(request, etag=etag)
+
+
+def _with_validators(response, etag):
+    if etag is not None:
+        response.headers['ETag'] = etag
+        patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def conditional_page(request, etag, build):
+    """
+    Отдаёт 304, если страница у клиента не изменилась, иначе
+    ответ функции build с заголовком ETag. etag None - страницы
+    нет, build отдаст 404.
+    """
+    response = _not_modified(request, etag) or build()
+    return _with_validators(response, etag)
+
+
+async def aconditional_page(request, etag, build):
+    """Асинхронный вариант conditional_page; build - корутинная функция."""
+    response = _not_modified(request, etag) or await build()
+    return _with_validators(response, etag)
@@ -0,0 +1,135 @@
+"""
+Денормализованные счётчики постов, комментариев, подписок и тегов.
+
+Изменения выполняются одним UPDATE с F()-выражением, поэтому
+конкурентные запросы не теряют инкременты.
+"""
+from collections import defaultdict
+
+from django.db import router
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from taggit.models import Tag
+
+from .models import (
+    Comment, Follow, Post, TagCounter, TaggedPost, User, UserCounter
+)
+
+
+def change_user_counter(user_id, field, delta):
+    """Изменяет счётчик пользователя на delta."""
+    updated = UserCounter.objects.filter(user_id=user_id).update(
+        **{field: F(field) + delta}
+    )
+    if not updated and delta > 0:
+        UserCounter.objects.get_or_create(user_id=user_id)
+        UserCounter.objects.filter(user_id=user_id).update(
+            **{field: F(field) + delta}
+        )
+
+
+def change_comments_count(post_id, delta):
+    """Изменяет счётчик комментариев поста на delta."""
+    Post.objects.filter(pk=post_id).update(
+        comments_count=F('comments_count') + delta
+    )
+
+
+def _group_by_delta(deltas):
+    grouped = defaultdict(list)
+    for pk, delta in deltas.items():
+        if delta:
+            grouped[delta].append(pk)
+    return grouped.items()
+
+
+def change_user_counters(field, deltas):
+    """
+    Массовое изменение счётчика field: deltas - {user_id: приращение}.
+    Один UPDATE на каждое различное приращение.
+    """
+    missing = set(deltas) - set(UserCounter.objects.filter(
+        user_id__in=list(deltas)
+    ).values_list('user_id', flat=True))
+    UserCounter.objects.bulk_create(
+        [UserCounter(user_id=user_id) for user_id in missing],
+        1000,
+        ignore_conflicts=True
+    )
+    for delta, user_ids in _group_by_delta(deltas):
+        UserCounter.objects.filter(user_id__in=user_ids).update(
+            **{field: F(field) + delta}
+        )
+
+
+def change_comments_counts(deltas):
+    """Массовое изменение счётчиков комментариев: {post_id: приращение}."""
+    for delta, post_ids in _group_by_delta(deltas):
+        Post.objects.filter(pk__in=post_ids).update(
+            comments_count=F('comments_count') + delta
+        )
+
+
+def change_tag_counters(deltas):
+    """Массовое изменение числа постов тегов: {tag_id: приращение}."""
+    missing = set(deltas) - set(TagCounter.objects.filter(
+        tag_id__in=list(deltas)
+    ).values_list('tag_id', flat=True))
+    TagCounter.objects.bulk_create(
+        [TagCounter(tag_id=tag_id) for tag_id in missing],
+        1000,
+        ignore_conflicts=True
+    )
+    for delta, tag_ids in _group_by_delta(deltas):
+        TagCounter.objects.filter(tag_id__in=tag_ids).update(
+            posts_count=F('posts_count') + delta
+        )
+
+
+def get_user_counter(user):
+    """Счётчики пользователя; создаёт запись, если её ещё нет."""
+    try:
+        return user.counters
+    except UserCounter.DoesNotExist:
+        # Создание и повторное чтение - в базе для записи, а не на
+        # отстающей реплике.
+        counter, _ = UserCounter.objects.db_manager(
+            router.db_for_write(UserCounter)
+        ).get_or_create(user=user)
+        return counter
+
+
+def _count(queryset, field):
+    return Coalesce(Subquery(
+        queryset.filter(**{field: OuterRef('pk')}).order_by().values(
+            field
+        ).annotate(total=Count('pk')).values('total')
+    ), Value(0))
+
+
+def repair():
+    """Пересчитывает все счётчики одним проходом по каждой таблице."""
+    missing = User.objects.filter(counters__isnull=True).values_list(
+        'pk', flat=True
+    )
+    UserCounter.objects.bulk_create(
+        [UserCounter(user_id=user_id) for user_id in missing], 1000
+    )
+    # Первичный ключ UserCounter - это id пользователя.
+    UserCounter.objects.update(
+        posts_count=_count(Post.objects.all(), 'author'),
+        followers_count=_count(Follow.objects.all(), 'author'),
+        following_count=_count(Follow.objects.all(), 'user'),
+    )
+    Post.objects.update(
+        comments_count=_count(Comment.objects.all(), 'post')
+    )
+    TagCounter.objects.bulk_create(
+        [TagCounter(tag_id=tag_id) for tag_id in Tag.objects.filter(
+            counter__isnull=True
+        ).values_list('pk', flat=True)],
+        1000
+    )
+    TagCounter.objects.update(
+        posts_count=_count(TaggedPost.objects.all(), 'tag')
+    )
@@ -0,0 +1,83 @@
+"""
+Потоковая выгрузка постов в NDJSON (по JSON-объекту на строку).
+
+Посты читаются окнами по первичному ключу (pk > последнего
+выгруженного), внутри окна - iterator(chunk_size) с предзагрузкой
+тегов и комментариев на каждый chunk. Ни выборка целиком, ни
+результат не держатся в памяти, поэтому размер таблицы не важен.
+"""
+import json
+import zlib
+
+from django.db.models import Prefetch
+
+from .models import Comment, Post
+
+CHUNK_SIZE = 1000
+
+
+def export_queryset(author=None, group=None):
+    posts = Post.objects.select_related('author', 'group').prefetch_related(
+        'tags',
+        Prefetch(
+            'comments',
+            queryset=Comment.objects.select_related('author').order_by(
+                'created', 'pk'
+            )
+        ),
+    )
+    if author is not None:
+        posts = posts.filter(author=author)
+    if group is not None:
+        posts = posts.filter(group=group)
+    return posts
+
+
+def iter_posts(queryset, chunk_size=CHUNK_SIZE):
+    """Посты queryset по возрастанию id окнами по chunk_size."""
+    last_pk = 0
+    while True:
+        window = queryset.filter(pk__gt=last_pk).order_by('pk')[:chunk_size]
+        count = 0
+        for post in window.iterator(chunk_size=chunk_size):
+            count += 1
+            last_pk = post.pk
+            yield post
+        if count < chunk_size:
+            return
+
+
+def serialize_post(post):
+    return {
+        'id': post.pk,
+        'author': post.author.username,
+        'group': post.group.slug if post.group else None,
+        'text': post.text,
+        'pub_date': post.pub_date.isoformat(),
+        'image': post.image.name or None,
+        'tags': [tag.name for tag in post.tags.all()],
+        'comments': [{
+            'id': comment.pk,
+            'author': comment.author.username,
+            'text': comment.text,
+            'created': comment.created.isoformat(),
+        } for comment in post.comments.all()],
+    }
+
+
+def ndjson_lines(posts):
+    """Строки NDJSON в байтах."""
+    for post in posts:
+        yield json.dumps(
+            serialize_post(post), ensure_ascii=False, separators=(',', ':')
+        ).encode() + b'\n'
+
+
+def gzip_stream(chunks, level=6):
+    """Сжатие потока байтов в формат gzip на лету."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
@@ -0,0 +1,101 @@
+"""
+Кеш страниц лент с инвалидацией по событиям.
+
+Ключ страницы содержит номера поколений её области видимости
+('all', 'tag:<id>', 'group:<id>', 'author:<id>') и общего поколения
+'epoch'. Сигналы сохранения и удаления постов, комментариев и тегов
+увеличивают поколения затронутых областей, поэтому страницы можно
+хранить часами и при этом не показывать устаревшие данные: старые
+ключи просто перестают запрашиваться и вытесняются кешем.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponse
+
+from core.cache import SingleFlight
+from core.replicas import primary_reads
+
+EPOCH = 'epoch'
+
+single_flight = SingleFlight(cache)
+
+
+def _generation_key(scope):
+    return f'feed-gen:{scope}'
+
+
+def generations(scopes):
+    """Текущие поколения областей; отсутствующие заводятся заново."""
+    keys = {scope: _generation_key(scope) for scope in scopes}
+    values = cache.get_many(keys.values())
+    result = {}
+    for scope, key in keys.items():
+        if key not in values:
+            # Начальное значение от времени, чтобы после вытеснения
+            # поколения не совпасть со старыми ключами страниц.
+            cache.add(key, time.time_ns(), None)
+            values[key] = cache.get(key)
+        result[scope] = values[key]
+    return result
+
+
+def bump(*scopes):
+    """
+    Инвалидирует страницы перечисленных областей после фиксации
+    текущей транзакции. Если поднять поколение раньше, параллельный
+    запрос успеет построить страницу нового поколения из ещё не
+    зафиксированных данных, и она останется в кеше на
+    FEED_CACHE_TIMEOUT.
+    """
+    scopes = set(scopes)
+    transaction.on_commit(lambda: _bump(scopes))
+
+
+def _bump(scopes):
+    for scope in scopes:
+        key = _generation_key(scope)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, time.time_ns(), None)
+
+
+def post_scopes(post, tag_ids=()):
+    """Области лент, в которых выводится пост."""
+    scopes = ['all', f'author:{post.author_id}']
+    if post.group_id:
+        scopes.append(f'group:{post.group_id}')
+    scopes.extend(f'tag:{tag_id}' for tag_id in tag_ids)
+    return scopes
+
+
+def page_key(request, scope):
+    gens = generations([EPOCH, scope])
+    user_id = request.user.pk if request.user.is_authenticated else 0
+    path = hashlib.md5(request.get_full_path().encode()).hexdigest()
+    return f'feed-page:{scope}:{gens[EPOCH]}:{gens[scope]}:{user_id}:{path}'
+
+
+def cached_feed(request, scope, build):
+    """
+    Возвращает страницу ленты из кеша или строит её функцией build.
+    Пересчёт истёкшей страницы выполняет один процесс, остальные
+    в это время отдают предыдущую версию.
+    """
+    built = {}
+
+    def compute():
+        with primary_reads():
+            response = built['response'] = build()
+        return response.content, response['Content-Type']
+
+    content, content_type = single_flight.get_or_compute(
+        page_key(request, scope), compute, settings.FEED_CACHE_TIMEOUT
+    )
+    if 'response' in built:
+        return built['response']
+    return HttpResponse(content, content_type=content_type)
@@ -1,7 +1,7 @@
 from django import forms
 from django.forms import Textarea
 
-from .models import Post, Comment
+from .models import Group, Post, Comment
 
 
 class PostForm(forms.ModelForm):
@@ -38,3 +38,15 @@ class EmailPostForm(forms.Form):
     email = forms.EmailField()
     to = forms.EmailField()
     comments = forms.CharField(required=False, widget=Textarea)
+
+
+class SearchForm(forms.Form):
+    """Форма поиска по постам."""
+    q = forms.CharField(label='Запрос', max_length=200)
+    group = forms.ModelChoiceField(
+        label='Группа',
+        queryset=Group.objects.all(),
+        to_field_name='slug',
+        required=False
+    )
+    tag = forms.SlugField(label='Тег', required=False)
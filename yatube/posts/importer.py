@@ -0,0 +1,430 @@
+"""
+Потоковый импорт постов, комментариев и подписок из NDJSON или CSV.
+
+Вход читается по строке и обрабатывается пакетами: авторы, группы
+и теги каждого пакета разрешаются несколькими запросами IN (...),
+записи создаются bulk_create в отдельной транзакции на пакет.
+Поскольку сигналы при массовой вставке не срабатывают, счётчики,
+ленты подписок и поисковый индекс обновляются для пакета целиком.
+Списки похожих постов после импорта пересобирает команда
+rebuild_similar_posts. Память зависит только от размера пакета.
+
+Формат записи (поле type - post, comment или follow):
+    {"type": "post", "id": 10, "author": "leo", "text": "...",
+     "group": "slug", "tags": ["a", "b"], "pub_date": "2023-01-01T10:00"}
+    {"type": "comment", "post": 10, "author": "leo", "text": "..."}
+    {"type": "follow", "user": "leo", "author": "anna"}
+id поста и даты необязательны; комментарии ссылаются на id поста.
+tags - список или строка через запятую. В CSV теги перечисляются
+через запятую, тип записей задаётся для всего файла. Записи с полями
+неверного типа пропускаются с ошибкой строки.
+"""
+import csv
+import json
+from collections import Counter, namedtuple
+from contextlib import contextmanager
+
+from django.contrib.auth.hashers import make_password
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from taggit.models import Tag
+
+from . import counters, feed_cache, rendering, search, timeline
+from .models import Comment, Follow, Group, Post, TaggedPost, User
+from .utils import chunked
+
+BATCH_SIZE = 5000
+MAX_ERRORS = 100
+RECORD_TYPES = ('post', 'comment', 'follow')
+ID_FIELDS = ('id', 'post')
+STRING_FIELDS = (
+    'type', 'author', 'user', 'group', 'text', 'pub_date', 'created'
+)
+
+
+class RecordError(ValueError):
+    """Запись не может быть импортирована."""
+
+
+def read_ndjson(stream):
+    """Пары (номер строки, запись) из NDJSON."""
+    for line_number, line in enumerate(stream, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield line_number, json.loads(line)
+        except json.JSONDecodeError as error:
+            yield line_number, RecordError(f'некорректный JSON: {error}')
+
+
+def read_csv(stream, record_type):
+    """Пары (номер строки, запись) из CSV с заголовком."""
+    for line_number, row in enumerate(csv.DictReader(stream), 2):
+        row['type'] = record_type
+        if 'tags' in row:
+            row['tags'] = _split_tags(row['tags'] or '')
+        yield line_number, row
+
+
+def _split_tags(value):
+    """Теги из строки через запятую."""
+    return [tag.strip() for tag in value.split(',') if tag.strip()]
+
+
+def _parse_id(value, field):
+    if isinstance(value, bool) or not isinstance(value, (int, str)):
+        raise RecordError(f'некорректное поле {field}: {value!r}')
+    try:
+        value = int(value)
+    except ValueError:
+        raise RecordError(f'некорректное поле {field}: {value!r}') from None
+    if value < 1:
+        raise RecordError(f'некорректное поле {field}: {value!r}')
+    return value
+
+
+def _parse_tags(value):
+    """Теги - список строк или строка через запятую, как в CSV."""
+    if not value:
+        return []
+    if isinstance(value, str):
+        return _split_tags(value)
+    if not isinstance(value, list) or not all(
+        isinstance(tag, str) for tag in value
+    ):
+        raise RecordError(f'некорректное поле tags: {value!r}')
+    return [tag.strip() for tag in value if tag.strip()]
+
+
+def _clean_record(record):
+    """
+    Проверяет типы полей записи: строковые поля - строки, id - целые
+    числа, теги - список. Возвращает копию записи с разобранными id
+    и тегами.
+    """
+    if not isinstance(record, dict):
+        raise RecordError('запись должна быть объектом JSON')
+    record = dict(record)
+    for field in STRING_FIELDS:
+        value = record.get(field)
+        if value is not None and not isinstance(value, str):
+            raise RecordError(f'поле {field} должно быть строкой')
+    for field in ID_FIELDS:
+        if record.get(field) not in (None, ''):
+            record[field] = _parse_id(record[field], field)
+    record['tags'] = _parse_tags(record.get('tags'))
+    return record
+
+
+@contextmanager
+def explicit_dates():
+    """Отключает auto_now_add, чтобы сохранить даты из файла."""
+    fields = [
+        Post._meta.get_field('pub_date'),
+        Comment._meta.get_field('created'),
+    ]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+def _parse_date(value):
+    if not value:
+        return timezone.now()
+    date = parse_datetime(value)
+    if date is None:
+        raise RecordError(f'некорректная дата: {value}')
+    if timezone.is_naive(date):
+        date = timezone.make_aware(date)
+    return date
+
+
+def _insert_rows(model, columns, rows):
+    """
+    Вставка одним подготовленным INSERT через executemany. bulk_create
+    на SQLite дробит пакет на INSERT по ~100 строк и собирает SQL
+    каждого из объектов модели, что в разы медленнее.
+    """
+    if not rows:
+        return
+    table = connection.ops.quote_name(model._meta.db_table)
+    names = ', '.join(connection.ops.quote_name(column) for column in columns)
+    placeholders = ', '.join(['%s'] * len(columns))
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f'INSERT INTO {table} ({names}) VALUES ({placeholders})', rows
+        )
+
+
+def _insert_posts(posts):
+    """
+    Вставляет посты и возвращает их с присвоенными id в исходном
+    порядке. Сначала вставляются посты с заданным id, затем остальные:
+    после первой записи транзакция удерживает блокировку записи SQLite,
+    поэтому последние len(auto) id таблицы принадлежат этому пакету.
+    """
+    explicit = [post for post in posts if post.pk]
+    auto = [post for post in posts if not post.pk]
+    adapt = connection.ops.adapt_datetimefield_value
+    columns = (
+        'text', 'text_html', 'excerpt', 'pub_date', 'author_id',
+        'group_id', 'image', 'comments_count', 'version'
+    )
+    _insert_rows(Post, ('id',) + columns, [
+        (post.pk, post.text, *rendering.render_row(post.text),
+         adapt(post.pub_date), post.author_id, post.group_id, '', 0, 1)
+        for post in explicit
+    ])
+    _insert_rows(Post, columns, [
+        (post.text, *rendering.render_row(post.text), adapt(post.pub_date),
+         post.author_id, post.group_id, '', 0, 1) for post in auto
+    ])
+    if not auto:
+        return posts
+    new_ids = iter(sorted(Post.objects.order_by('-pk').values_list(
+        'pk', flat=True
+    )[:len(auto)]))
+    # Вызывающий сопоставляет результат с записями по позиции.
+    return [post if post.pk else post._replace(pk=next(new_ids))
+            for post in posts]
+
+
+def _required(record, field):
+    value = record.get(field)
+    if value in (None, ''):
+        raise RecordError(f'не заполнено поле {field}')
+    return value
+
+
+# Поля поста, нужные для вставки и обновления производных данных.
+PostRow = namedtuple(
+    'PostRow', ('pk', 'text', 'author_id', 'group_id', 'pub_date')
+)
+
+
+class Importer:
+    """
+    Импорт потока записей. stats - число созданных записей по типам
+    и число пропущенных, errors - первые MAX_ERRORS ошибок.
+    """
+
+    def __init__(self, batch_size=BATCH_SIZE, create_users=False,
+                 index_search=True):
+        self.batch_size = batch_size
+        self.create_users = create_users
+        self.index_search = index_search
+        self.stats = Counter()
+        self.errors = []
+
+    def run(self, records):
+        """Импортирует записи; после каждого пакета отдаёт stats."""
+        with explicit_dates():
+            for batch in chunked(records, self.batch_size):
+                with transaction.atomic():
+                    self._import_batch(batch)
+                yield self.stats
+        # Новые записи могут попасть в любую ленту.
+        feed_cache.bump(feed_cache.EPOCH)
+
+    def _error(self, line_number, error):
+        self.stats['skipped'] += 1
+        if len(self.errors) < MAX_ERRORS:
+            self.errors.append(f'строка {line_number}: {error}')
+
+    def _import_batch(self, batch):
+        by_type = {record_type: [] for record_type in RECORD_TYPES}
+        for line_number, record in batch:
+            try:
+                if isinstance(record, Exception):
+                    raise record
+                record = _clean_record(record)
+                if record.get('type') not in by_type:
+                    raise RecordError(
+                        f'неизвестный тип {record.get("type")!r}'
+                    )
+            except RecordError as error:
+                self._error(line_number, error)
+                continue
+            by_type[record['type']].append((line_number, record))
+        users = self._resolve_users(
+            record[field]
+            for records in by_type.values()
+            for _, record in records
+            for field in ('author', 'user') if record.get(field)
+        )
+        self._import_posts(by_type['post'], users)
+        self._import_comments(by_type['comment'], users)
+        self._import_follows(by_type['follow'], users)
+
+    def _resolve_users(self, usernames):
+        usernames = set(usernames)
+        users = dict(User.objects.filter(
+            username__in=usernames
+        ).values_list('username', 'pk'))
+        missing = usernames - set(users)
+        if missing and self.create_users:
+            User.objects.bulk_create(
+                (User(username=username, password=make_password(None))
+                 for username in missing),
+                BATCH_SIZE
+            )
+            users.update(User.objects.filter(
+                username__in=missing
+            ).values_list('username', 'pk'))
+            self.stats['user'] += len(missing)
+        return users
+
+    def _user(self, users, record, field):
+        username = _required(record, field)
+        if username not in users:
+            raise RecordError(f'пользователь {username} не найден')
+        return users[username]
+
+    def _resolve_tags(self, names):
+        names = set(names)
+        tags = dict(Tag.objects.filter(
+            name__in=names
+        ).values_list('name', 'pk'))
+        missing = names - set(tags)
+        if missing:
+            Tag.objects.bulk_create(
+                (Tag(name=name, slug=Tag().slugify(name)) for name in missing),
+                BATCH_SIZE,
+                ignore_conflicts=True
+            )
+            tags.update(Tag.objects.filter(
+                name__in=missing
+            ).values_list('name', 'pk'))
+            # Совпавшие slug разных имён: Tag.save подберёт уникальный.
+            for name in missing - set(tags):
+                tags[name] = Tag.objects.create(name=name).pk
+        return tags
+
+    def _import_posts(self, records, users):
+        if not records:
+            return
+        groups = dict(Group.objects.filter(slug__in={
+            record['group'] for _, record in records if record.get('group')
+        }).values_list('slug', 'pk'))
+        taken = set(Post.objects.filter(pk__in={
+            record['id'] for _, record in records if record.get('id')
+        }).values_list('pk', flat=True))
+        posts, post_tags = [], []
+        for line_number, record in records:
+            try:
+                post_id = record.get('id') or None
+                if post_id in taken:
+                    raise RecordError(f'пост {post_id} уже существует')
+                group = record.get('group')
+                if group and group not in groups:
+                    raise RecordError(f'группа {group} не найдена')
+                post = PostRow(
+                    pk=post_id,
+                    text=_required(record, 'text'),
+                    author_id=self._user(users, record, 'author'),
+                    group_id=groups.get(group),
+                    pub_date=_parse_date(record.get('pub_date')),
+                )
+            except (RecordError, TypeError, ValueError) as error:
+                self._error(line_number, error)
+                continue
+            if post_id:
+                taken.add(post_id)
+            posts.append(post)
+            post_tags.append(set(record['tags']))
+        if not posts:
+            return
+        posts = _insert_posts(posts)
+        self.stats['post'] += len(posts)
+
+        tags = self._resolve_tags(
+            name for names in post_tags for name in names
+        )
+        _insert_rows(
+            TaggedPost,
+            ('content_object_id', 'tag_id'),
+            [(post.pk, tags[name])
+             for post, names in zip(posts, post_tags) for name in names]
+        )
+        counters.change_user_counters(
+            'posts_count', Counter(post.author_id for post in posts)
+        )
+        counters.change_tag_counters(Counter(
+            tags[name] for names in post_tags for name in names
+        ))
+        timeline.fan_out_many(posts)
+        if self.index_search:
+            search.index_posts(posts)
+
+    def _import_comments(self, records, users):
+        if not records:
+            return
+        post_ids = {
+            record.get('post') for _, record in records if record.get('post')
+        }
+        existing = set(Post.objects.filter(
+            pk__in=post_ids
+        ).values_list('pk', flat=True))
+        comments = []
+        for line_number, record in records:
+            try:
+                post_id = _required(record, 'post')
+                if post_id not in existing:
+                    raise RecordError(f'пост {post_id} не найден')
+                comment = Comment(
+                    post_id=post_id,
+                    author_id=self._user(users, record, 'author'),
+                    text=_required(record, 'text'),
+                    created=_parse_date(record.get('created')),
+                )
+                rendering.render(comment)
+                comments.append(comment)
+            except (RecordError, TypeError, ValueError) as error:
+                self._error(line_number, error)
+        Comment.objects.bulk_create(comments, self.batch_size)
+        self.stats['comment'] += len(comments)
+        deltas = Counter(comment.post_id for comment in comments)
+        counters.change_comments_counts(deltas)
+
+    def _import_follows(self, records, users):
+        if not records:
+            return
+        pairs = {}
+        for line_number, record in records:
+            try:
+                pair = (
+                    self._user(users, record, 'user'),
+                    self._user(users, record, 'author'),
+                )
+                if pair[0] == pair[1]:
+                    raise RecordError('подписка на самого себя')
+            except RecordError as error:
+                self._error(line_number, error)
+                continue
+            pairs[pair] = line_number
+        for user_id, author_id in Follow.objects.filter(
+            user_id__in={user_id for user_id, _ in pairs},
+            author_id__in={author_id for _, author_id in pairs},
+        ).values_list('user_id', 'author_id'):
+            if pairs.pop((user_id, author_id), None):
+                self.stats['skipped'] += 1
+        Follow.objects.bulk_create(
+            (Follow(user_id=user_id, author_id=author_id)
+             for user_id, author_id in pairs),
+            self.batch_size
+        )
+        self.stats['follow'] += len(pairs)
+        counters.change_user_counters(
+            'following_count', Counter(user_id for user_id, _ in pairs)
+        )
+        counters.change_user_counters(
+            'followers_count', Counter(author_id for _, author_id in pairs)
+        )
+        for user_id in {user_id for user_id, _ in pairs}:
+            timeline.rebuild(user_id)
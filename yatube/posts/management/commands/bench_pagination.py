@@ -0,0 +1,59 @@
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory
+
+from posts.benchmarks import benchmark_database, seed_posts, seed_users, timed
+from posts.models import Post
+from posts.pagination import encode_cursor, pagination
+from yatube.settings import NUM_POST_PER_PAGE
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнение постраничной (?page=N) и курсорной (?after=) '
+        'пагинации на большой сгенерированной таблице постов.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=100_000)
+        parser.add_argument('--authors', type=int, default=100)
+        parser.add_argument(
+            '--pages', type=int, nargs='+', default=[1, 10, 100, 1000, 5000]
+        )
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        with benchmark_database():
+            authors = seed_users(options['authors'])
+            seed_posts(options['posts'], authors)
+            self.stdout.write(
+                f'Постов в таблице: {options["posts"]}\n'
+                f'{"страница":>10} {"get_page, мс":>14} {"cursor, мс":>12}'
+            )
+            factory = RequestFactory()
+            posts = Post.objects.all()
+            last_page = options['posts'] // NUM_POST_PER_PAGE
+            for page in options['pages']:
+                if page > last_page:
+                    continue
+                page_request = factory.get('/', {'page': page})
+                offset_ms = timed(
+                    lambda: list(pagination(posts, page_request)),
+                    options['repeat']
+                )
+                cursor_request = factory.get('/')
+                if page > 1:
+                    anchor = posts.order_by('-pub_date', '-pk')[
+                        (page - 1) * NUM_POST_PER_PAGE - 1
+                    ]
+                    cursor_request = factory.get(
+                        '/', {'after': encode_cursor(anchor)}
+                    )
+                cursor_ms = timed(
+                    lambda: list(
+                        pagination(posts, cursor_request, keyset=True)
+                    ),
+                    options['repeat']
+                )
+                self.stdout.write(
+                    f'{page:>10} {offset_ms:>14.2f} {cursor_ms:>12.2f}'
+                )
@@ -0,0 +1,51 @@
+import random
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.template.loader import render_to_string
+from django.test import RequestFactory
+
+from posts.benchmarks import (
+    benchmark_database, seed_groups, seed_posts, seed_tags, seed_users,
+    tag_posts, timed
+)
+from posts.models import Post
+from posts.pagination import pagination
+
+
+class Command(BaseCommand):
+    help = (
+        'Время рендеринга страницы ленты с холодным и тёплым кешем '
+        'карточек постов.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=1000)
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        with benchmark_database():
+            authors = seed_users(10)
+            seed_posts(options['posts'], authors, seed_groups(5))
+            tag_posts(seed_tags(50), 3, random.Random(1))
+            request = RequestFactory().get('/')
+            request.user = authors[0]
+            page_obj = pagination(
+                Post.objects.select_related('author', 'group'), request
+            )
+            context = {'page_obj': page_obj, 'request': request}
+
+            def render():
+                render_to_string('posts/index.html', context)
+
+            def render_cold():
+                cache.clear()
+                render()
+
+            cold_ms = timed(render_cold, options['repeat'])
+            render()
+            warm_ms = timed(render, options['repeat'])
+        self.stdout.write(
+            f'Рендеринг index, холодный кеш: {cold_ms:.2f} мс\n'
+            f'Рендеринг index, тёплый кеш: {warm_ms:.2f} мс'
+        )
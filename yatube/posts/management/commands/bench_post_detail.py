@@ -0,0 +1,137 @@
+import http.client
+import random
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+from django.urls import path
+
+from posts import counters, similar, views
+from posts.benchmarks import (
+    analyze, benchmark_database, rendered, seed_posts, seed_tags, seed_users,
+    tag_posts
+)
+from posts.models import Comment, Post
+from yatube.urls import urlpatterns as site_urlpatterns
+
+# Оба варианта страницы поста рядом с маршрутами сайта, на которые
+# ссылается шаблон; подключаются через ROOT_URLCONF на время замера.
+urlpatterns = [
+    path('bench/sync/<int:post_id>/', views.post_detail),
+    path('bench/async/<int:post_id>/', views.post_detail_async),
+] + site_urlpatterns
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def load(port, paths, clients, requests):
+    """
+    clients потоков с keep-alive соединениями делают по requests
+    запросов; возвращает (запросов в секунду, p50 мс, p95 мс).
+    """
+    def client(paths):
+        connection = http.client.HTTPConnection('127.0.0.1', port)
+        latencies = []
+        for url in paths:
+            start = time.perf_counter()
+            connection.request('GET', url)
+            response = connection.getresponse()
+            response.read()
+            if response.status != 200:
+                raise CommandError(f'{url}: статус {response.status}')
+            latencies.append((time.perf_counter() - start) * 1000)
+        connection.close()
+        return latencies
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(clients) as executor:
+        results = executor.map(client, [
+            paths[i::clients][:requests] for i in range(clients)
+        ])
+        latencies = sorted(sum(results, []))
+    elapsed = time.perf_counter() - start
+    return (
+        len(latencies) / elapsed,
+        latencies[len(latencies) // 2],
+        latencies[int(len(latencies) * 0.95)],
+    )
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнение синхронной и асинхронной страницы поста под '
+        'конкурентной нагрузкой на локальном ASGI-сервере (uvicorn).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=20_000)
+        parser.add_argument('--tags', type=int, default=500)
+        parser.add_argument('--comments', type=int, default=20)
+        parser.add_argument('--sample', type=int, default=200)
+        parser.add_argument('--clients', type=int, default=16)
+        parser.add_argument('--requests', type=int, default=100)
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        try:
+            import uvicorn
+        except ImportError:
+            raise CommandError('Для бенчмарка нужен uvicorn.')
+        rng = random.Random(options['seed'])
+        with benchmark_database(), override_settings(
+            ROOT_URLCONF=__name__, DEBUG=False, ALLOWED_HOSTS=['*']
+        ):
+            authors = seed_users(100)
+            seed_posts(options['posts'], authors)
+            tag_posts(seed_tags(options['tags']), 3, rng)
+            sample = rng.sample(
+                list(Post.objects.values_list('pk', flat=True)),
+                options['sample']
+            )
+            similar.rebuild(sample)
+            Comment.objects.bulk_create(rendered(
+                Comment(post_id=post_id, author=rng.choice(authors),
+                        text=f'Комментарий {i}')
+                for post_id in sample for i in range(options['comments'])
+            ))
+            # Строки счётчиков заранее: иначе первые запросы создают
+            # их параллельно и упираются в блокировку таблицы.
+            counters.repair()
+            analyze()
+
+            port = free_port()
+            server = uvicorn.Server(uvicorn.Config(
+                get_asgi_application(), port=port, log_level='warning',
+                lifespan='off'
+            ))
+            thread = threading.Thread(target=server.run, daemon=True)
+            thread.start()
+            while not server.started:
+                time.sleep(0.05)
+            total = options['clients'] * options['requests']
+            try:
+                for variant in ('sync', 'async'):
+                    paths = [
+                        f'/bench/{variant}/{rng.choice(sample)}/'
+                        for _ in range(total)
+                    ]
+                    load(port, paths[:options['clients'] * 5],
+                         options['clients'], 5)
+                    rps, p50, p95 = load(
+                        port, paths, options['clients'], options['requests']
+                    )
+                    self.stdout.write(
+                        f'{variant}: {rps:.0f} запросов/с, '
+                        f'p50 {p50:.1f} мс, p95 {p95:.1f} мс'
+                    )
+            finally:
+                server.should_exit = True
+                thread.join()
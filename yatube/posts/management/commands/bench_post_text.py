@@ -0,0 +1,95 @@
+import random
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.template import loader
+
+from posts.benchmarks import (
+    benchmark_database, rendered, seed_posts, seed_tags, seed_users,
+    tag_posts, timed
+)
+from posts.models import Comment, Post
+
+CARD = 'posts/includes/cards/index.html'
+COMMENT = 'posts/includes/comment.html'
+# Как шаблоны выводили текст до появления text_html.
+FILTERS = {
+    CARD: ('{{ post.text_html|safe }}', '{{ post.text|linebreaksbr }}'),
+    COMMENT: (
+        '{{ comment.text_html|safe }}', '{{ comment.text|linebreaksbr }}'
+    ),
+}
+
+
+def long_text(i, chars, lines):
+    # Кавычки, амперсанды и угловые скобки: экранирование тоже
+    # входит в работу linebreaksbr.
+    line = f'Пост {i}: "цитата" & <разметка> пользователя. '
+    line = (line * (chars // lines // len(line) + 1))[:chars // lines]
+    return '\n'.join([line] * lines)
+
+
+def templates(name):
+    """Шаблон с готовым HTML и тот же шаблон с фильтрами."""
+    template = loader.get_template(name)
+    source = template.template.source
+    return {
+        'готовый HTML': template,
+        'фильтры': template.backend.from_string(
+            source.replace(*FILTERS[name])
+        ),
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        'Время рендеринга страницы длинных постов и комментариев: '
+        'linebreaksbr при каждом показе против HTML, отрендеренного '
+        'при сохранении.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chars', type=int, default=5000,
+            help='Длина текста поста или комментария.'
+        )
+        parser.add_argument(
+            '--lines', type=int, default=50,
+            help='Число строк в тексте.'
+        )
+        parser.add_argument('--repeat', type=int, default=50)
+
+    def handle(self, *args, **options):
+        chars, lines = options['chars'], options['lines']
+        with benchmark_database():
+            authors = seed_users(10)
+            seed_posts(
+                settings.NUM_POST_PER_PAGE, authors,
+                text=lambda i: long_text(i, chars, lines)
+            )
+            tag_posts(seed_tags(10), 3, random.Random(1))
+            posts = list(
+                Post.objects.select_related('author', 'group')
+                .prefetch_related('tags')
+            )
+            Comment.objects.bulk_create(rendered(
+                Comment(post=posts[0], author=authors[i % len(authors)],
+                        text=long_text(i, chars, lines))
+                for i in range(settings.NUM_COMMENTS_PER_PAGE)
+            ))
+            comments = list(
+                Comment.objects.filter(post=posts[0]).select_related('author')
+            )
+            pages = (
+                ('карточки постов', CARD, 'post', posts),
+                ('комментарии', COMMENT, 'comment', comments),
+            )
+            for title, name, variable, objects in pages:
+                self.stdout.write(f'Страница: {title} ({len(objects)} шт.)')
+                for variant, template in templates(name).items():
+                    def render(template=template):
+                        for obj in objects:
+                            template.render({variable: obj})
+
+                    ms = timed(render, options['repeat'])
+                    self.stdout.write(f'{variant:>14}: {ms:.2f} мс')
@@ -0,0 +1,97 @@
+import random
+import time
+from itertools import accumulate
+
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from posts import search
+from posts.benchmarks import (
+    analyze, benchmark_database, seed_groups, seed_posts, seed_users, timed
+)
+from posts.models import Post
+
+SYLLABLES = (
+    'ка ко ро ма на ли то се ве да ре ни по ло бу ру ды жи зо ми'
+).split()
+ENDINGS = ('', 'а', 'ы', 'ом', 'ами', 'ах', 'ой', 'е')
+
+
+def make_vocabulary(size, rng):
+    """Различные псевдослова из двух-четырёх слогов."""
+    words = set()
+    while len(words) < size:
+        words.add(''.join(rng.choices(SYLLABLES, k=rng.randint(2, 4))))
+    return sorted(words, key=lambda word: rng.random())
+
+
+def like_search(query, group=None):
+    """Прежний способ: LIKE '%...%' по каждому слову запроса."""
+    condition = Q()
+    for word in query.split():
+        condition &= Q(text__icontains=word)
+    posts = Post.objects.filter(condition)
+    if group is not None:
+        posts = posts.filter(group=group)
+    return list(posts.order_by('-pub_date')[:10])
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнение поиска по LIKE с полнотекстовым индексом FTS5 '
+        'на сгенерированных постах.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=1_000_000)
+        parser.add_argument('--words', type=int, default=30)
+        parser.add_argument('--vocabulary', type=int, default=20_000)
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        with benchmark_database():
+            authors = seed_users(100)
+            groups = seed_groups(10)
+            vocabulary = make_vocabulary(options['vocabulary'], rng)
+            # Частоты слов по закону Ципфа, как в естественном тексте.
+            cum_weights = list(accumulate(
+                1 / rank for rank in range(1, len(vocabulary) + 1)
+            ))
+            words = options['words']
+            seed_posts(
+                options['posts'], authors, groups,
+                text=lambda i: ' '.join(
+                    word + rng.choice(ENDINGS) for word in rng.choices(
+                        vocabulary, cum_weights=cum_weights, k=words
+                    )
+                )
+            )
+            start = time.perf_counter()
+            search.reindex()
+            reindex_s = time.perf_counter() - start
+            analyze()
+            # Частое слово, слово средней частоты, редкое и пара слов.
+            queries = [
+                vocabulary[0], vocabulary[100], vocabulary[5000],
+                f'{vocabulary[10]}ами {vocabulary[50]}',
+            ]
+            self.stdout.write(
+                f'Постов: {options["posts"]}, '
+                f'индексация: {reindex_s:.1f} с'
+            )
+            for query in queries:
+                like_ms = timed(lambda: like_search(query), 3)
+                fts_ms = timed(lambda: search.search_ids(query), 3)
+                group_like_ms = timed(
+                    lambda: like_search(query, groups[0]), 3
+                )
+                group_fts_ms = timed(
+                    lambda: search.search_ids(query, group=groups[0]), 3
+                )
+                self.stdout.write(
+                    f'"{query}": LIKE {like_ms:.1f} мс, '
+                    f'FTS5 {fts_ms:.1f} мс; с группой: '
+                    f'LIKE {group_like_ms:.1f} мс, '
+                    f'FTS5 {group_fts_ms:.1f} мс'
+                )
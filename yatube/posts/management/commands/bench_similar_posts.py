@@ -0,0 +1,66 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+
+from posts import similar
+from posts.benchmarks import (
+    analyze, benchmark_database, seed_posts, seed_tags, seed_users,
+    tag_posts, timed
+)
+from posts.models import Post
+
+
+def aggregate_similar(post):
+    """Прежний способ: агрегация по общим тегам на каждый запрос."""
+    post_tags_ids = post.tags.values_list('id', flat=True)
+    return list(Post.objects.filter(
+        tags__in=post_tags_ids
+    ).exclude(id=post.id).annotate(
+        same_tags=Count('tags')
+    ).order_by('-same_tags', '-pub_date')[:3])
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнение агрегации похожих постов по тегам с чтением '
+        'предрассчитанного списка.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=100_000)
+        parser.add_argument('--tags', type=int, default=5_000)
+        parser.add_argument('--tags-per-post', type=int, default=3)
+        parser.add_argument('--sample', type=int, default=50)
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        with benchmark_database():
+            authors = seed_users(100)
+            seed_posts(options['posts'], authors)
+            tag_ids = seed_tags(options['tags'])
+            tag_posts(tag_ids, options['tags_per_post'], rng)
+            analyze()
+            sample = rng.sample(
+                list(Post.objects.values_list('pk', flat=True)),
+                options['sample']
+            )
+            start = time.perf_counter()
+            similar.rebuild(sample)
+            rebuild_ms = (time.perf_counter() - start) * 1000
+            posts = list(Post.objects.filter(pk__in=sample))
+            aggregate_ms = timed(
+                lambda: [aggregate_similar(post) for post in posts], 3
+            ) / len(posts)
+            lookup_ms = timed(
+                lambda: [similar.similar_posts(post) for post in posts], 3
+            ) / len(posts)
+        self.stdout.write(
+            f'Постов: {options["posts"]}, тегов: {options["tags"]}\n'
+            f'Агрегация на запрос: {aggregate_ms:.3f} мс\n'
+            f'Предрассчитанный список: {lookup_ms:.3f} мс\n'
+            f'Пересчёт списка: '
+            f'{rebuild_ms / len(sample):.3f} мс на пост'
+        )
@@ -0,0 +1,160 @@
+import os
+import random
+import tempfile
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connection, connections
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from posts import counters
+from posts.benchmarks import (
+    DUMMY_CACHES, analyze, benchmark_database, seed_groups, seed_posts,
+    seed_users
+)
+from posts.models import Post
+
+# (PRAGMA, CONN_MAX_AGE, CONN_HEALTH_CHECKS) профилей из settings.py.
+PROFILES = {
+    'development': ({}, 0, False),
+    'production': (settings.SQLITE_PRODUCTION_PRAGMAS, 600, True),
+}
+
+
+def worker(make_request, deadline):
+    """
+    Повторяет make_request до deadline; возвращает (Counter исходов,
+    задержки успешных запросов в мс).
+    """
+    stats = Counter()
+    latencies = []
+    try:
+        while time.monotonic() < deadline:
+            start = time.perf_counter()
+            try:
+                response = make_request()
+            except OperationalError:
+                # "database is locked": блокировку не дождались.
+                stats['locked'] += 1
+                continue
+            if response.status_code in (200, 302):
+                stats['ok'] += 1
+                latencies.append((time.perf_counter() - start) * 1000)
+            else:
+                stats['error'] += 1
+    finally:
+        connections.close_all()
+    return stats, latencies
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(int(len(values) * fraction), len(values) - 1)]
+
+
+class Command(BaseCommand):
+    help = (
+        'Конкурентная нагрузка на файловую базу SQLite: читатели '
+        'открывают главную страницу, писатели добавляют комментарии. '
+        'Сравнивает профили базы development и production.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=20_000)
+        parser.add_argument('--readers', type=int, default=8)
+        parser.add_argument('--writers', type=int, default=4)
+        parser.add_argument(
+            '--seconds', type=float, default=10,
+            help='Длительность нагрузки для каждого профиля.'
+        )
+        parser.add_argument(
+            '--profiles', nargs='+', choices=PROFILES,
+            default=list(PROFILES)
+        )
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        for profile in options['profiles']:
+            with tempfile.TemporaryDirectory() as directory:
+                results = self._run(profile, directory, options)
+            self._report(profile, results)
+
+    def _run(self, profile, directory, options):
+        pragmas, max_age, health_checks = PROFILES[profile]
+        rng = random.Random(options['seed'])
+        database = connection.settings_dict
+        old = database['CONN_MAX_AGE'], database['CONN_HEALTH_CHECKS']
+        # Соединения потоков создаются из этого же словаря настроек.
+        database['CONN_MAX_AGE'] = max_age
+        database['CONN_HEALTH_CHECKS'] = health_checks
+        try:
+            with override_settings(
+                SQLITE_PRAGMAS=pragmas, CACHES=DUMMY_CACHES, DEBUG=False,
+                METRICS_DIR=os.path.join(directory, 'metrics')
+            ), benchmark_database(name=os.path.join(directory, 'bench.db')):
+                users = seed_users(100)
+                seed_posts(options['posts'], users, seed_groups(10))
+                counters.repair()
+                analyze()
+                post_ids = list(Post.objects.values_list('pk', flat=True))
+                pages = options['posts'] // settings.NUM_POST_PER_PAGE
+                index = reverse('posts:index')
+
+                readers = []
+                for _ in range(options['readers']):
+                    client = Client()
+                    readers.append(lambda client=client: client.get(
+                        index, {'page': rng.randint(1, pages)}
+                    ))
+                writers = []
+                for user in users[:options['writers']]:
+                    client = Client()
+                    client.force_login(user)
+                    writers.append(lambda client=client: client.post(
+                        reverse(
+                            'posts:add_comment', args=[rng.choice(post_ids)]
+                        ),
+                        {'text': 'Комментарий'}
+                    ))
+                # Главный поток держит соединение открытым только на
+                # время подготовки данных.
+                connections.close_all()
+
+                deadline = time.monotonic() + options['seconds']
+                with ThreadPoolExecutor(len(readers) + len(writers)) as pool:
+                    futures = [
+                        (role, pool.submit(worker, make_request, deadline))
+                        for role, requests in (
+                            ('read', readers), ('write', writers)
+                        )
+                        for make_request in requests
+                    ]
+                    results = {}
+                    for role, future in futures:
+                        stats, latencies = future.result()
+                        total, all_latencies = results.setdefault(
+                            role, (Counter(), [])
+                        )
+                        total.update(stats)
+                        all_latencies.extend(latencies)
+                return results, options['seconds']
+        finally:
+            database['CONN_MAX_AGE'], database['CONN_HEALTH_CHECKS'] = old
+
+    def _report(self, profile, results):
+        results, seconds = results
+        self.stdout.write(f'Профиль {profile}:')
+        for role, (stats, latencies) in results.items():
+            self.stdout.write(
+                f'{role:>6}: {stats["ok"] / seconds:>7.1f} запросов/с, '
+                f'p50 {percentile(latencies, 0.5):.1f} мс, '
+                f'p95 {percentile(latencies, 0.95):.1f} мс, '
+                f'блокировок {stats["locked"]}, ошибок {stats["error"]}'
+            )
@@ -0,0 +1,168 @@
+import json
+import platform
+import random
+import tempfile
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from core import metrics
+from posts import counters, similar, timeline
+from posts.benchmarks import (
+    DUMMY_CACHES, analyze, benchmark_database, compare, rendered,
+    seed_follows, seed_groups, seed_posts, seed_tags, seed_users, tag_posts,
+    timed, zipf_weights
+)
+from posts.models import Comment, Follow, Post, User
+
+
+def seed_dataset(posts, options, rng):
+    """Набор данных на posts постов; возвращает адреса для замера."""
+    users = seed_users(max(100, posts // 100))
+    author_weights = zipf_weights(len(users))
+    groups = seed_groups(10)
+    # Авторы постов тоже распределены по Ципфу: у популярных авторов
+    # и постов, и подписчиков больше.
+    authors = rng.choices(users, author_weights, k=posts)
+    seed_posts(posts, authors, groups)
+    tag_ids = seed_tags(options['tags'])
+    tag_posts(
+        tag_ids, options['tags_per_post'], rng,
+        zipf_weights(len(tag_ids))
+    )
+    seed_follows(users, options['follows_per_user'], rng, author_weights)
+    counters.repair()
+
+    top_author = users[0]
+    reader = User.objects.get(
+        pk=Follow.objects.values('user').order_by('user').first()['user']
+    )
+    timeline.rebuild(reader.pk)
+    post = Post.objects.filter(author=top_author).order_by('pk').first()
+    Comment.objects.bulk_create(rendered(
+        Comment(post=post, author=rng.choice(users), text=f'Комментарий {i}')
+        for i in range(options['comments'])
+    ))
+    similar.rebuild([post.pk])
+    analyze()
+    return reader, {
+        'index': reverse('posts:index'),
+        'index_page_100': reverse('posts:index') + '?page=100',
+        'tag': reverse('posts:post_list_by_tag', args=['tag0']),
+        'group_posts': reverse('posts:group_list', args=[groups[0].slug]),
+        'profile': reverse('posts:profile', args=[top_author.username]),
+        'follow_index': reverse('posts:follow_index'),
+        'post_detail': reverse('posts:post_detail', args=[post.pk]),
+    }
+
+
+def measure(client, url, repeat):
+    # CaptureQueriesContext не подходит: журнал запросов очищается
+    # в начале каждого запроса к клиенту.
+    request_metrics, token = metrics.start_request()
+    try:
+        with connection.execute_wrapper(request_metrics):
+            response = client.get(url)
+    finally:
+        metrics.finish_request(token)
+    if response.status_code != 200:
+        raise CommandError(f'{url}: статус {response.status_code}')
+    return {
+        'ms': round(timed(lambda: client.get(url), repeat), 3),
+        'queries': request_metrics.queries,
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        'Замер времени и числа запросов основных страниц на '
+        'сгенерированных наборах данных разного размера. Результаты '
+        'пишутся в JSON и сравниваются с сохранённым базовым замером.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', type=int, nargs='+', default=[10_000, 100_000],
+            help='Размеры наборов данных в постах.'
+        )
+        parser.add_argument('--tags', type=int, default=1000)
+        parser.add_argument('--tags-per-post', type=int, default=2)
+        parser.add_argument('--follows-per-user', type=int, default=20)
+        parser.add_argument('--comments', type=int, default=50)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--output', help='Куда записать JSON.')
+        parser.add_argument(
+            '--baseline', help='JSON предыдущего замера для сравнения.'
+        )
+        parser.add_argument(
+            '--threshold', type=float, default=0.2,
+            help='Допустимый относительный рост времени (0.2 = 20%%).'
+        )
+        parser.add_argument(
+            '--min-delta', type=float, default=1.0,
+            help='Рост времени меньше этого числа мс не считается.'
+        )
+
+    def handle(self, *args, **options):
+        results = {}
+        with tempfile.TemporaryDirectory() as metrics_dir, override_settings(
+            CACHES=DUMMY_CACHES, METRICS_DIR=metrics_dir, DEBUG=False
+        ):
+            for size in options['sizes']:
+                # Одинаковый seed даёт одинаковые данные для каждого
+                # размера и при каждом запуске.
+                rng = random.Random(options['seed'])
+                with benchmark_database():
+                    reader, urls = seed_dataset(size, options, rng)
+                    client = Client()
+                    client.force_login(reader)
+                    results[str(size)] = {
+                        name: measure(client, url, options['repeat'])
+                        for name, url in urls.items()
+                    }
+                self._report(size, results[str(size)])
+
+        report = {
+            'meta': {
+                'created': timezone.now().isoformat(),
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'options': {
+                    name: options[name] for name in (
+                        'tags', 'tags_per_post', 'follows_per_user',
+                        'comments', 'repeat', 'seed'
+                    )
+                },
+            },
+            'results': results,
+        }
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                json.dump(report, file, ensure_ascii=False, indent=2)
+        if options['baseline']:
+            with open(options['baseline']) as file:
+                baseline = json.load(file)['results']
+            regressions = compare(
+                results, baseline, options['threshold'],
+                options['min_delta']
+            )
+            if regressions:
+                raise CommandError(
+                    'Регрессии относительно базового замера:\n'
+                    + '\n'.join(regressions)
+                )
+            self.stdout.write(self.style.SUCCESS('Регрессий нет'))
+
+    def _report(self, size, results):
+        self.stdout.write(f'Постов: {size}')
+        for name, result in results.items():
+            self.stdout.write(
+                f'{name:>16} {result["ms"]:>10.2f} мс '
+                f'{result["queries"]:>4} запросов'
+            )
@@ -0,0 +1,47 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import export
+from posts.models import Group, User
+
+
+class Command(BaseCommand):
+    help = 'Потоковая выгрузка постов в NDJSON (опционально gzip).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--author', help='username автора.')
+        parser.add_argument('--group', help='slug сообщества.')
+        parser.add_argument(
+            '--output', default='-', help='Файл или - для stdout.'
+        )
+        parser.add_argument('--gzip', action='store_true')
+        parser.add_argument(
+            '--chunk-size', type=int, default=export.CHUNK_SIZE
+        )
+
+    def handle(self, *args, **options):
+        author = group = None
+        try:
+            if options['author']:
+                author = User.objects.get(username=options['author'])
+            if options['group']:
+                group = Group.objects.get(slug=options['group'])
+        except (User.DoesNotExist, Group.DoesNotExist) as error:
+            raise CommandError(error)
+        posts = export.iter_posts(
+            export.export_queryset(author, group), options['chunk_size']
+        )
+        stream = export.ndjson_lines(posts)
+        if options['gzip']:
+            stream = export.gzip_stream(stream)
+        if options['output'] == '-':
+            output = sys.stdout.buffer
+        else:
+            output = open(options['output'], 'wb')
+        try:
+            for chunk in stream:
+                output.write(chunk)
+        finally:
+            if output is not sys.stdout.buffer:
+                output.close()
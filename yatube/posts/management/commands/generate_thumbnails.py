@@ -0,0 +1,53 @@
+from concurrent.futures import as_completed
+
+from django.core.management.base import BaseCommand
+
+from posts import thumbnails
+
+
+class Command(BaseCommand):
+    help = (
+        'Генерирует миниатюры всех размеров для изображений '
+        'из MEDIA_ROOT/posts/ в нескольких процессах.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=None,
+            help='Число процессов (по умолчанию THUMBNAIL_WORKERS).'
+        )
+
+    def handle(self, *args, **options):
+        names = thumbnails.existing_images()
+        workers = thumbnails.worker_count(options['workers'])
+        if not workers:
+            results = map(self._generate_one, names)
+        else:
+            executor = thumbnails.get_executor(workers)
+            futures = {
+                executor.submit(thumbnails.generate, name): name
+                for name in names
+            }
+            results = (
+                (futures[future], future.exception())
+                for future in as_completed(futures)
+            )
+        failed = 0
+        for processed, (name, error) in enumerate(results, 1):
+            if error:
+                failed += 1
+                self.stderr.write(f'{name}: {error}')
+            if processed % 100 == 0:
+                self.stdout.write(f'Обработано изображений: {processed}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Миниатюры сгенерированы: {len(names) - failed}, '
+            f'ошибок: {failed}'
+        ))
+
+    @staticmethod
+    def _generate_one(name):
+        try:
+            thumbnails.generate(name)
+        except Exception as error:
+            return name, error
+        return name, None
@@ -0,0 +1,81 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import importer
+
+
+class Command(BaseCommand):
+    help = (
+        'Потоковый импорт постов, комментариев и подписок из NDJSON '
+        'или CSV (формат записей описан в posts/importer.py).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл или - для stdin.')
+        parser.add_argument(
+            '--format', choices=('ndjson', 'csv'), default=None,
+            help='По умолчанию определяется по расширению файла.'
+        )
+        parser.add_argument(
+            '--type', choices=importer.RECORD_TYPES, default='post',
+            help='Тип записей в CSV-файле.'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=importer.BATCH_SIZE
+        )
+        parser.add_argument(
+            '--create-users', action='store_true',
+            help='Создавать отсутствующих пользователей.'
+        )
+        parser.add_argument(
+            '--skip-search-index', action='store_true',
+            help='Не индексировать посты (после импорта - reindex_search).'
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format'] or (
+            'csv' if path.endswith('.csv') else 'ndjson'
+        )
+        try:
+            stream = (
+                sys.stdin if path == '-'
+                else open(path, encoding='utf-8', newline='')
+            )
+        except OSError as error:
+            raise CommandError(error)
+        with stream:
+            if file_format == 'csv':
+                records = importer.read_csv(stream, options['type'])
+            else:
+                records = importer.read_ndjson(stream)
+            content_importer = importer.Importer(
+                options['batch_size'],
+                options['create_users'],
+                index_search=not options['skip_search_index'],
+            )
+            start = time.perf_counter()
+            for stats in content_importer.run(records):
+                self.stdout.write(self._progress(stats, start))
+        for error in content_importer.errors:
+            self.stderr.write(error)
+        self.stdout.write(self.style.SUCCESS(
+            'Импорт завершён. ' + self._progress(content_importer.stats, start)
+        ))
+        if content_importer.stats['post']:
+            self.stdout.write(
+                'Для обновления похожих постов выполните '
+                'rebuild_similar_posts.'
+            )
+
+    @staticmethod
+    def _progress(stats, start):
+        elapsed = time.perf_counter() - start
+        rows = sum(stats[record_type] for record_type in importer.RECORD_TYPES)
+        return (
+            f'постов: {stats["post"]}, комментариев: {stats["comment"]}, '
+            f'подписок: {stats["follow"]}, пропущено: {stats["skipped"]}; '
+            f'{rows / elapsed if elapsed else 0:.0f} строк/с'
+        )
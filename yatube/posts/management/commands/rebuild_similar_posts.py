@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts import similar
+from posts.models import Post
+from posts.utils import chunked
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает списки похожих постов пакетами.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        post_ids = Post.objects.order_by('pk').values_list('pk', flat=True)
+        processed = 0
+        for batch in chunked(post_ids.iterator(), options['batch_size']):
+            with transaction.atomic():
+                similar.rebuild(batch)
+            processed += len(batch)
+            self.stdout.write(f'Обработано постов: {processed}')
+        self.stdout.write(self.style.SUCCESS('Похожие посты пересобраны'))
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts import timeline
+from posts.models import Follow, TimelineEntry
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает материализованные ленты подписок с нуля.'
+
+    def handle(self, *args, **options):
+        user_ids = Follow.objects.values_list(
+            'user_id', flat=True
+        ).distinct().order_by('user_id')
+        with transaction.atomic():
+            TimelineEntry.objects.all().delete()
+        rebuilt = 0
+        for user_id in user_ids.iterator():
+            with transaction.atomic():
+                timeline.rebuild(user_id)
+            rebuilt += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Пересобрано лент: {rebuilt}'
+        ))
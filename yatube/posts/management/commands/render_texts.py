@@ -0,0 +1,45 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts import cards, feed_cache, rendering
+from posts.models import Comment, Post
+
+
+def bump_cards(pks):
+    cards.bump_versions(Post.objects.filter(pk__in=pks))
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет HTML и начало текста постов и комментариев, '
+        'сохранённых в обход save().'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=rendering.BATCH_SIZE
+        )
+        parser.add_argument(
+            '--all', action='store_true', dest='everything',
+            help='Перерендерить все строки, а не только незаполненные.'
+        )
+
+    def handle(self, *args, **options):
+        total = 0
+        for model in (Post, Comment):
+            start = time.perf_counter()
+            rendered = rendering.backfill(
+                model, options['batch_size'], options['everything'],
+                on_batch=bump_cards if model is Post else None
+            )
+            total += rendered
+            elapsed = time.perf_counter() - start
+            self.stdout.write(self.style.SUCCESS(
+                f'{model._meta.verbose_name_plural}: отрендерено '
+                f'{rendered} за {elapsed:.1f} с'
+            ))
+        if total:
+            # Карточки постов сбрасываются по версиям, страницы лент
+            # и ETag страниц постов - общим поколением.
+            feed_cache.bump(feed_cache.EPOCH)
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts import counters
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает денормализованные счётчики постов, комментариев '
+        'и подписок.'
+    )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            counters.repair()
+        self.stdout.write(self.style.SUCCESS('Счётчики пересчитаны'))
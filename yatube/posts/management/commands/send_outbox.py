@@ -0,0 +1,38 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts import outbox
+
+
+class Command(BaseCommand):
+    help = (
+        'Отправляет письма из очереди пакетами, по одному соединению '
+        'с почтовым бэкендом на пакет.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=outbox.BATCH_SIZE
+        )
+        parser.add_argument(
+            '--loop', action='store_true',
+            help='Не завершаться, а проверять очередь каждые --interval с.'
+        )
+        parser.add_argument('--interval', type=float, default=5)
+
+    def handle(self, *args, **options):
+        while True:
+            start = time.perf_counter()
+            stats = outbox.drain(options['batch_size'])
+            elapsed = time.perf_counter() - start
+            if stats or not options['loop']:
+                self.stdout.write(
+                    f'Отправлено: {stats["sent"]}, '
+                    f'отложено: {stats["retried"]}, '
+                    f'ошибок: {stats["failed"]}, '
+                    f'{stats["sent"] / elapsed:.0f} писем/с'
+                )
+            if not options['loop']:
+                return
+            time.sleep(options['interval'])
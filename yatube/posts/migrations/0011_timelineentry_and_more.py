@@ -0,0 +1,58 @@
+# Generated by Django 4.1.5 on 2026-10-18 20:34
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_timelines(apps, schema_editor):
+    """
+    Раскладывает существующие посты по лентам подписчиков: как
+    timeline.rebuild, последние TIMELINE_MAX_LENGTH постов подписок.
+    """
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            'INSERT INTO posts_timelineentry (user_id, post_id, pub_date) '
+            'SELECT user_id, post_id, pub_date FROM ('
+            ' SELECT f.user_id, p.id AS post_id, p.pub_date,'
+            ' ROW_NUMBER() OVER ('
+            '  PARTITION BY f.user_id ORDER BY p.pub_date DESC'
+            ' ) AS position'
+            ' FROM posts_follow f'
+            ' JOIN posts_post p ON p.author_id = f.author_id'
+            ') WHERE position <= %s',
+            [settings.TIMELINE_MAX_LENGTH]
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0010_auto_20230127_1135'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TimelineEntry',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('pub_date', models.DateTimeField(verbose_name='Дата публикации поста')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timeline_entries', to='posts.post', verbose_name='Пост')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timeline', to=settings.AUTH_USER_MODEL, verbose_name='Подписчик')),
+            ],
+            options={
+                'verbose_name': 'Запись ленты',
+                'verbose_name_plural': 'Записи ленты',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='timelineentry',
+            index=models.Index(fields=['user', 'pub_date', 'post'], name='timeline_user_pub_date_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='timelineentry',
+            constraint=models.UniqueConstraint(fields=('user', 'post'), name='unique_timeline_entry'),
+        ),
+        migrations.RunPython(fill_timelines, migrations.RunPython.noop),
+    ]
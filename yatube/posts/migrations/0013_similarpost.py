@@ -0,0 +1,75 @@
+# Generated by Django 4.1.5 on 2026-10-18 20:38
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_similar_posts(apps, schema_editor):
+    """
+    Списки похожих постов для существующих постов, как
+    rebuild_similar_posts: top-K по числу общих тегов, затем по дате.
+    """
+    ContentType = apps.get_model('contenttypes', 'ContentType')
+    content_type = ContentType.objects.filter(
+        app_label='posts', model='post'
+    ).first()
+    if content_type is None:
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            'INSERT INTO posts_similarpost '
+            '(post_id, similar_id, score, similar_pub_date) '
+            'SELECT post_id, similar_id, score, pub_date FROM ('
+            ' SELECT a.object_id AS post_id, b.object_id AS similar_id,'
+            ' COUNT(*) AS score, p.pub_date,'
+            ' ROW_NUMBER() OVER ('
+            '  PARTITION BY a.object_id'
+            '  ORDER BY COUNT(*) DESC, p.pub_date DESC, b.object_id DESC'
+            ' ) AS position'
+            ' FROM taggit_taggeditem a'
+            ' JOIN taggit_taggeditem b ON b.tag_id = a.tag_id'
+            '  AND b.content_type_id = a.content_type_id'
+            '  AND b.object_id != a.object_id'
+            ' JOIN posts_post source ON source.id = a.object_id'
+            ' JOIN posts_post p ON p.id = b.object_id'
+            ' WHERE a.content_type_id = %s'
+            ' GROUP BY a.object_id, b.object_id'
+            ') WHERE position <= %s',
+            [content_type.pk, settings.SIMILAR_POSTS_COUNT]
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('posts', '0012_usercounter_post_comments_count'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SimilarPost',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.PositiveIntegerField(verbose_name='Общих тегов')),
+                ('similar_pub_date', models.DateTimeField(verbose_name='Дата публикации похожего поста')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='similar_entries', to='posts.post', verbose_name='Пост')),
+                ('similar', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='posts.post', verbose_name='Похожий пост')),
+            ],
+            options={
+                'verbose_name': 'Похожий пост',
+                'verbose_name_plural': 'Похожие посты',
+                'ordering': ['-score', '-similar_pub_date'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='similarpost',
+            index=models.Index(fields=['post', '-score', '-similar_pub_date'], name='similar_post_rank_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='similarpost',
+            constraint=models.UniqueConstraint(fields=('post', 'similar'), name='unique_similar_post'),
+        ),
+        migrations.RunPython(fill_similar_posts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.1.5 on 2026-10-18 20:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0013_similarpost'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='version',
+            field=models.PositiveIntegerField(default=1, editable=False, help_text='Увеличивается при изменении отображаемых данных поста', verbose_name='Версия карточки'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+from django.db import migrations
+
+from posts.stemmer import normalize
+
+
+def fill_index(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    rows = (
+        (pk, normalize(text)) for pk, text in
+        Post.objects.order_by().values_list('pk', 'text').iterator()
+    )
+    with schema_editor.connection.cursor() as cursor:
+        cursor.executemany(
+            'INSERT INTO posts_post_search (rowid, body) VALUES (%s, %s)',
+            rows
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0014_post_version'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            "CREATE VIRTUAL TABLE posts_post_search USING fts5("
+            "body, tokenize = 'unicode61 remove_diacritics 2')",
+            'DROP TABLE posts_post_search',
+        ),
+        migrations.RunPython(fill_index, migrations.RunPython.noop),
+    ]
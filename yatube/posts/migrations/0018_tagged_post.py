@@ -0,0 +1,113 @@
+# Generated by Django 4.1.5 on 2026-10-18 21:39
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+import taggit.managers
+
+
+def _post_content_type(apps, create=False):
+    ContentType = apps.get_model('contenttypes', 'ContentType')
+    if create:
+        return ContentType.objects.get_or_create(
+            app_label='posts', model='post'
+        )[0]
+    return ContentType.objects.filter(app_label='posts', model='post').first()
+
+
+def move_tags(apps, schema_editor):
+    """Переносит теги постов из TaggedItem одним INSERT ... SELECT."""
+    TaggedItem = apps.get_model('taggit', 'TaggedItem')
+    TaggedPost = apps.get_model('posts', 'TaggedPost')
+    Post = apps.get_model('posts', 'Post')
+    Tag = apps.get_model('taggit', 'Tag')
+    TagCounter = apps.get_model('posts', 'TagCounter')
+    content_type = _post_content_type(apps)
+    if content_type is not None:
+        with schema_editor.connection.cursor() as cursor:
+            # Строки удалённых постов (object_id без поста) не переносятся.
+            cursor.execute(
+                f'INSERT INTO {TaggedPost._meta.db_table} '
+                f'(content_object_id, tag_id) '
+                f'SELECT ti.object_id, ti.tag_id '
+                f'FROM {TaggedItem._meta.db_table} ti '
+                f'JOIN {Post._meta.db_table} p ON p.id = ti.object_id '
+                f'WHERE ti.content_type_id = %s',
+                [content_type.pk]
+            )
+        TaggedItem.objects.filter(content_type=content_type).delete()
+    TagCounter.objects.bulk_create(
+        [TagCounter(tag_id=pk) for pk in Tag.objects.values_list(
+            'pk', flat=True
+        )],
+        1000
+    )
+    TagCounter.objects.update(posts_count=Coalesce(Subquery(
+        TaggedPost.objects.filter(tag=OuterRef('pk')).order_by().values(
+            'tag'
+        ).annotate(total=Count('pk')).values('total')
+    ), Value(0)))
+
+
+def restore_tags(apps, schema_editor):
+    TaggedItem = apps.get_model('taggit', 'TaggedItem')
+    TaggedPost = apps.get_model('posts', 'TaggedPost')
+    content_type = _post_content_type(apps, create=True)
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {TaggedItem._meta.db_table} '
+            f'(content_type_id, object_id, tag_id) '
+            f'SELECT %s, content_object_id, tag_id '
+            f'FROM {TaggedPost._meta.db_table}',
+            [content_type.pk]
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('taggit', '0005_auto_20220424_2025'),
+        ('posts', '0017_feed_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TagCounter',
+            fields=[
+                ('tag', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='counter', serialize=False, to='taggit.tag', verbose_name='Тег')),
+                ('posts_count', models.PositiveIntegerField(default=0, verbose_name='Постов')),
+            ],
+            options={
+                'verbose_name': 'Счётчик тега',
+                'verbose_name_plural': 'Счётчики тегов',
+            },
+        ),
+        migrations.CreateModel(
+            name='TaggedPost',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('content_object', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='tagged_items', to='posts.post', verbose_name='Пост')),
+                ('tag', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='tagged_posts', to='taggit.tag', verbose_name='Тег')),
+            ],
+            options={
+                'verbose_name': 'Тег поста',
+                'verbose_name_plural': 'Теги постов',
+            },
+        ),
+        migrations.AlterField(
+            model_name='post',
+            name='tags',
+            field=taggit.managers.TaggableManager(help_text='A comma-separated list of tags.', through='posts.TaggedPost', to='taggit.Tag', verbose_name='Tags'),
+        ),
+        migrations.AddIndex(
+            model_name='taggedpost',
+            index=models.Index(fields=['tag', 'content_object'], name='tagged_post_tag_post_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='taggedpost',
+            constraint=models.UniqueConstraint(fields=('content_object', 'tag'), name='unique_post_tag'),
+        ),
+        migrations.RunPython(move_tags, restore_tags),
+    ]
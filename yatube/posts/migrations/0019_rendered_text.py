@@ -0,0 +1,41 @@
+# Generated by Django 4.1.5 on 2026-10-18 21:45
+
+from django.db import migrations, models
+
+from posts.rendering import backfill
+
+
+def render_texts(apps, schema_editor):
+    for model_name in ('Post', 'Comment'):
+        backfill(apps.get_model('posts', model_name))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0018_tagged_post'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='excerpt',
+            field=models.CharField(blank=True, editable=False, max_length=30, verbose_name='Начало текста'),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='text_html',
+            field=models.TextField(blank=True, editable=False, verbose_name='HTML текста'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='excerpt',
+            field=models.CharField(blank=True, editable=False, max_length=30, verbose_name='Начало текста'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='text_html',
+            field=models.TextField(blank=True, editable=False, help_text='Текст с <br> вместо переводов строк, рендерится при сохранении', verbose_name='HTML текста'),
+        ),
+        migrations.RunPython(render_texts, migrations.RunPython.noop),
+    ]
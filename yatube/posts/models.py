@@ -2,6 +2,9 @@ from django.contrib.auth import get_user_model
 from django.db import models
 from django.urls import reverse
 from taggit.managers import TaggableManager
+from taggit.models import Tag, TaggedItemBase
+
+from . import rendering
 
 User = get_user_model()
 
@@ -12,6 +15,19 @@ class Post(models.Model):
         'Текст поста',
         help_text='Введите текст поста'
     )
+    text_html = models.TextField(
+        'HTML текста',
+        blank=True,
+        editable=False,
+        help_text='Текст с <br> вместо переводов строк, рендерится при '
+                  'сохранении'
+    )
+    excerpt = models.CharField(
+        'Начало текста',
+        max_length=rendering.EXCERPT_LENGTH,
+        blank=True,
+        editable=False
+    )
     pub_date = models.DateTimeField(
         'Дата публикации',
         auto_now_add=True,
@@ -22,7 +38,9 @@ class Post(models.Model):
         User,
         on_delete=models.CASCADE,
         related_name='posts',
-        verbose_name='Автор'
+        verbose_name='Автор',
+        # Вместо отдельного индекса - составной post_author_pub_date_idx.
+        db_index=False
     )
     group = models.ForeignKey(
         'Group',
@@ -31,27 +49,97 @@ class Post(models.Model):
         on_delete=models.SET_NULL,
         related_name='posts',
         verbose_name='Группа',
-        help_text='Выберите группу'
+        help_text='Выберите группу',
+        db_index=False
     )
     image = models.ImageField(
         'Картинка',
         upload_to='posts/',
         blank=True
     )
-    tags = TaggableManager()
+    tags = TaggableManager(through='TaggedPost')
+    comments_count = models.PositiveIntegerField(
+        'Количество комментариев',
+        default=0,
+        editable=False
+    )
+    version = models.PositiveIntegerField(
+        'Версия карточки',
+        default=1,
+        editable=False,
+        help_text='Увеличивается при изменении отображаемых данных поста'
+    )
 
     class Meta:
         ordering = ['-pub_date']
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
+        # Ленты автора и группы: выборка по автору или группе,
+        # сортировка по дате - диапазонное чтение без сортировки.
+        indexes = [
+            models.Index(
+                fields=['author', 'pub_date'],
+                name='post_author_pub_date_idx'
+            ),
+            models.Index(
+                fields=['group', 'pub_date'],
+                name='post_group_pub_date_idx'
+            ),
+        ]
 
     def get_absolut_url(self):
         return reverse('posts:post_detail', args=[self.pk])
 
+    def save(self, *args, **kwargs):
+        kwargs['update_fields'] = rendering.render(
+            self, kwargs.get('update_fields')
+        )
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return self.text[:15]
 
 
+class TaggedPost(TaggedItemBase):
+    """
+    Связь поста с тегом. В отличие от обобщённого TaggedItem из taggit
+    хранит настоящий внешний ключ на пост, без content_type.
+    """
+    content_object = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='tagged_items',
+        verbose_name='Пост',
+        # Индексы - составные: unique_post_tag и tagged_post_tag_post_idx.
+        db_index=False
+    )
+    tag = models.ForeignKey(
+        Tag,
+        on_delete=models.CASCADE,
+        related_name='tagged_posts',
+        verbose_name='Тег',
+        db_index=False
+    )
+
+    class Meta:
+        verbose_name = 'Тег поста'
+        verbose_name_plural = 'Теги постов'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['content_object', 'tag'],
+                name='unique_post_tag'
+            )
+        ]
+        # Посты тега (лента тега, похожие посты); теги поста -
+        # по уникальному индексу.
+        indexes = [
+            models.Index(
+                fields=['tag', 'content_object'],
+                name='tagged_post_tag_post_idx'
+            )
+        ]
+
+
 class Group(models.Model):
     """Модель группы, в которую можно объединить посты."""
     title = models.CharField(max_length=200)
@@ -78,7 +166,8 @@ class Comment(models.Model):
         related_name='comments',
         blank=True,
         null=True,
-        verbose_name='Пост'
+        verbose_name='Пост',
+        db_index=False
     )
     author = models.ForeignKey(
         User,
@@ -90,6 +179,17 @@ class Comment(models.Model):
         'Текст комментария',
         help_text='Введите тест комментария'
     )
+    text_html = models.TextField(
+        'HTML текста',
+        blank=True,
+        editable=False
+    )
+    excerpt = models.CharField(
+        'Начало текста',
+        max_length=rendering.EXCERPT_LENGTH,
+        blank=True,
+        editable=False
+    )
     created = models.DateTimeField(
         auto_now_add=True
     )
@@ -98,6 +198,18 @@ class Comment(models.Model):
         verbose_name = 'Комментарий'
         verbose_name_plural = 'Комментарии'
         ordering = ['-created']
+        indexes = [
+            models.Index(
+                fields=['post', 'created'],
+                name='comment_post_created_idx'
+            )
+        ]
+
+    def save(self, *args, **kwargs):
+        kwargs['update_fields'] = rendering.render(
+            self, kwargs.get('update_fields')
+        )
+        super().save(*args, **kwargs)
 
 
 class Follow(models.Model):
@@ -110,7 +222,8 @@ class Follow(models.Model):
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
-        related_name='following'
+        related_name='following',
+        db_index=False
     )
 
     class Meta:
@@ -122,3 +235,173 @@ class Follow(models.Model):
                 name='unique_follow'
             )
         ]
+        # Уникальный индекс (user, author) обслуживает подписки
+        # пользователя, этот - подписчиков автора (рассылка в ленты).
+        indexes = [
+            models.Index(
+                fields=['author', 'user'],
+                name='follow_author_user_idx'
+            )
+        ]
+
+
+class TimelineEntry(models.Model):
+    """
+    Материализованная лента подписчика: запись на каждый пост автора,
+    на которого подписан пользователь. Заполняется при публикации поста.
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name='Подписчик'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+        verbose_name='Пост'
+    )
+    pub_date = models.DateTimeField('Дата публикации поста')
+
+    class Meta:
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи ленты'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'],
+                name='unique_timeline_entry'
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', 'pub_date', 'post'],
+                name='timeline_user_pub_date_idx'
+            )
+        ]
+
+
+class UserCounter(models.Model):
+    """
+    Денормализованные счётчики пользователя. Поддерживаются сигналами
+    при создании и удалении постов и подписок, пересчитываются командой
+    repair_counters.
+    """
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='counters',
+        verbose_name='Пользователь'
+    )
+    posts_count = models.PositiveIntegerField('Постов', default=0)
+    followers_count = models.PositiveIntegerField('Подписчиков', default=0)
+    following_count = models.PositiveIntegerField('Подписок', default=0)
+
+    class Meta:
+        verbose_name = 'Счётчики пользователя'
+        verbose_name_plural = 'Счётчики пользователей'
+
+
+class TagCounter(models.Model):
+    """
+    Число постов с тегом. Поддерживается сигналами при изменении тегов
+    поста и удалении постов, пересчитывается командой repair_counters.
+    """
+    tag = models.OneToOneField(
+        Tag,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='counter',
+        verbose_name='Тег'
+    )
+    posts_count = models.PositiveIntegerField('Постов', default=0)
+
+    class Meta:
+        verbose_name = 'Счётчик тега'
+        verbose_name_plural = 'Счётчики тегов'
+
+
+class SimilarPost(models.Model):
+    """
+    Предрассчитанный список похожих постов (top-K по числу общих тегов)
+    для блока «Похожие посты» на странице поста.
+    """
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='similar_entries',
+        verbose_name='Пост'
+    )
+    similar = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Похожий пост'
+    )
+    score = models.PositiveIntegerField('Общих тегов')
+    similar_pub_date = models.DateTimeField('Дата публикации похожего поста')
+
+    class Meta:
+        verbose_name = 'Похожий пост'
+        verbose_name_plural = 'Похожие посты'
+        ordering = ['-score', '-similar_pub_date']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['post', 'similar'],
+                name='unique_similar_post'
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=['post', '-score', '-similar_pub_date'],
+                name='similar_post_rank_idx'
+            )
+        ]
+
+
+class OutgoingEmail(models.Model):
+    """
+    Исходящее письмо. Представления только ставят письма в очередь,
+    отправляет их команда send_outbox.
+    """
+    PENDING = 'pending'
+    SENT = 'sent'
+    FAILED = 'failed'
+    STATUS_CHOICES = (
+        (PENDING, 'В очереди'),
+        (SENT, 'Отправлено'),
+        (FAILED, 'Не отправлено'),
+    )
+
+    subject = models.CharField('Тема', max_length=255)
+    body = models.TextField('Текст')
+    from_email = models.EmailField('Отправитель')
+    to = models.EmailField('Получатель')
+    status = models.CharField(
+        'Статус', max_length=10, choices=STATUS_CHOICES, default=PENDING
+    )
+    attempts = models.PositiveSmallIntegerField('Попыток', default=0)
+    next_attempt_at = models.DateTimeField('Следующая попытка')
+    claimed_by = models.CharField(
+        'Обработчик', max_length=32, blank=True, editable=False
+    )
+    claimed_until = models.DateTimeField(
+        'Занято до', null=True, blank=True, editable=False
+    )
+    last_error = models.TextField('Последняя ошибка', blank=True)
+    created = models.DateTimeField('Дата создания', auto_now_add=True)
+    sent_at = models.DateTimeField('Дата отправки', null=True, blank=True)
+
+    class Meta:
+        verbose_name = 'Исходящее письмо'
+        verbose_name_plural = 'Исходящие письма'
+        indexes = [
+            models.Index(
+                fields=['status', 'next_attempt_at'],
+                name='outbox_status_next_idx'
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.subject} → {self.to}'
@@ -0,0 +1,158 @@
+"""
+Очередь исходящих писем (outbox).
+
+Представления только сохраняют письмо в таблицу OutgoingEmail, и
+медленный почтовый сервер не задерживает ответ. Команда send_outbox
+забирает письма пакетами и отправляет каждый пакет через одно
+соединение с почтовым бэкендом.
+
+Обработчик помечает пакет своим идентификатором на время аренды
+(LEASE), поэтому несколько одновременно запущенных обработчиков не
+отправят одно письмо дважды. Статус письма меняется сразу после его
+отправки. Если обработчик упал посреди пакета, неотправленные письма
+снова станут доступны после окончания аренды. Неудачная попытка
+откладывает письмо с экспоненциально растущей паузой; после
+MAX_ATTEMPTS попыток письмо помечается как неотправленное.
+Message-ID строится из id письма, и повторная отправка того же
+письма не создаёт у получателя дубликата.
+"""
+import uuid
+from collections import Counter
+from datetime import timedelta
+
+from django.core.mail import EmailMessage, get_connection
+from django.core.mail.utils import DNS_NAME
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import OutgoingEmail
+
+BATCH_SIZE = 100
+MAX_ATTEMPTS = 5
+RETRY_DELAY = timedelta(minutes=1)
+MAX_RETRY_DELAY = timedelta(hours=6)
+LEASE = timedelta(minutes=5)
+
+
+def enqueue(subject, body, from_email, to):
+    """Ставит письмо в очередь на отправку."""
+    return OutgoingEmail.objects.create(
+        subject=subject,
+        body=body,
+        from_email=from_email,
+        to=to,
+        next_attempt_at=timezone.now(),
+    )
+
+
+def retry_delay(attempts):
+    """Пауза перед следующей попыткой: 1, 2, 4... минут."""
+    return min(RETRY_DELAY * 2 ** (attempts - 1), MAX_RETRY_DELAY)
+
+
+def message_id(email):
+    return f'<outbox.{email.pk}.{email.created:%Y%m%d%H%M%S}@{DNS_NAME}>'
+
+
+def _available(now):
+    return OutgoingEmail.objects.filter(
+        Q(claimed_until__isnull=True) | Q(claimed_until__lt=now),
+        status=OutgoingEmail.PENDING,
+        next_attempt_at__lte=now,
+    )
+
+
+def claim(batch_size=BATCH_SIZE):
+    """Забирает пакет готовых к отправке писем на время LEASE."""
+    now = timezone.now()
+    token = uuid.uuid4().hex
+    with transaction.atomic():
+        ids = list(_available(now).order_by(
+            'next_attempt_at', 'pk'
+        ).values_list('pk', flat=True)[:batch_size])
+        # Условие повторяется в UPDATE: письмо, которое успел забрать
+        # другой обработчик, в пакет не попадёт.
+        _available(now).filter(pk__in=ids).update(
+            claimed_by=token, claimed_until=now + LEASE
+        )
+    return list(OutgoingEmail.objects.filter(
+        claimed_by=token, status=OutgoingEmail.PENDING
+    ).order_by('next_attempt_at', 'pk'))
+
+
+def _mark_sent(email):
+    OutgoingEmail.objects.filter(
+        pk=email.pk, claimed_by=email.claimed_by
+    ).update(
+        status=OutgoingEmail.SENT,
+        attempts=email.attempts + 1,
+        sent_at=timezone.now(),
+        claimed_by='',
+        claimed_until=None,
+        last_error='',
+    )
+
+
+def _mark_failed(email, error):
+    """Откладывает письмо; возвращает True, если попытки исчерпаны."""
+    attempts = email.attempts + 1
+    exhausted = attempts >= MAX_ATTEMPTS
+    OutgoingEmail.objects.filter(
+        pk=email.pk, claimed_by=email.claimed_by
+    ).update(
+        status=OutgoingEmail.FAILED if exhausted else OutgoingEmail.PENDING,
+        attempts=attempts,
+        next_attempt_at=timezone.now() + retry_delay(attempts),
+        claimed_by='',
+        claimed_until=None,
+        last_error=f'{type(error).__name__}: {error}',
+    )
+    return exhausted
+
+
+def send_batch(emails, connection=None):
+    """
+    Отправляет письма через одно соединение с бэкендом.
+    Возвращает Counter с числом отправленных (sent), отложенных
+    (retried) и окончательно не отправленных (failed) писем.
+    """
+    stats = Counter()
+    connection = connection or get_connection()
+    try:
+        connection.open()
+    except Exception as error:
+        for email in emails:
+            stats['failed' if _mark_failed(email, error) else 'retried'] += 1
+        return stats
+    try:
+        for email in emails:
+            message = EmailMessage(
+                email.subject,
+                email.body,
+                email.from_email,
+                [email.to],
+                connection=connection,
+                headers={'Message-ID': message_id(email)},
+            )
+            try:
+                message.send()
+            except Exception as error:
+                exhausted = _mark_failed(email, error)
+                stats['failed' if exhausted else 'retried'] += 1
+            else:
+                _mark_sent(email)
+                stats['sent'] += 1
+    finally:
+        connection.close()
+    return stats
+
+
+def drain(batch_size=BATCH_SIZE):
+    """Отправляет пакетами все готовые письма; возвращает Counter."""
+    stats = Counter()
+    while True:
+        emails = claim(batch_size)
+        if not emails:
+            return stats
+        stats.update(send_batch(emails))
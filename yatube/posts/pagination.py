@@ -1,10 +1,157 @@
+import base64
+import binascii
+from collections.abc import Sequence
+
 from django.core.paginator import Paginator
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
 
 from yatube.settings import NUM_POST_PER_PAGE
 
 
-def pagination(posts, request):
+def pagination(posts, request, keyset=False):
+    """
+    Пагинация ленты постов.
+
+    По умолчанию используется постраничный Paginator (?page=N),
+    с keyset=True - курсорная пагинация по (pub_date, id).
+    """
+    if keyset:
+        return cursor_pagination(posts, request)
     paginator = Paginator(posts, NUM_POST_PER_PAGE)
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
-    return page_obj
\ No newline at end of file
+    return page_obj
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator без полного COUNT(*) для больших таблиц (админка).
+
+    Для нефильтрованной выборки число строк оценивается по
+    максимальному первичному ключу - это один поиск по индексу.
+    Для отфильтрованной выборки строки считаются не дальше
+    count_limit, так что стоимость подсчёта ограничена.
+    """
+    count_limit = 10_000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            last_pk = queryset.model._default_manager.order_by(
+                '-pk'
+            ).values_list('pk', flat=True).first()
+            return last_pk or 0
+        return queryset.order_by()[:self.count_limit].count()
+
+
+def encode_cursor(obj, id_field='pk', date_field='pub_date'):
+    """Непрозрачный токен курсора для строки ленты."""
+    date = getattr(obj, date_field)
+    raw = f'{date.isoformat()}|{getattr(obj, id_field)}'.encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """
+    Разбор токена курсора в пару (pub_date, id).
+    Для некорректного токена возвращается None.
+    """
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        pub_date, pk = raw.decode().split('|')
+        pub_date = parse_datetime(pub_date)
+        pk = int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+    if pub_date is None:
+        return None
+    return pub_date, pk
+
+
+class CursorPage(Sequence):
+    """Страница курсорной пагинации, совместимая с шаблонами ленты."""
+    is_cursor = True
+
+    def __init__(self, object_list, has_next, has_previous, id_field='pk',
+                 date_field='pub_date'):
+        self.object_list = object_list
+        self.has_next_page = has_next
+        self.has_previous_page = has_previous
+        self.next_cursor = None
+        self.previous_cursor = None
+        if object_list and has_next:
+            self.next_cursor = encode_cursor(
+                object_list[-1], id_field, date_field
+            )
+        if object_list and has_previous:
+            self.previous_cursor = encode_cursor(
+                object_list[0], id_field, date_field
+            )
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.has_next_page
+
+    def has_previous(self):
+        return self.has_previous_page
+
+    def has_other_pages(self):
+        return self.has_next_page or self.has_previous_page
+
+
+def cursor_pagination(posts, request, per_page=NUM_POST_PER_PAGE,
+                      id_field='pk', date_field='pub_date'):
+    """
+    Курсорная пагинация по (pub_date, id) с токенами ?after= / ?before=.
+
+    Не выполняет COUNT(*) и OFFSET: каждая страница - это диапазонное
+    чтение по индексу pub_date, поэтому глубина страницы не влияет
+    на стоимость запроса. id_field задаёт поле для разрешения
+    совпадений pub_date (для материализованных лент - post_id),
+    date_field - поле даты вместо pub_date (created у комментариев).
+    """
+    return cursor_page(
+        posts,
+        after=decode_cursor(request.GET.get('after')),
+        before=decode_cursor(request.GET.get('before')),
+        per_page=per_page,
+        id_field=id_field,
+        date_field=date_field,
+    )
+
+
+def cursor_page(rows, after=None, before=None, per_page=NUM_POST_PER_PAGE,
+                id_field='pk', date_field='pub_date'):
+    """Страница курсорной пагинации по уже разобранным курсорам."""
+    if before and not after:
+        date, pk = before
+        page = list(rows.filter(**{f'{date_field}__gte': date}).exclude(
+            **{date_field: date, f'{id_field}__lte': pk}
+        ).order_by(date_field, id_field)[:per_page + 1])
+        has_previous = len(page) > per_page
+        page = page[:per_page]
+        page.reverse()
+        return CursorPage(page, True, has_previous, id_field, date_field)
+    if after:
+        date, pk = after
+        # Диапазон по дате отдельным условием, чтобы SQLite
+        # использовал индекс (SEARCH), а не просматривал его целиком.
+        rows = rows.filter(**{f'{date_field}__lte': date}).exclude(
+            **{date_field: date, f'{id_field}__gte': pk}
+        )
+    page = list(
+        rows.order_by(f'-{date_field}', f'-{id_field}')[:per_page + 1]
+    )
+    has_next = len(page) > per_page
+    return CursorPage(
+        page[:per_page], has_next, bool(after), id_field, date_field
+    )
@@ -0,0 +1,74 @@
+"""
+Рендеринг текстов постов и комментариев при сохранении.
+
+Шаблоны выводят готовые поля text_html и excerpt, а не применяют
+linebreaksbr и truncatechars к тексту при каждом показе. text_html -
+экранированный текст с <br> вместо переводов строк, тот же результат,
+что у {{ text|linebreaksbr }}; в шаблоне он выводится с |safe.
+excerpt - начало текста без экранирования, как у truncatechars: его
+экранирует сам шаблон.
+
+Поля заполняются в save() моделей. bulk_create и
+QuerySet.update() save() не вызывают: такие пути рендерят тексты сами
+(render или render_row), а существующие строки заполняет команда
+render_texts.
+"""
+from django.template.defaultfilters import linebreaksbr
+from django.utils.text import Truncator
+
+EXCERPT_LENGTH = 30
+RENDERED_FIELDS = ('text_html', 'excerpt')
+BATCH_SIZE = 1000
+
+
+def render_html(text):
+    return str(linebreaksbr(text, autoescape=True))
+
+
+def render_excerpt(text):
+    return Truncator(text).chars(EXCERPT_LENGTH)
+
+
+def render_row(text):
+    """(text_html, excerpt) для вставки строк в обход моделей."""
+    return render_html(text), render_excerpt(text)
+
+
+def render(instance, update_fields=None):
+    """
+    Заполняет text_html и excerpt объекта. Возвращает update_fields,
+    дополненные отрендеренными полями, если среди них есть text.
+    """
+    if update_fields is not None and 'text' not in update_fields:
+        return update_fields
+    instance.text_html, instance.excerpt = render_row(instance.text)
+    if update_fields is None:
+        return None
+    return {*update_fields, *RENDERED_FIELDS}
+
+
+def backfill(model, batch_size=BATCH_SIZE, everything=False,
+             on_batch=None):
+    """
+    Рендерит тексты строк model пакетами по batch_size. По умолчанию
+    только строки с пустым text_html; everything=True - все строки
+    (например, после изменения рендеринга). Каждый пакет сохраняется
+    своей транзакцией bulk_update, после чего on_batch получает список
+    pk пакета. Возвращает число строк.
+    """
+    queryset = model.objects.order_by('pk').only('pk', 'text')
+    if not everything:
+        queryset = queryset.filter(text_html='')
+    total = 0
+    last_pk = 0
+    while True:
+        batch = list(queryset.filter(pk__gt=last_pk)[:batch_size])
+        if not batch:
+            return total
+        for instance in batch:
+            render(instance)
+        model.objects.bulk_update(batch, RENDERED_FIELDS)
+        if on_batch is not None:
+            on_batch([instance.pk for instance in batch])
+        total += len(batch)
+        last_pk = batch[-1].pk
@@ -0,0 +1,188 @@
+"""
+Полнотекстовый поиск по постам на SQLite FTS5.
+
+Виртуальная таблица posts_post_search хранит текст поста, приведённый
+стеммером к основам слов, с rowid, равным id поста. Индекс обновляется
+сигналами сохранения и удаления постов и пересобирается командой
+reindex_search. Результаты ранжируются по bm25 и листаются курсором
+по паре (score, id) без OFFSET.
+"""
+import base64
+import binascii
+from collections.abc import Sequence
+
+from django.db import connection
+from django.db.models.expressions import RawSQL
+
+from yatube.settings import NUM_POST_PER_PAGE
+
+from .models import Post, TaggedPost
+from .stemmer import normalize, stem_words
+
+TABLE = 'posts_post_search'
+BATCH_SIZE = 1000
+
+
+def index_posts(posts):
+    """Добавляет или обновляет посты в индексе."""
+    rows = [(post.pk, normalize(post.text)) for post in posts]
+    if not rows:
+        return
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f'INSERT OR REPLACE INTO {TABLE} (rowid, body) VALUES (%s, %s)',
+            rows
+        )
+
+
+def remove_posts(post_ids):
+    """Удаляет посты из индекса."""
+    post_ids = list(post_ids)
+    if not post_ids:
+        return
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f'DELETE FROM {TABLE} WHERE rowid = %s',
+            [(post_id,) for post_id in post_ids]
+        )
+
+
+def reindex(batch_size=BATCH_SIZE):
+    """Полностью пересобирает индекс; возвращает число постов."""
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE}')
+    indexed = 0
+    posts = Post.objects.order_by().only('pk', 'text')
+    batch = []
+    for post in posts.iterator(chunk_size=batch_size):
+        batch.append(post)
+        if len(batch) == batch_size:
+            index_posts(batch)
+            indexed += len(batch)
+            batch = []
+    index_posts(batch)
+    indexed += len(batch)
+    with connection.cursor() as cursor:
+        # Слияние сегментов индекса после массовой записи.
+        cursor.execute(f"INSERT INTO {TABLE} ({TABLE}) VALUES ('optimize')")
+    return indexed
+
+
+def match_expression(query):
+    """
+    Выражение MATCH для FTS5: все слова запроса обязательны, каждое
+    ищется по основе как префикс. None, если в запросе нет слов.
+    """
+    terms = [f'"{term}"*' for term in stem_words(query)]
+    if not terms:
+        return None
+    return ' '.join(terms)
+
+
+def filter_posts(queryset, query):
+    """Оставляет в выборке посты, совпавшие с запросом, без ранжирования."""
+    expression = match_expression(query)
+    if expression is None:
+        return queryset
+    return queryset.filter(pk__in=RawSQL(
+        f'SELECT rowid FROM {TABLE} WHERE {TABLE} MATCH %s', [expression]
+    ))
+
+
+def encode_cursor(score, pk):
+    raw = f'{score!r}|{pk}'.encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Пара (score, id) из токена; None для некорректного токена."""
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        score, pk = raw.decode().split('|')
+        return float(score), int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+
+
+class SearchPage(Sequence):
+    """Страница результатов поиска, совместимая с шаблонами ленты."""
+
+    def __init__(self, object_list, next_cursor, has_previous):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.has_previous_page = has_previous
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.has_previous_page
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+def search_ids(query, group=None, tag=None, after=None,
+               limit=NUM_POST_PER_PAGE):
+    """
+    Список (id, score) найденных постов по возрастанию bm25
+    (чем меньше, тем релевантнее), начиная после курсора after.
+    """
+    expression = match_expression(query)
+    if expression is None:
+        return []
+    joins, where, params = [], [], [expression]
+    if group is not None:
+        joins.append(
+            f'JOIN {Post._meta.db_table} p ON p.id = r.id '
+            f'AND p.group_id = %s'
+        )
+        params.append(group.pk)
+    if tag is not None:
+        joins.append(
+            f'JOIN {TaggedPost._meta.db_table} tp '
+            f'ON tp.content_object_id = r.id AND tp.tag_id = %s'
+        )
+        params.append(tag.pk)
+    if after is not None:
+        where.append('(r.score, r.id) > (%s, %s)')
+        params.extend(after)
+    sql = (
+        f'SELECT r.id, r.score FROM ('
+        f'SELECT rowid AS id, bm25({TABLE}) AS score '
+        f'FROM {TABLE} WHERE {TABLE} MATCH %s'
+        f') r {" ".join(joins)} '
+        f'{"WHERE " + " AND ".join(where) if where else ""} '
+        f'ORDER BY r.score, r.id LIMIT %s'
+    )
+    params.append(limit)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+
+
+def search_page(query, request, group=None, tag=None,
+                per_page=NUM_POST_PER_PAGE):
+    """Страница результатов поиска с курсором ?after=."""
+    after = decode_cursor(request.GET.get('after'))
+    rows = search_ids(query, group, tag, after, per_page + 1)
+    next_cursor = None
+    if len(rows) > per_page:
+        rows = rows[:per_page]
+        next_cursor = encode_cursor(rows[-1][1], rows[-1][0])
+    posts = Post.objects.select_related('author', 'group').in_bulk(
+        [pk for pk, _ in rows]
+    )
+    return SearchPage(
+        [posts[pk] for pk, _ in rows if pk in posts],
+        next_cursor,
+        after is not None
+    )
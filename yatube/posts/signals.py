@@ -0,0 +1,187 @@
+from django.db.models import QuerySet
+from django.db.models.signals import (
+    m2m_changed, post_delete, post_save, pre_delete, pre_save
+)
+from django.dispatch import receiver
+from taggit.models import Tag
+
+from . import cards, counters, feed_cache, search, similar, timeline
+from .models import (
+    Comment, Follow, Group, Post, TagCounter, User, UserCounter
+)
+
+# Поля пользователя, которые выводятся в карточках постов.
+USER_CARD_FIELDS = ('username', 'first_name', 'last_name')
+
+
+def bump_post_feeds(post, tag_ids=()):
+    """Инвалидирует кеш лент, в которых выводится пост."""
+    tag_ids = set(tag_ids) | set(post.tags.values_list('id', flat=True))
+    feed_cache.bump(*feed_cache.post_scopes(post, tag_ids))
+
+
+@receiver(pre_save, sender=User)
+def user_pre_save(sender, instance, update_fields, **kwargs):
+    """
+    Запоминает прежние значения полей карточки, если сохранение может
+    их затронуть: смена пароля или last_login карточки не меняют.
+    """
+    if instance._state.adding or (
+        update_fields is not None
+        and not set(USER_CARD_FIELDS) & set(update_fields)
+    ):
+        return
+    instance._previous_card_fields = User.objects.filter(
+        pk=instance.pk
+    ).values_list(*USER_CARD_FIELDS).first()
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, **kwargs):
+    """
+    Заводит счётчики новому пользователю; при изменении имени
+    сбрасывает карточки его постов и кеш лент.
+    """
+    previous = instance.__dict__.pop('_previous_card_fields', None)
+    if created:
+        UserCounter.objects.get_or_create(user=instance)
+    elif previous is not None and previous != tuple(
+        getattr(instance, field) for field in USER_CARD_FIELDS
+    ):
+        cards.bump_versions(Post.objects.filter(author=instance))
+        feed_cache.bump(feed_cache.EPOCH)
+
+
+@receiver(pre_save, sender=Post)
+def post_pre_save(sender, instance, **kwargs):
+    """Запоминает прежнюю группу поста, чтобы обновить и её ленту."""
+    if not instance._state.adding:
+        instance._previous_group_id = Post.objects.filter(
+            pk=instance.pk
+        ).values_list('group_id', flat=True).first()
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, update_fields, **kwargs):
+    """Раскладывает новый пост по лентам подписчиков."""
+    if update_fields is None or 'text' in update_fields:
+        search.index_posts([instance])
+    if created:
+        counters.change_user_counter(instance.author_id, 'posts_count', 1)
+        timeline.fan_out(instance)
+        feed_cache.bump(*feed_cache.post_scopes(instance))
+    else:
+        cards.bump_version(instance)
+        bump_post_feeds(instance)
+        previous_group_id = getattr(instance, '_previous_group_id', None)
+        if previous_group_id and previous_group_id != instance.group_id:
+            feed_cache.bump(f'group:{previous_group_id}')
+
+
+@receiver(pre_delete, sender=Post)
+def post_pre_delete(sender, instance, **kwargs):
+    # Связи с тегами удалятся каскадом, без сигнала m2m_changed.
+    tag_ids = set(instance.tags.values_list('id', flat=True))
+    counters.change_tag_counters(dict.fromkeys(tag_ids, -1))
+    bump_post_feeds(instance, tag_ids)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    counters.change_user_counter(instance.author_id, 'posts_count', -1)
+    search.remove_posts([instance.pk])
+
+
+def comments_changed(comment, delta):
+    """
+    Обновляет счётчик комментариев поста. Карточки лент комментарии
+    не выводят, поэтому ни версия поста, ни поколения лент не
+    меняются: ETag страницы поста и API учитывают comments_count.
+    """
+    counters.change_comments_count(comment.post_id, delta)
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, **kwargs):
+    if created and instance.post_id:
+        comments_changed(instance, 1)
+
+
+def _deletes_post(origin, post_id):
+    """Удаление начато с поста post_id (или queryset постов)."""
+    if isinstance(origin, Post):
+        return origin.pk == post_id
+    return isinstance(origin, QuerySet) and origin.model is Post
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, origin=None, **kwargs):
+    # При каскадном удалении поста его счётчик не нужен.
+    if instance.post_id and not _deletes_post(origin, instance.post_id):
+        comments_changed(instance, -1)
+
+
+@receiver(post_save, sender=Follow)
+def follow_saved(sender, instance, created, **kwargs):
+    """Дополняет ленту нового подписчика постами автора."""
+    if created:
+        counters.change_user_counter(instance.author_id, 'followers_count', 1)
+        counters.change_user_counter(instance.user_id, 'following_count', 1)
+        timeline.backfill(instance.user_id, instance.author_id)
+        feed_cache.bump(f'author:{instance.author_id}')
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    """Убирает посты автора из ленты отписавшегося."""
+    counters.change_user_counter(instance.author_id, 'followers_count', -1)
+    counters.change_user_counter(instance.user_id, 'following_count', -1)
+    timeline.prune(instance.user_id, instance.author_id)
+    feed_cache.bump(f'author:{instance.author_id}')
+
+
+@receiver(m2m_changed, sender=Post.tags.through)
+def post_tags_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """Обновляет похожие посты после изменения тегов поста."""
+    if reverse:
+        return
+    if action == 'pre_clear':
+        instance._cleared_tag_ids = set(
+            instance.tags.values_list('id', flat=True)
+        )
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        tag_ids = pk_set or getattr(instance, '_cleared_tag_ids', ())
+        counters.change_tag_counters(
+            dict.fromkeys(tag_ids, 1 if action == 'post_add' else -1)
+        )
+        cards.bump_version(instance)
+        bump_post_feeds(instance, tag_ids)
+        similar.refresh(instance)
+
+
+@receiver(post_save, sender=Tag)
+def tag_saved(sender, instance, created, **kwargs):
+    if created:
+        TagCounter.objects.get_or_create(tag=instance)
+    else:
+        cards.bump_versions(Post.objects.filter(tags=instance))
+        feed_cache.bump(feed_cache.EPOCH)
+
+
+@receiver(post_delete, sender=Tag)
+def tag_deleted(sender, instance, **kwargs):
+    feed_cache.bump(feed_cache.EPOCH)
+
+
+@receiver(post_save, sender=Group)
+def group_saved(sender, instance, created, **kwargs):
+    if not created:
+        cards.bump_versions(instance.posts.all())
+        feed_cache.bump(feed_cache.EPOCH)
+
+
+@receiver(pre_delete, sender=Group)
+def group_deleted(sender, instance, **kwargs):
+    """Посты удаляемой группы останутся без неё - обновляем карточки."""
+    cards.bump_versions(instance.posts.all())
+    feed_cache.bump(feed_cache.EPOCH)
@@ -0,0 +1,170 @@
+"""
+Предрассчитанные похожие посты (top-K по числу общих тегов).
+
+Списки обновляются инкрементально при изменении тегов поста и
+полностью пересобираются командой rebuild_similar_posts. Удаление
+поста лишь укорачивает списки, в которые он входил, - недостающие
+позиции восполняет следующая пересборка.
+
+Инкрементальное обновление идёт в запросе, изменившем теги, поэтому
+оно рассматривает только SIMILAR_CANDIDATES_PER_TAG последних постов
+каждого тега: цена правки тегов не растёт с популярностью тега.
+Точные списки строит rebuild_similar_posts.
+"""
+from collections import Counter, defaultdict
+from itertools import chain
+
+from django.conf import settings
+from django.db import transaction
+
+from .models import SimilarPost, TaggedPost
+
+BATCH_SIZE = 1000
+
+
+def _overlap(post_ids, per_tag=None):
+    """
+    Кандидаты в похожие для постов post_ids:
+    {post_id: [(similar_id, score, pub_date), ...]} по убыванию ранга,
+    где score - число общих тегов. per_tag ограничивает кандидатов
+    каждого тега последними per_tag постами.
+    """
+    post_tags = defaultdict(set)
+    for post_id, tag_id in TaggedPost.objects.filter(
+        content_object_id__in=post_ids
+    ).values_list('content_object_id', 'tag_id'):
+        post_tags[post_id].add(tag_id)
+    tag_ids = set().union(*post_tags.values())
+    tagged_posts = TaggedPost.objects.values_list(
+        'content_object_id', 'tag_id', 'content_object__pub_date'
+    )
+    if per_tag is None:
+        rows = tagged_posts.filter(tag_id__in=tag_ids).iterator(
+            chunk_size=BATCH_SIZE
+        )
+    else:
+        # Проход индекса (tag, content_object) с конца для каждого тега.
+        rows = chain.from_iterable(
+            tagged_posts.filter(tag_id=tag_id).order_by(
+                '-content_object_id'
+            )[:per_tag]
+            for tag_id in tag_ids
+        )
+    tagged = defaultdict(list)
+    for similar_id, tag_id, pub_date in rows:
+        tagged[tag_id].append((similar_id, pub_date))
+    result = {}
+    for post_id, tag_ids in post_tags.items():
+        scores = Counter()
+        dates = {}
+        for tag_id in tag_ids:
+            for similar_id, pub_date in tagged[tag_id]:
+                scores[similar_id] += 1
+                dates[similar_id] = pub_date
+        scores.pop(post_id, None)
+        result[post_id] = sorted(
+            ((similar_id, score, dates[similar_id])
+             for similar_id, score in scores.items()),
+            key=_rank, reverse=True
+        )
+    return result
+
+
+def _rank(entry):
+    similar_id, score, pub_date = entry
+    return score, pub_date, similar_id
+
+
+def compute(post_ids, per_tag=None):
+    """Списки top-K похожих постов для post_ids: {post_id: [entry]}."""
+    limit = settings.SIMILAR_POSTS_COUNT
+    return {
+        post_id: entries[:limit]
+        for post_id, entries in _overlap(post_ids, per_tag).items()
+    }
+
+
+def _store(lists):
+    SimilarPost.objects.filter(post_id__in=list(lists)).delete()
+    SimilarPost.objects.bulk_create(
+        (SimilarPost(
+            post_id=post_id,
+            similar_id=similar_id,
+            score=score,
+            similar_pub_date=pub_date
+        ) for post_id, entries in lists.items()
+            for similar_id, score, pub_date in entries),
+        BATCH_SIZE
+    )
+
+
+def rebuild(post_ids, per_tag=None):
+    """Полностью пересчитывает списки для переданных постов."""
+    post_ids = list(post_ids)
+    lists = dict.fromkeys(post_ids, [])
+    lists.update(compute(post_ids, per_tag))
+    _store(lists)
+
+
+def refresh(post):
+    """
+    Инкрементальное обновление после изменения тегов поста:
+    пересчитывается его собственный список и списки постов с общими
+    тегами либо ранее ссылавшихся на него. Кандидаты ограничены
+    SIMILAR_CANDIDATES_PER_TAG постами на тег.
+    """
+    limit = settings.SIMILAR_POSTS_COUNT
+    per_tag = settings.SIMILAR_CANDIDATES_PER_TAG
+    ranked = _overlap([post.pk], per_tag).get(post.pk, [])
+    candidates = {
+        similar_id: (score, pub_date)
+        for similar_id, score, pub_date in ranked
+    }
+    own = ranked[:limit]
+    holders = set(SimilarPost.objects.filter(
+        similar=post
+    ).values_list('post_id', flat=True))
+    current = defaultdict(list)
+    for post_id, similar_id, score, pub_date in SimilarPost.objects.filter(
+        post_id__in=holders | set(candidates)
+    ).values_list('post_id', 'similar_id', 'score', 'similar_pub_date'):
+        current[post_id].append((similar_id, score, pub_date))
+
+    changed = {post.pk: own}
+    full = []
+    for post_id in holders | set(candidates):
+        entries = current[post_id]
+        old = dict((similar_id, score) for similar_id, score, _ in entries)
+        new_score = candidates.get(post_id, (0,))[0]
+        if post.pk in old and new_score < old[post.pk]:
+            # Пост опустился в рейтинге - его место может занять пост,
+            # которого нет в сохранённом списке.
+            full.append(post_id)
+            continue
+        updated = [entry for entry in entries if entry[0] != post.pk]
+        if new_score:
+            updated.append((post.pk, new_score, post.pub_date))
+        updated = sorted(updated, key=_rank, reverse=True)[:limit]
+        if updated != sorted(entries, key=_rank, reverse=True):
+            changed[post_id] = updated
+    with transaction.atomic():
+        _store(changed)
+        if full:
+            rebuild(full, per_tag)
+
+
+def similar_posts(post):
+    """Похожие посты из предрассчитанного списка - один запрос по индексу."""
+    entries = post.similar_entries.select_related('similar')
+    return [
+        entry.similar for entry in entries[:settings.SIMILAR_POSTS_COUNT]
+    ]
+
+
+async def asimilar_posts(post):
+    """Асинхронный вариант similar_posts."""
+    entries = post.similar_entries.select_related('similar')
+    return [
+        entry.similar
+        async for entry in entries[:settings.SIMILAR_POSTS_COUNT]
+    ]
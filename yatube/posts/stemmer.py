@@ -0,0 +1,112 @@
+"""
+Стеммер для русского языка (алгоритм Snowball / Портера).
+
+Используется поисковым индексом: в индекс и в запрос попадают
+основы слов, поэтому «котами» находит «кот» и «коты».
+"""
+import re
+from functools import lru_cache
+
+VOWELS = 'аеиоуыэюя'
+
+PERFECTIVE_GERUND = re.compile(
+    r'((ив|ивши|ившись|ыв|ывши|ывшись)|((?<=[ая])(в|вши|вшись)))$'
+)
+REFLEXIVE = re.compile(r'(ся|сь)$')
+ADJECTIVE = re.compile(
+    r'(ее|ие|ые|ое|ими|ыми|ей|ий|ый|ой|ем|им|ым|ом|его|ого|ему|ому|их|ых|'
+    r'ую|юю|ая|яя|ою|ею)$'
+)
+PARTICIPLE = re.compile(r'((ивш|ывш|ующ)|((?<=[ая])(ем|нн|вш|ющ|щ)))$')
+VERB = re.compile(
+    r'((ила|ыла|ена|ейте|уйте|ите|или|ыли|ей|уй|ил|ыл|им|ым|ен|ило|ыло|'
+    r'ено|ят|ует|уют|ит|ыт|ены|ить|ыть|ишь|ую|ю)|'
+    r'((?<=[ая])(ла|на|ете|йте|ли|й|л|ем|н|ло|но|ет|ют|ны|ть|ешь|нно)))$'
+)
+NOUN = re.compile(
+    r'(а|ев|ов|ие|ье|е|иями|ями|ами|еи|ии|и|ией|ей|ой|ий|й|иям|ям|ием|ем|'
+    r'ам|ом|о|у|ах|иях|ях|ы|ь|ию|ью|ю|ия|ья|я)$'
+)
+SUPERLATIVE = re.compile(r'(ейше|ейш)$')
+DERIVATIONAL = re.compile(r'(ость|ост)$')
+WORD = re.compile(r'\w+')
+
+
+def _region(word, start=0):
+    """Начало области после первой согласной, следующей за гласной."""
+    for i in range(start + 1, len(word)):
+        if word[i] not in VOWELS and word[i - 1] in VOWELS:
+            return i + 1
+    return len(word)
+
+
+def _cut(pattern, word):
+    """Удаляет окончание pattern; None, если окончание не найдено."""
+    match = pattern.search(word)
+    if match is None:
+        return None
+    return word[:match.start()]
+
+
+def _step1(rv):
+    """Деепричастие, иначе возвратная частица и одно из окончаний
+    прилагательного, глагола или существительного."""
+    cut = _cut(PERFECTIVE_GERUND, rv)
+    if cut is not None:
+        return cut
+    reflexive = _cut(REFLEXIVE, rv)
+    if reflexive is not None:
+        rv = reflexive
+    cut = _cut(ADJECTIVE, rv)
+    if cut is not None:
+        participle = _cut(PARTICIPLE, cut)
+        return cut if participle is None else participle
+    for pattern in (VERB, NOUN):
+        cut = _cut(pattern, rv)
+        if cut is not None:
+            return cut
+    return rv
+
+
+def _step4(rv):
+    """Двойное н, превосходная степень или мягкий знак."""
+    if rv.endswith('нн'):
+        return rv[:-1]
+    cut = _cut(SUPERLATIVE, rv)
+    if cut is not None:
+        return cut[:-1] if cut.endswith('нн') else cut
+    if rv.endswith('ь'):
+        return rv[:-1]
+    return rv
+
+
+@lru_cache(maxsize=100_000)
+def stem(word):
+    """Основа слова; слово должно быть в нижнем регистре."""
+    word = word.replace('ё', 'е')
+    for i, letter in enumerate(word):
+        if letter in VOWELS:
+            rv_start = i + 1
+            break
+    else:
+        return word
+    r2_start = _region(word, _region(word))
+    prefix, rv = word[:rv_start], word[rv_start:]
+    rv = _step1(rv)
+    if rv.endswith('и'):
+        rv = rv[:-1]
+    # Словообразовательное окончание удаляется только в области R2.
+    match = DERIVATIONAL.search(rv)
+    if match and rv_start + match.start() >= r2_start:
+        rv = rv[:match.start()]
+    return prefix + _step4(rv)
+
+
+def stem_words(text):
+    """Основы всех слов текста в порядке следования."""
+    return [stem(word) for word in WORD.findall(text.lower())]
+
+
+def normalize(text):
+    """Текст, приведённый к основам слов, для записи в индекс."""
+    return ' '.join(stem_words(text))
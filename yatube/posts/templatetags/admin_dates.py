@@ -0,0 +1,104 @@
+"""
+Иерархия дат для списка постов в админке без полного просмотра таблицы.
+
+Стандартный тег date_hierarchy строит список лет и месяцев через
+DISTINCT по усечённой дате, что требует чтения всех строк. Здесь
+границы периода берутся двумя запросами ORDER BY ... LIMIT 1 по индексу
+поля, а промежуточные годы, месяцы и дни перечисляются без обращения
+к базе. В списке могут оказаться периоды без записей.
+"""
+import datetime
+
+from django import template
+from django.contrib.admin.templatetags.admin_list import date_hierarchy
+from django.utils import formats, timezone
+from django.utils.text import capfirst
+from django.utils.translation import gettext as _
+
+register = template.Library()
+
+
+def _bounds(queryset, field_name):
+    dates = queryset.order_by().values_list(field_name, flat=True)
+    first = dates.order_by(field_name).first()
+    last = dates.order_by(f'-{field_name}').first()
+    if first is None or last is None:
+        return None, None
+    if timezone.is_aware(first):
+        first, last = timezone.localtime(first), timezone.localtime(last)
+    return first, last
+
+
+def _month_range(first, last):
+    month = first.replace(day=1)
+    while (month.year, month.month) <= (last.year, last.month):
+        yield month
+        month = (month + datetime.timedelta(days=32)).replace(day=1)
+
+
+@register.inclusion_tag('admin/date_hierarchy.html')
+def indexed_date_hierarchy(cl):
+    field_name = cl.date_hierarchy
+    year_field = f'{field_name}__year'
+    month_field = f'{field_name}__month'
+    day_field = f'{field_name}__day'
+    year_lookup = cl.params.get(year_field)
+    month_lookup = cl.params.get(month_field)
+    if cl.params.get(day_field):
+        return date_hierarchy(cl)
+
+    def link(filters):
+        return cl.get_query_string(filters, [f'{field_name}__'])
+
+    # Выборка уже ограничена выбранным годом или месяцем.
+    first, last = _bounds(cl.queryset, field_name)
+    if first is None:
+        return {'show': True, 'choices': []}
+    if not (year_lookup or month_lookup) and first.year == last.year:
+        year_lookup = first.year
+        if first.month == last.month:
+            month_lookup = first.month
+
+    if year_lookup and month_lookup:
+        days = (
+            first.date() + datetime.timedelta(days=offset)
+            for offset in range((last.date() - first.date()).days + 1)
+        )
+        return {
+            'show': True,
+            'back': {
+                'link': link({year_field: year_lookup}),
+                'title': str(year_lookup),
+            },
+            'choices': [{
+                'link': link({
+                    year_field: year_lookup,
+                    month_field: month_lookup,
+                    day_field: day.day,
+                }),
+                'title': capfirst(
+                    formats.date_format(day, 'MONTH_DAY_FORMAT')
+                ),
+            } for day in days],
+        }
+    if year_lookup:
+        return {
+            'show': True,
+            'back': {'link': link({}), 'title': _('All dates')},
+            'choices': [{
+                'link': link({
+                    year_field: year_lookup, month_field: month.month
+                }),
+                'title': capfirst(
+                    formats.date_format(month, 'YEAR_MONTH_FORMAT')
+                ),
+            } for month in _month_range(first, last)],
+        }
+    return {
+        'show': True,
+        'back': None,
+        'choices': [{
+            'link': link({year_field: str(year)}),
+            'title': str(year),
+        } for year in range(first.year, last.year + 1)],
+    }
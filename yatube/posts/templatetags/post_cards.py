@@ -0,0 +1,10 @@
+from django import template
+
+from ..cards import render_cards
+
+register = template.Library()
+
+
+@register.simple_tag
+def post_cards(posts, variant):
+    return render_cards(posts, variant)
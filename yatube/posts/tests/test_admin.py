@@ -0,0 +1,121 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..benchmarks import LOCMEM_CACHES
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class AdminChangelistQueryTests(TestCase):
+    """
+    Число запросов на страницах списков админки не зависит
+    от числа записей в таблице.
+    """
+    SIZES = (1, 15)
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='pass'
+        )
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test',
+            description='Тестовое описание',
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.admin_client = Client()
+        self.admin_client.force_login(self.admin)
+        self.created = 0
+
+    def _create(self, count):
+        for i in range(self.created, count):
+            author = User.objects.create_user(username=f'user{i}')
+            post = Post.objects.create(
+                author=author, group=self.group, text=f'Кошки и собаки {i}'
+            )
+            post.tags.add(f'tag{i}', 'common')
+            Comment.objects.create(post=post, author=author, text='Текст')
+            Follow.objects.create(user=author, author=self.admin)
+        self.created = count
+
+    def _count_queries(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.admin_client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(context.captured_queries)
+
+    def _assert_constant_queries(self, url):
+        counts = []
+        for size in self.SIZES:
+            self._create(size)
+            counts.append(self._count_queries(url))
+        self.assertEqual(len(set(counts)), 1, counts)
+
+    def test_post_changelist(self):
+        """Список постов: постоянное число запросов."""
+        self._assert_constant_queries(
+            reverse('admin:posts_post_changelist')
+        )
+
+    def test_post_changelist_search_and_dates(self):
+        """Поиск по индексу и иерархия дат не зависят от размера таблицы."""
+        url = reverse('admin:posts_post_changelist')
+        self._assert_constant_queries(f'{url}?q=кошками')
+        self._create(self.SIZES[-1])
+        response = self.admin_client.get(url, {'q': 'собака'})
+        self.assertEqual(
+            len(response.context['cl'].result_list), self.SIZES[-1]
+        )
+        response = self.admin_client.get(
+            url, {'pub_date__year': Post.objects.first().pub_date.year}
+        )
+        self.assertContains(response, 'pub_date__month=')
+
+    def test_comment_changelist(self):
+        """Список комментариев: постоянное число запросов."""
+        url = reverse('admin:posts_comment_changelist')
+        self._assert_constant_queries(url)
+        self._create(self.SIZES[-1])
+        response = self.admin_client.get(url, {'q': 'user1'})
+        self.assertTrue(response.context['cl'].result_list)
+
+    def test_follow_changelist(self):
+        """Список подписок: постоянное число запросов."""
+        self._assert_constant_queries(
+            reverse('admin:posts_follow_changelist')
+        )
+
+    def test_post_group_editable_in_changelist(self):
+        """Группу поста можно сменить прямо в списке постов."""
+        self._create(1)
+        post = Post.objects.get()
+        other = Group.objects.create(
+            title='Другая группа', slug='other', description='Описание'
+        )
+        url = reverse('admin:posts_post_changelist')
+        response = self.admin_client.get(url)
+        self.assertContains(
+            response,
+            f'<option value="{self.group.pk}" selected>{self.group}</option>',
+            html=True
+        )
+        response = self.admin_client.post(url, {
+            'form-TOTAL_FORMS': 1,
+            'form-INITIAL_FORMS': 1,
+            'form-0-id': post.pk,
+            'form-0-group': other.pk,
+            '_save': 'Сохранить',
+        })
+        self.assertEqual(response.status_code, 302)
+        post.refresh_from_db()
+        self.assertEqual(post.group, other)
@@ -0,0 +1,133 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..benchmarks import LOCMEM_CACHES
+from ..models import Comment, Group, Post
+
+User = get_user_model()
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class FeedApiTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test',
+            description='Тестовое описание',
+        )
+        cls.posts = [
+            Post.objects.create(
+                author=cls.user, group=cls.group, text=f'Пост {i}'
+            ) for i in range(12)
+        ]
+
+    def test_feeds_return_cursor_pages(self):
+        """Ленты отдают страницы с курсором на следующую."""
+        urls = [
+            reverse('posts:api_index'),
+            reverse('posts:api_group_list', args=[self.group.slug]),
+            reverse('posts:api_profile', args=[self.user.username]),
+        ]
+        newest = [post.pk for post in reversed(self.posts)]
+        for url in urls:
+            with self.subTest(url=url):
+                data = self.client.get(url).json()
+                self.assertEqual(
+                    [post['id'] for post in data['results']], newest[:10]
+                )
+                self.assertEqual(data['results'][0]['author'], 'auth')
+                self.assertEqual(data['results'][0]['group'], 'test')
+                self.assertIsNone(data['previous'])
+                data = self.client.get(data['next']).json()
+                self.assertEqual(
+                    [post['id'] for post in data['results']], newest[10:]
+                )
+                self.assertIsNone(data['next'])
+
+    def test_feed_not_modified(self):
+        """Повторный запрос с ETag - 304 без загрузки полных строк."""
+        url = reverse('posts:api_index')
+        response = self.client.get(url)
+        self.assertIn('Last-Modified', response)
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(
+                url, HTTP_IF_NONE_MATCH=response['ETag']
+            )
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(len(context.captured_queries), 1)
+        self.assertNotIn('text', context.captured_queries[0]['sql'])
+
+    def test_feed_etag_changes_on_edit(self):
+        """Изменение поста на странице меняет ETag."""
+        url = reverse('posts:api_index')
+        etag = self.client.get(url)['ETag']
+        post = self.posts[-1]
+        post.text = 'Изменённый пост'
+        post.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.json()['results'][0]['text'], 'Изменённый пост'
+        )
+
+    def test_post_detail(self):
+        """Пост отдаётся с тегами и комментариями, новый комментарий
+        меняет ETag."""
+        post = self.posts[0]
+        post.tags.add('python')
+        url = reverse('posts:api_post_detail', args=[post.pk])
+        response = self.client.get(url)
+        data = response.json()
+        self.assertEqual(data['tags'], ['python'])
+        self.assertEqual(data['comments'], [])
+        self.assertEqual(
+            self.client.get(
+                url, HTTP_IF_NONE_MATCH=response['ETag']
+            ).status_code,
+            304
+        )
+        Comment.objects.create(post=post, author=self.user, text='Текст')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['comments'][0]['text'], 'Текст')
+
+    def test_post_detail_etag_follows_commenter_rename(self):
+        """Переименование автора комментария меняет ETag поста."""
+        post = self.posts[0]
+        commenter = User.objects.create_user(username='commenter')
+        Comment.objects.create(post=post, author=commenter, text='Текст')
+        url = reverse('posts:api_post_detail', args=[post.pk])
+        etag = self.client.get(url)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            commenter.username = 'renamed'
+            commenter.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['comments'][0]['author'], 'renamed')
+
+    @override_settings(NUM_COMMENTS_PER_PAGE=3)
+    def test_post_detail_paginates_comments(self):
+        """Комментарии отдаются страницами, новые сверху."""
+        post = self.posts[0]
+        comments = [
+            Comment.objects.create(
+                post=post, author=self.user, text=f'Комментарий {i}'
+            ) for i in range(4)
+        ]
+        newest = [comment.pk for comment in reversed(comments)]
+        url = reverse('posts:api_post_detail', args=[post.pk])
+        data = self.client.get(url).json()
+        self.assertEqual(
+            [comment['id'] for comment in data['comments']], newest[:3]
+        )
+        data = self.client.get(data['comments_next']).json()
+        self.assertEqual(
+            [comment['id'] for comment in data['comments']], newest[3:]
+        )
+        self.assertIsNone(data['comments_next'])
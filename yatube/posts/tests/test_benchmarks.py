@@ -0,0 +1,40 @@
+from django.test import SimpleTestCase
+
+from ..benchmarks import compare
+
+
+class CompareTests(SimpleTestCase):
+    baseline = {
+        '10000': {
+            'index': {'ms': 20.0, 'queries': 5},
+            'profile': {'ms': 2.0, 'queries': 6},
+        }
+    }
+
+    def test_time_regression_beyond_threshold(self):
+        """Рост времени сверх порога и min_delta - регрессия."""
+        results = {'10000': {
+            'index': {'ms': 25.0, 'queries': 5},
+            'profile': {'ms': 2.9, 'queries': 6},
+        }}
+        self.assertEqual(
+            compare(results, self.baseline, 0.2),
+            ['10000 index: 20.00 -> 25.00 мс']
+        )
+        self.assertEqual(compare(results, self.baseline, 0.3), [])
+
+    def test_query_count_regression(self):
+        """Любой рост числа запросов - регрессия."""
+        results = {'10000': {'profile': {'ms': 2.0, 'queries': 7}}}
+        self.assertEqual(
+            compare(results, self.baseline, 0.2),
+            ['10000 profile: 6 -> 7 запросов']
+        )
+
+    def test_new_metrics_are_not_compared(self):
+        """Метрики и наборы, которых нет в базовом замере, пропускаются."""
+        results = {
+            '10000': {'tag': {'ms': 50.0, 'queries': 9}},
+            '100000': {'index': {'ms': 90.0, 'queries': 5}},
+        }
+        self.assertEqual(compare(results, self.baseline, 0.2), [])
@@ -1,12 +1,19 @@
+from io import StringIO
+
 from django.contrib.auth import get_user_model
 from django.core.cache import cache
-from django.test import Client, TestCase
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
 
-from ..models import Post, Group
+from .. import feed_cache
+from ..benchmarks import LOCMEM_CACHES
+from ..models import Comment, Group, Post
 
 User = get_user_model()
 
 
+@override_settings(CACHES=LOCMEM_CACHES)
 class CacheTests(TestCase):
     @classmethod
     def setUpClass(cls):
@@ -17,20 +24,268 @@ class CacheTests(TestCase):
             slug='test',
             description='Тестовое описание',
         )
+        cls.other_group = Group.objects.create(
+            title='Другая группа',
+            slug='other',
+            description='Тестовое описание',
+        )
 
     def setUp(self):
+        cache.clear()
         self.guest_client = Client()
         self.authorized_client = Client()
         self.authorized_client.force_login(self.user)
 
+    def _renders(self, url, requests=10):
+        """Сколько из запросов к url потребовали рендеринга шаблона."""
+        renders = 0
+        for _ in range(requests):
+            response = self.guest_client.get(url)
+            renders += bool(response.templates)
+        return renders
+
     def test_cache_index_page(self):
+        """Повторные запросы главной страницы отдаются из кеша."""
         cache1 = self.guest_client.get('/').content
-        Post.objects.create(
+        self.assertEqual(self._renders('/'), 0)
+        self.assertEqual(cache1, self.guest_client.get('/').content)
+
+    def test_new_post_is_visible_immediately(self):
+        """Новый пост сразу виден в ленте, несмотря на кеш."""
+        self.guest_client.get('/')
+        with self.captureOnCommitCallbacks(execute=True):
+            Post.objects.create(
+                author=self.user,
+                text='Тестовый пост',
+                group=self.group,
+            )
+        self.assertContains(self.guest_client.get('/'), 'Тестовый пост')
+
+    def test_post_change_invalidates_only_its_feeds(self):
+        """Изменение поста не сбрасывает кеш лент, где его нет."""
+        post = Post.objects.create(
             author=self.user,
             text='Тестовый пост',
             group=self.group,
         )
-        cache2 = self.guest_client.get('/').content
-        self.assertEqual(cache1, cache2)
+        group_url = reverse('posts:group_list', args=[self.group.slug])
+        other_url = reverse('posts:group_list', args=[self.other_group.slug])
+        self.guest_client.get(group_url)
+        self.guest_client.get(other_url)
+        post.text = 'Новый текст'
+        with self.captureOnCommitCallbacks(execute=True):
+            post.save()
+        self.assertEqual(self._renders(other_url), 0)
+        self.assertEqual(self._renders(group_url), 1)
+        self.assertContains(self.guest_client.get(group_url), 'Новый текст')
+
+    def test_tag_changes_invalidate_feeds(self):
+        """Теги поста сбрасывают кеш его лент."""
+        post = Post.objects.create(author=self.user, text='Тестовый пост')
+        self.guest_client.get('/')
+        with self.captureOnCommitCallbacks(execute=True):
+            post.tags.add('python')
+        tag_url = reverse('posts:post_list_by_tag', args=['python'])
+        self.assertContains(self.guest_client.get('/'), tag_url)
+        self.assertContains(self.guest_client.get(tag_url), 'Тестовый пост')
+        with self.captureOnCommitCallbacks(execute=True):
+            post.tags.clear()
+        self.assertNotContains(
+            self.guest_client.get(tag_url), 'Тестовый пост'
+        )
+
+    def test_comments_keep_feeds_cached(self):
+        """Комментарии не сбрасывают кеш лент и карточек."""
+        post = Post.objects.create(
+            author=self.user, text='Тестовый пост', group=self.group
+        )
+        post.tags.add('python')
+        urls = [
+            '/',
+            reverse('posts:post_list_by_tag', args=['python']),
+            reverse('posts:group_list', args=[self.group.slug]),
+            reverse('posts:profile', args=[self.user.username]),
+        ]
+        for url in urls:
+            self.guest_client.get(url)
+        version = Post.objects.get(pk=post.pk).version
+        with self.captureOnCommitCallbacks(execute=True):
+            comment = Comment.objects.create(
+                post=post, author=self.user, text='Ответ'
+            )
+            comment.delete()
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertEqual(self._renders(url, requests=1), 0)
+        self.assertEqual(Post.objects.get(pk=post.pk).version, version)
+
+    def test_render_texts_refreshes_cached_feeds(self):
+        """Перерендеренный текст сразу виден в закешированной ленте."""
+        post = Post.objects.create(author=self.user, text='Новый\nтекст')
+        Post.objects.filter(pk=post.pk).update(text_html='Старый HTML')
+        self.assertContains(self.guest_client.get('/'), 'Старый HTML')
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('render_texts', everything=True, stdout=StringIO())
+        response = self.guest_client.get('/')
+        self.assertNotContains(response, 'Старый HTML')
+        self.assertContains(response, 'Новый<br>текст')
+
+    def test_only_name_changes_invalidate_author_cards(self):
+        """Карточки и ленты сбрасывает смена имени, а не пароля."""
+        author = User.objects.create_user(username='writer')
+        post = Post.objects.create(author=author, text='Тестовый пост')
+        epoch = feed_cache.generations([feed_cache.EPOCH])
+        with self.captureOnCommitCallbacks(execute=True):
+            author.set_password('новый пароль')
+            author.save()
+        post.refresh_from_db()
+        self.assertEqual(post.version, 1)
+        self.assertEqual(
+            feed_cache.generations([feed_cache.EPOCH]), epoch
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            author.first_name = 'Лев'
+            author.save()
+        post.refresh_from_db()
+        self.assertEqual(post.version, 2)
+        self.assertNotEqual(
+            feed_cache.generations([feed_cache.EPOCH]), epoch
+        )
+
+    def test_generations_bumped_after_commit(self):
+        """Поколение лент меняется только после фиксации транзакции."""
+        before = feed_cache.generations(['all'])['all']
+        with self.captureOnCommitCallbacks(execute=True):
+            Post.objects.create(author=self.user, text='Тестовый пост')
+            self.assertEqual(feed_cache.generations(['all'])['all'], before)
+        self.assertNotEqual(feed_cache.generations(['all'])['all'], before)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class PostCardCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            author=cls.user,
+            text='Тестовый пост',
+            group=cls.group,
+        )
+
+    def setUp(self):
         cache.clear()
-        self.assertNotEqual(cache2, self.guest_client.get('/').content)
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+        self.url = reverse('posts:profile', args=[self.user.username])
+
+    def test_warm_cache_skips_card_rendering(self):
+        """Карточки из кеша не рендерятся повторно."""
+        response = self.guest_client.get(self.url)
+        self.assertTemplateUsed(response, 'posts/includes/cards/profile.html')
+        response = self.guest_client.get(self.url)
+        self.assertTemplateNotUsed(
+            response, 'posts/includes/cards/profile.html'
+        )
+
+    def test_post_edit_invalidates_card(self):
+        """Изменение поста, его тегов и группы обновляет карточку."""
+        self.guest_client.get(self.url)
+        self.post.text = 'Изменённый текст'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post.save()
+        self.assertContains(self.guest_client.get(self.url), 'Изменённый')
+        self.group.title = 'Новое название'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.group.save()
+        self.assertContains(
+            self.guest_client.get(self.url), 'Новое название'
+        )
+
+    def test_viewer_specific_links_stay_outside_card(self):
+        """Ссылка «редактировать» видна только автору при тёплом кеше."""
+        edit_url = reverse('posts:post_edit', args=[self.post.pk])
+        self.assertContains(self.authorized_client.get(self.url), edit_url)
+        self.assertNotContains(self.guest_client.get(self.url), edit_url)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            author=cls.user, group=cls.group, text='Тестовый пост'
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.reader)
+        self.urls = [
+            reverse('posts:index'),
+            reverse('posts:group_list', args=[self.group.slug]),
+            reverse('posts:profile', args=[self.user.username]),
+            reverse('posts:post_detail', args=[self.post.pk]),
+        ]
+
+    def test_matching_etag_skips_rendering(self):
+        """При совпадении ETag отдаётся 304 без рендеринга шаблонов."""
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertIn('private', response['Cache-Control'])
+                response = self.client.get(
+                    url, HTTP_IF_NONE_MATCH=response['ETag']
+                )
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response.templates, [])
+
+    def test_changes_invalidate_etag(self):
+        """Правка поста меняет ETag страниц."""
+        etags = {url: self.client.get(url)['ETag'] for url in self.urls}
+        self.post.text = 'Изменённый пост'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post.save()
+        for url, etag in etags.items():
+            with self.subTest(url=url):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+                self.assertTrue(response.templates)
+
+    def test_comment_invalidates_only_post_etag(self):
+        """Новый комментарий меняет ETag страницы поста, но не лент."""
+        etags = {url: self.client.get(url)['ETag'] for url in self.urls}
+        with self.captureOnCommitCallbacks(execute=True):
+            Comment.objects.create(
+                post=self.post, author=self.reader, text='Комментарий'
+            )
+        post_url = reverse('posts:post_detail', args=[self.post.pk])
+        for url, etag in etags.items():
+            with self.subTest(url=url):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(
+                    response.status_code, 200 if url == post_url else 304
+                )
+
+    def test_etag_depends_on_user(self):
+        """Страницы разных пользователей не делят ETag."""
+        guest = Client()
+        for url in self.urls:
+            with self.subTest(url=url):
+                etag = self.client.get(url)['ETag']
+                response = guest.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
@@ -0,0 +1,96 @@
+import gzip
+import json
+import os
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .. import export
+from ..models import Comment, Group, Post
+
+User = get_user_model()
+
+
+class ExportTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.other = User.objects.create_user(username='other')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test',
+            description='Тестовое описание',
+        )
+        cls.posts = [
+            Post.objects.create(
+                author=cls.user, group=cls.group, text=f'Пост {i}'
+            ) for i in range(5)
+        ]
+        cls.posts[0].tags.add('first', 'common')
+        Comment.objects.create(
+            post=cls.posts[0], author=cls.other, text='Комментарий'
+        )
+        Post.objects.create(author=cls.other, text='Чужой пост')
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    @staticmethod
+    def _parse(content):
+        return [json.loads(line) for line in content.splitlines()]
+
+    def test_iter_posts_keyset_chunks(self):
+        """Окна по id выдают все посты, запросов - по числу окон."""
+        queryset = export.export_queryset(author=self.user)
+        with CaptureQueriesContext(connection) as context:
+            posts = list(export.iter_posts(queryset, chunk_size=2))
+        self.assertEqual(posts, sorted(self.posts, key=lambda p: p.pk))
+        # Три окна: пост, теги и комментарии на каждое.
+        self.assertEqual(len(context.captured_queries), 9)
+
+    def test_profile_export_view(self):
+        """Выгрузка профиля - NDJSON с тегами и комментариями."""
+        response = self.authorized_client.get(
+            reverse('posts:profile_export', args=[self.user.username])
+        )
+        rows = self._parse(b''.join(response.streaming_content))
+        self.assertEqual([row['id'] for row in rows],
+                         [post.pk for post in self.posts])
+        self.assertEqual(sorted(rows[0]['tags']), ['common', 'first'])
+        self.assertEqual(rows[0]['comments'][0]['author'], 'other')
+        self.assertEqual(rows[0]['group'], 'test')
+
+    def test_group_export_view_gzip(self):
+        """Выгрузка сообщества сжимается, если клиент принимает gzip."""
+        response = self.authorized_client.get(
+            reverse('posts:group_export', args=[self.group.slug]),
+            HTTP_ACCEPT_ENCODING='gzip, deflate'
+        )
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        content = gzip.decompress(b''.join(response.streaming_content))
+        self.assertEqual(len(self._parse(content)), len(self.posts))
+
+    def test_export_requires_login(self):
+        """Выгрузка доступна только авторизованным пользователям."""
+        response = self.client.get(
+            reverse('posts:profile_export', args=[self.user.username])
+        )
+        self.assertEqual(response.status_code, 302)
+
+    def test_export_posts_command(self):
+        """Команда export_posts пишет gzip-файл."""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'posts.ndjson.gz')
+            call_command(
+                'export_posts', author='other', gzip=True, output=path
+            )
+            with gzip.open(path) as file:
+                rows = self._parse(file.read())
+        self.assertEqual([row['text'] for row in rows], ['Чужой пост'])
@@ -1,12 +1,19 @@
 import shutil
 import tempfile
+from io import StringIO
+from unittest import mock
 
 from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
+from sorl.thumbnail import get_thumbnail
+from sorl.thumbnail.base import ThumbnailBackend
 
+from ..benchmarks import LOCMEM_CACHES
 from ..models import Post, Group, Comment
 
 TEMP_MEDIA_ROOT = tempfile.mktemp(dir=settings.BASE_DIR)
@@ -14,7 +21,9 @@ TEMP_MEDIA_ROOT = tempfile.mktemp(dir=settings.BASE_DIR)
 User = get_user_model()
 
 
-@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+@override_settings(
+    MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0, CACHES=LOCMEM_CACHES
+)
 class PostCreateFormTests(TestCase):
     @classmethod
     def setUpClass(cls):
@@ -56,6 +65,7 @@ class PostCreateFormTests(TestCase):
         shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
 
     def setUp(self):
+        cache.clear()
         self.authorized_client = Client()
         self.authorized_client.force_login(self.user)
         self.authorized_client2 = Client()
@@ -69,6 +79,15 @@ class PostCreateFormTests(TestCase):
                 getattr(actual_post, field)
             )
 
+    def _assert_thumbnails_ready(self, name):
+        """Все размеры миниатюр берутся из хранилища без генерации."""
+        with mock.patch.object(
+            ThumbnailBackend, '_create_thumbnail'
+        ) as create:
+            for geometry, options in settings.THUMBNAIL_GEOMETRIES:
+                get_thumbnail(name, geometry, **options)
+        create.assert_not_called()
+
     def test_image_in_context_paginated_pages(self):
         """
         Появление поста с картинкой на страницах
@@ -128,6 +147,53 @@ class PostCreateFormTests(TestCase):
             image='posts/small.gif'
         ).exists())
 
+    def test_thumbnails_generated_on_upload(self):
+        """Миниатюры строятся после сохранения поста, а не при показе."""
+        uploaded = SimpleUploadedFile(
+            name='thumb.gif',
+            content=self.small_gif,
+            content_type='image/gif'
+        )
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            self.authorized_client.post(
+                reverse('posts:post_create'),
+                data={'text': 'Пост с картинкой', 'image': uploaded},
+            )
+        self.assertEqual(len([
+            callback for callback in callbacks
+            if callback.__qualname__.startswith('schedule.')
+        ]), 1)
+        post = Post.objects.get(text='Пост с картинкой')
+        self._assert_thumbnails_ready(post.image.name)
+
+    def test_generate_thumbnails_command(self):
+        """Команда генерирует миниатюры уже загруженных изображений."""
+        post = Post.objects.create(
+            author=self.user,
+            text='Пост без миниатюр',
+            image=SimpleUploadedFile(
+                name='backfill.gif',
+                content=self.small_gif,
+                content_type='image/gif'
+            )
+        )
+        call_command('generate_thumbnails', workers=0, stdout=StringIO())
+        self._assert_thumbnails_ready(post.image.name)
+
+    def test_generate_thumbnails_without_workers_option(self):
+        """THUMBNAIL_WORKERS = 0 без --workers генерирует синхронно."""
+        post = Post.objects.create(
+            author=self.user,
+            text='Пост без миниатюр',
+            image=SimpleUploadedFile(
+                name='inline.gif',
+                content=self.small_gif,
+                content_type='image/gif'
+            )
+        )
+        call_command('generate_thumbnails', stdout=StringIO())
+        self._assert_thumbnails_ready(post.image.name)
+
     def test_post_edit(self):
         """Валидная форма редактирует запись."""
         form_data = {
@@ -0,0 +1,164 @@
+import json
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from .. import search
+from ..benchmarks import LOCMEM_CACHES
+from ..models import Comment, Follow, Group, Post, TimelineEntry
+
+User = get_user_model()
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ImportContentTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='leo')
+        cls.reader = User.objects.create_user(username='anna')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test',
+            description='Тестовое описание',
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+
+    def _import(self, content, suffix='.ndjson', **options):
+        with tempfile.NamedTemporaryFile(
+            'w', suffix=suffix, encoding='utf-8'
+        ) as file:
+            file.write(content)
+            file.flush()
+            out, err = StringIO(), StringIO()
+            call_command(
+                'import_content', file.name, stdout=out, stderr=err,
+                **options
+            )
+        return out.getvalue(), err.getvalue()
+
+    def test_import_ndjson(self):
+        """Импорт создаёт записи и обновляет производные данные."""
+        records = [
+            {'type': 'post', 'id': 100, 'author': 'leo', 'group': 'test',
+             'text': 'Импортированные коты', 'tags': ['cats', 'pets'],
+             'pub_date': '2022-05-01T10:00:00'},
+            {'type': 'post', 'author': 'new', 'text': 'Второй пост',
+             'tags': ['cats']},
+            {'type': 'comment', 'post': 100, 'author': 'anna',
+             'text': 'Комментарий'},
+            {'type': 'follow', 'user': 'new', 'author': 'leo'},
+            {'type': 'post', 'author': 'leo', 'group': 'missing',
+             'text': 'Пропущенный'},
+        ]
+        content = '\n'.join(json.dumps(record) for record in records)
+        out, err = self._import(content, create_users=True, batch_size=2)
+        self.assertIn('постов: 2, комментариев: 1, подписок: 1', out)
+        self.assertIn('пропущено: 1', out)
+        self.assertIn('группа missing не найдена', err)
+
+        post = Post.objects.get(pk=100)
+        self.assertEqual(post.group, self.group)
+        self.assertEqual(post.pub_date.year, 2022)
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(sorted(post.tags.names()), ['cats', 'pets'])
+        self.assertEqual(post.text_html, 'Импортированные коты')
+        self.assertEqual(post.comments.get().text_html, 'Комментарий')
+        self.assertEqual(
+            Post.objects.get(text='Второй пост').excerpt, 'Второй пост'
+        )
+        self.author.counters.refresh_from_db()
+        self.assertEqual(self.author.counters.posts_count, 1)
+        self.assertEqual(self.author.counters.followers_count, 2)
+        new_user = User.objects.get(username='new')
+        self.assertEqual(new_user.counters.posts_count, 1)
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.reader, post=post
+        ).exists())
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=new_user, post=post
+        ).exists())
+        self.assertEqual(
+            [pk for pk, _ in search.search_ids('кот')], [post.pk]
+        )
+        self.assertIn('rebuild_similar_posts', out)
+
+    def test_mixed_batch_keeps_tags_with_their_posts(self):
+        """Посты с id и без id в одном пакете получают свои теги."""
+        records = [
+            {'type': 'post', 'author': 'leo', 'text': 'auto A',
+             'tags': ['x']},
+            {'type': 'post', 'id': 500, 'author': 'leo', 'text': 'explicit B',
+             'tags': ['y']},
+            {'type': 'post', 'author': 'leo', 'text': 'auto C',
+             'tags': ['z']},
+        ]
+        content = '\n'.join(json.dumps(record) for record in records)
+        self._import(content)
+        for text, tag in (('auto A', 'x'), ('explicit B', 'y'),
+                          ('auto C', 'z')):
+            with self.subTest(text=text):
+                post = Post.objects.get(text=text)
+                self.assertEqual(list(post.tags.names()), [tag])
+        self.assertEqual(Post.objects.get(pk=500).text, 'explicit B')
+
+    def test_malformed_records_are_reported(self):
+        """Записи неверной структуры пропускаются с ошибкой строки."""
+        lines = [
+            '[1]',
+            '"x"',
+            json.dumps({'type': 'post', 'id': 'abc', 'author': 'leo',
+                        'text': 'Нечисловой id'}),
+            json.dumps({'type': 'post', 'id': [1], 'author': 'leo',
+                        'text': 'id-список'}),
+            json.dumps({'type': 'post', 'id': {'a': 1}, 'author': 'leo',
+                        'text': 'id-словарь'}),
+            json.dumps({'type': 'comment', 'post': [1], 'author': 'leo',
+                        'text': 'post-список'}),
+            json.dumps({'type': 'post', 'author': ['leo'],
+                        'text': 'author-список'}),
+            json.dumps({'type': 'post', 'author': 'leo', 'text': 'Теги',
+                        'tags': {'a': 1}}),
+            json.dumps({'type': 'post', 'author': 'leo', 'text': 'Верный'}),
+        ]
+        out, err = self._import('\n'.join(lines))
+        self.assertIn('постов: 1', out)
+        self.assertIn('пропущено: 8', out)
+        for line_number in range(1, 9):
+            with self.subTest(line_number=line_number):
+                self.assertIn(f'строка {line_number}:', err)
+        self.assertEqual(
+            list(Post.objects.values_list('text', flat=True)), ['Верный']
+        )
+
+    def test_string_tags_split_on_commas(self):
+        """Строка тегов делится по запятым, как в CSV."""
+        record = {'type': 'post', 'author': 'leo', 'text': 'Теги строкой',
+                  'tags': 'ab, cd'}
+        self._import(json.dumps(record))
+        self.assertEqual(
+            sorted(Post.objects.get(text='Теги строкой').tags.names()),
+            ['ab', 'cd']
+        )
+
+    def test_import_csv(self):
+        """CSV: тип записей задаётся для всего файла, теги через запятую."""
+        content = (
+            'author,text,tags\n'
+            'leo,Первый,"a, b"\n'
+            'ghost,Без автора,\n'
+        )
+        out, err = self._import(content, suffix='.csv')
+        self.assertIn('постов: 1', out)
+        self.assertIn('пользователь ghost не найден', err)
+        self.assertEqual(
+            sorted(Post.objects.get(text='Первый').tags.names()), ['a', 'b']
+        )
+        self.assertFalse(Comment.objects.exists())
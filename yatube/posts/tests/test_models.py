@@ -1,7 +1,15 @@
+from io import StringIO
+
 from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from taggit.models import Tag
 
-from ..models import Group, Post
+from ..models import (
+    Comment, Follow, Group, Post, TagCounter, TaggedPost, UserCounter
+)
 
 User = get_user_model()
 
@@ -58,3 +66,136 @@ class PostModelTest(TestCase):
                 self.assertEqual(
                     post._meta.get_field(field).help_text, expected_value
                 )
+
+
+class CounterModelTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.author = User.objects.create_user(username='author')
+
+    def _counters(self, user):
+        return UserCounter.objects.get(user=user)
+
+    def test_counters_follow_creates_and_deletes(self):
+        """Счётчики обновляются при создании и удалении объектов."""
+        post = Post.objects.create(author=self.author, text='Пост')
+        comment = Comment.objects.create(
+            post=post, author=self.user, text='Комментарий'
+        )
+        follow = Follow.objects.create(user=self.user, author=self.author)
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(self._counters(self.author).posts_count, 1)
+        self.assertEqual(self._counters(self.author).followers_count, 1)
+        self.assertEqual(self._counters(self.user).following_count, 1)
+        comment.delete()
+        follow.delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 0)
+        self.assertEqual(self._counters(self.author).followers_count, 0)
+        self.assertEqual(self._counters(self.user).following_count, 0)
+        post.delete()
+        self.assertEqual(self._counters(self.author).posts_count, 0)
+
+    def test_repair_counters_command(self):
+        """Команда repair_counters пересчитывает счётчики."""
+        Post.objects.bulk_create(
+            [Post(author=self.author, text=f'Пост {i}') for i in range(3)]
+        )
+        UserCounter.objects.filter(user=self.user).delete()
+        Follow.objects.create(user=self.user, author=self.author)
+        call_command('repair_counters', stdout=StringIO())
+        self.assertEqual(self._counters(self.author).posts_count, 3)
+        self.assertEqual(self._counters(self.author).followers_count, 1)
+        self.assertEqual(self._counters(self.user).following_count, 1)
+
+    def test_post_delete_skips_per_comment_updates(self):
+        """Каскадное удаление комментариев не трогает удаляемый пост."""
+        queries = []
+        for comments in (1, 5):
+            post = Post.objects.create(author=self.author, text='Пост')
+            for i in range(comments):
+                Comment.objects.create(
+                    post=post, author=self.user, text=f'Комментарий {i}'
+                )
+            with CaptureQueriesContext(connection) as context:
+                post.delete()
+            queries.append(len(context))
+        self.assertEqual(queries[0], queries[1])
+
+    def _tag_counts(self):
+        return dict(TagCounter.objects.values_list('tag__name', 'posts_count'))
+
+    def test_tag_counters_follow_tag_changes(self):
+        """Число постов тега меняется вместе с тегами и постами."""
+        first = Post.objects.create(author=self.author, text='Первый')
+        second = Post.objects.create(author=self.author, text='Второй')
+        first.tags.add('python', 'django')
+        second.tags.add('python')
+        self.assertEqual(self._tag_counts(), {'python': 2, 'django': 1})
+        first.tags.remove('python')
+        second.tags.add('python')
+        self.assertEqual(self._tag_counts(), {'python': 1, 'django': 1})
+        first.tags.clear()
+        second.delete()
+        self.assertEqual(self._tag_counts(), {'python': 0, 'django': 0})
+
+    def test_repair_counters_counts_tags(self):
+        """repair_counters пересчитывает и счётчики тегов."""
+        post = Post.objects.create(author=self.author, text='Пост')
+        tag = Tag.objects.create(name='python')
+        TaggedPost.objects.create(content_object=post, tag=tag)
+        TagCounter.objects.all().delete()
+        call_command('repair_counters', stdout=StringIO())
+        self.assertEqual(self._tag_counts(), {'python': 1})
+
+
+class RenderedTextTest(TestCase):
+    """HTML и начало текста рендерятся при сохранении."""
+    TEXT = 'Первая <b>строка</b> & "кавычки"\nвторая строка длинного поста'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+
+    def test_post_and_comment_rendered_on_save(self):
+        post = Post.objects.create(author=self.author, text=self.TEXT)
+        comment = Comment.objects.create(
+            post=post, author=self.author, text=self.TEXT
+        )
+        for obj in (post, comment):
+            obj.refresh_from_db()
+            self.assertEqual(
+                obj.text_html,
+                'Первая &lt;b&gt;строка&lt;/b&gt; &amp; &quot;кавычки&quot;'
+                '<br>вторая строка длинного поста'
+            )
+            self.assertEqual(obj.excerpt, 'Первая <b>строка</b> & "кавыч…')
+
+    def test_update_fields_with_text_saves_rendered_fields(self):
+        post = Post.objects.create(author=self.author, text='Старый')
+        post.text = 'Новый\nтекст'
+        post.save(update_fields=['text'])
+        post.refresh_from_db()
+        self.assertEqual(post.text_html, 'Новый<br>текст')
+        self.assertEqual(post.excerpt, 'Новый\nтекст')
+
+    def test_render_texts_command(self):
+        """render_texts заполняет строки, созданные в обход save()."""
+        post = Post.objects.create(author=self.author, text='Пост')
+        Post.objects.bulk_create(
+            [Post(author=self.author, text=f'Пост\n{i}') for i in range(3)]
+        )
+        Comment.objects.bulk_create(
+            [Comment(post=post, author=self.author, text='Комментарий\n')]
+        )
+        call_command('render_texts', batch_size=2, stdout=StringIO())
+        self.assertEqual(
+            set(Post.objects.values_list('text_html', flat=True)),
+            {'Пост', 'Пост<br>0', 'Пост<br>1', 'Пост<br>2'}
+        )
+        self.assertEqual(
+            Comment.objects.get().text_html, 'Комментарий<br>'
+        )
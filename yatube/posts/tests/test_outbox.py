@@ -0,0 +1,120 @@
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.mail.backends.filebased import EmailBackend
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from .. import outbox
+from ..models import OutgoingEmail, Post
+
+User = get_user_model()
+
+TEMP_EMAIL_PATH = tempfile.mkdtemp()
+
+
+@override_settings(
+    EMAIL_BACKEND='django.core.mail.backends.filebased.EmailBackend',
+    EMAIL_FILE_PATH=TEMP_EMAIL_PATH,
+)
+class OutboxTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.post = Post.objects.create(author=cls.user, text='Тестовый пост')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_EMAIL_PATH, ignore_errors=True)
+
+    def setUp(self):
+        shutil.rmtree(TEMP_EMAIL_PATH, ignore_errors=True)
+        os.makedirs(TEMP_EMAIL_PATH)
+
+    def _files(self):
+        return sorted(os.listdir(TEMP_EMAIL_PATH))
+
+    def _enqueue(self, count):
+        return [
+            outbox.enqueue(f'Тема {i}', 'Текст', 'from@example.com',
+                           f'to{i}@example.com')
+            for i in range(count)
+        ]
+
+    def test_share_only_enqueues(self):
+        """post_share ставит письмо в очередь и ничего не отправляет."""
+        response = Client().post(
+            reverse('posts:post_share', args=[self.post.pk]),
+            {'name': 'Лев', 'email': 'leo@example.com',
+             'to': 'anna@example.com', 'comments': 'Почитай'}
+        )
+        self.assertTrue(response.context['sent'])
+        self.assertEqual(self._files(), [])
+        email = OutgoingEmail.objects.get()
+        self.assertEqual(email.to, 'anna@example.com')
+        self.assertEqual(email.status, OutgoingEmail.PENDING)
+
+    def test_drain_sends_batch_over_one_connection(self):
+        """Пакет уходит через одно соединение, повтор ничего не шлёт."""
+        emails = self._enqueue(5)
+        stats = outbox.drain(batch_size=10)
+        self.assertEqual(stats['sent'], 5)
+        files = self._files()
+        self.assertEqual(len(files), 1)
+        with open(os.path.join(TEMP_EMAIL_PATH, files[0])) as log:
+            content = log.read()
+        for email in emails:
+            self.assertIn(outbox.message_id(email), content)
+        self.assertFalse(OutgoingEmail.objects.exclude(
+            status=OutgoingEmail.SENT
+        ).exists())
+        self.assertEqual(outbox.drain(), {})
+        self.assertEqual(len(self._files()), 1)
+
+    def test_claimed_emails_are_skipped(self):
+        """Письма, занятые другим обработчиком, не отправляются."""
+        self._enqueue(3)
+        claimed = outbox.claim(batch_size=2)
+        self.assertEqual(len(claimed), 2)
+        self.assertEqual(outbox.drain()['sent'], 1)
+        self.assertEqual(outbox.send_batch(claimed)['sent'], 2)
+
+    def test_failed_send_is_retried_with_backoff(self):
+        """Ошибка откладывает письмо, после MAX_ATTEMPTS - статус failed."""
+        email, = self._enqueue(1)
+        with mock.patch.object(
+            EmailBackend, 'send_messages', side_effect=OSError('timeout')
+        ):
+            self.assertEqual(outbox.drain()['retried'], 1)
+            email.refresh_from_db()
+            self.assertEqual(email.attempts, 1)
+            self.assertGreater(email.next_attempt_at, timezone.now())
+            self.assertEqual(outbox.drain(), {})
+            for attempt in range(2, outbox.MAX_ATTEMPTS + 1):
+                OutgoingEmail.objects.update(next_attempt_at=timezone.now())
+                outbox.drain()
+        email.refresh_from_db()
+        self.assertEqual(email.status, OutgoingEmail.FAILED)
+        self.assertEqual(email.attempts, outbox.MAX_ATTEMPTS)
+        self.assertIn('timeout', email.last_error)
+
+    def test_send_outbox_command(self):
+        """Команда отправляет очередь пакетами заданного размера."""
+        self._enqueue(3)
+        out = StringIO()
+        call_command('send_outbox', batch_size=2, stdout=out)
+        self.assertIn('Отправлено: 3', out.getvalue())
+        # Число файлов не проверяется: файловый бэкенд называет их по
+        # времени и id соединения, и два пакета за одну секунду могут
+        # попасть в один файл.
+        self.assertFalse(
+            OutgoingEmail.objects.exclude(status=OutgoingEmail.SENT).exists()
+        )
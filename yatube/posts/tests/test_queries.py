@@ -0,0 +1,104 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..benchmarks import LOCMEM_CACHES
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class FeedQueryCountTests(TestCase):
+    """
+    Число запросов к БД на страницах ленты не зависит
+    от количества постов на странице.
+    """
+    PAGE_SIZES = (1, 10)
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(
+            username='author', first_name='Лев', last_name='Толстой'
+        )
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test',
+            description='Тестовое описание',
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.reader)
+
+    def _create_posts(self, count):
+        for i in range(count):
+            post = Post.objects.create(
+                author=self.author, group=self.group, text=f'Пост {i}'
+            )
+            post.tags.add(f'tag{i}', 'common')
+            Comment.objects.create(
+                post=post, author=self.reader, text='Комментарий'
+            )
+
+    def _count_queries(self, url):
+        cache.clear()
+        with CaptureQueriesContext(connection) as context:
+            response = self.authorized_client.get(url)
+        return response, len(context.captured_queries)
+
+    def _assert_constant_queries(self, url_factory, expected):
+        counts = []
+        created = 0
+        for size in self.PAGE_SIZES:
+            self._create_posts(size - created)
+            created = size
+            response, count = self._count_queries(url_factory())
+            self.assertEqual(len(response.context['page_obj']), size)
+            counts.append(count)
+        self.assertEqual(counts, [expected] * len(self.PAGE_SIZES))
+
+    def test_index_query_count(self):
+        """Главная страница: постоянное число запросов, без COUNT."""
+        self._assert_constant_queries(lambda: reverse('posts:index'), 4)
+
+    def test_group_list_query_count(self):
+        """Страница группы: постоянное число запросов."""
+        self._assert_constant_queries(
+            lambda: reverse('posts:group_list', args=[self.group.slug]), 5
+        )
+
+    def test_profile_query_count(self):
+        """Страница профиля: постоянное число запросов."""
+        self._assert_constant_queries(
+            lambda: reverse('posts:profile', args=[self.author.username]), 6
+        )
+
+    def test_follow_index_query_count(self):
+        """Лента подписок: постоянное число запросов."""
+        self._assert_constant_queries(
+            lambda: reverse('posts:follow_index'), 4
+        )
+
+    def test_post_detail_query_count(self):
+        """Страница поста: число запросов не зависит от комментариев."""
+        post = Post.objects.create(author=self.author, text='Пост')
+        counts = []
+        for _ in range(2):
+            for i in range(5):
+                Comment.objects.create(
+                    post=post, author=self.reader, text=f'Комментарий {i}'
+                )
+            _, count = self._count_queries(
+                reverse('posts:post_detail', args=[post.pk])
+            )
+            counts.append(count)
+        # Два запроса из них - версии поста и похожих постов для ETag.
+        self.assertEqual(counts, [7, 7])
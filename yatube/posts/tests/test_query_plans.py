@@ -0,0 +1,105 @@
+import re
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..benchmarks import DUMMY_CACHES
+from ..models import Comment, Follow, Group, Post
+from ..pagination import encode_cursor
+
+User = get_user_model()
+
+# Просмотр таблицы или индекса (кроме вспомогательной строки SCAN
+# CONSTANT ROW) и сортировка во временном B-дереве.
+SCAN = re.compile(r'^SCAN (?!CONSTANT ROW)')
+INDEX_WALK = re.compile(r' USING (COVERING )?INDEX ')
+TEMP_SORT = re.compile(r'USE TEMP B-TREE FOR (ORDER|GROUP) BY')
+
+
+@override_settings(CACHES=DUMMY_CACHES)
+class FeedQueryPlanTests(TestCase):
+    """
+    Запросы лент читают диапазоны индексов: без полного просмотра
+    таблиц и без сортировки во временном B-дереве.
+
+    Таблицы почти пустые и без статистики ANALYZE, поэтому SQLite
+    выбирает план по имеющимся индексам, а не по размеру таблиц.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        for i in range(3):
+            cls.post = Post.objects.create(
+                author=cls.author, group=cls.group, text=f'Пост {i}'
+            )
+            Comment.objects.create(
+                post=cls.post, author=cls.reader, text='Комментарий'
+            )
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def _plans(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, url)
+        plans = []
+        with connection.cursor() as cursor:
+            for query in context.captured_queries:
+                sql = query['sql']
+                if not sql.startswith('SELECT'):
+                    continue
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+                plans.append((sql, [row[3] for row in cursor.fetchall()]))
+        return plans
+
+    @staticmethod
+    def _is_full_scan(step, sql):
+        # Проход индекса в нужном порядке с LIMIT останавливается на
+        # последней строке страницы, SQLite тоже называет его SCAN.
+        if not SCAN.match(step):
+            return False
+        return not (INDEX_WALK.search(step) and ' LIMIT ' in sql)
+
+    def _assert_index_access(self, url):
+        for sql, plan in self._plans(url):
+            for step in plan:
+                with self.subTest(url=url, step=step, sql=sql):
+                    self.assertFalse(
+                        self._is_full_scan(step, sql), 'полный просмотр'
+                    )
+                    self.assertNotRegex(step, TEMP_SORT)
+
+    def test_feed_pages(self):
+        """HTML-ленты, страница поста и лента подписок."""
+        for url in (
+            reverse('posts:index'),
+            reverse('posts:index') + f'?after={encode_cursor(self.post)}',
+            reverse('posts:group_list', args=[self.group.slug]),
+            reverse('posts:profile', args=[self.author.username]),
+            reverse('posts:follow_index'),
+            reverse('posts:post_detail', args=[self.post.pk]),
+        ):
+            self._assert_index_access(url)
+
+    def test_api_feeds(self):
+        """JSON-ленты, в том числе страницы после курсора."""
+        after = f'?after={encode_cursor(self.post)}'
+        for url in (
+            reverse('posts:api_index'),
+            reverse('posts:api_group_list', args=[self.group.slug]),
+            reverse('posts:api_profile', args=[self.author.username]),
+            reverse('posts:api_post_detail', args=[self.post.pk]),
+        ):
+            self._assert_index_access(url)
+            self._assert_index_access(url + after)
@@ -1,13 +1,16 @@
 from http import HTTPStatus
 
 from django.contrib.auth import get_user_model
-from django.test import TestCase, Client
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
 
+from ..benchmarks import LOCMEM_CACHES
 from ..models import Group, Post
 
 User = get_user_model()
 
 
+@override_settings(CACHES=LOCMEM_CACHES)
 class PostURLTests(TestCase):
     @classmethod
     def setUpClass(cls):
@@ -26,6 +29,7 @@ class PostURLTests(TestCase):
         )
 
     def setUp(self):
+        cache.clear()
         self.guest_client = Client()
         self.authorized_client = Client()
         self.authorized_client.force_login(self.user)
@@ -1,16 +1,32 @@
+from io import StringIO
 from itertools import islice
+from unittest import mock
 
+from asgiref.sync import sync_to_async
 from django import forms
 from django.contrib.auth import get_user_model
-from django.test import Client, TestCase
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.contrib.auth.models import AnonymousUser
+from django.http import Http404
+from django.test import (
+    AsyncRequestFactory, Client, RequestFactory, TestCase, override_settings
+)
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
+from .. import search, timeline, views
+from ..benchmarks import LOCMEM_CACHES
 
-from ..models import Post, Group, Comment, Follow
+from ..models import (
+    Comment, Follow, Group, Post, SimilarPost, TimelineEntry
+)
 
 User = get_user_model()
 
 
+@override_settings(CACHES=LOCMEM_CACHES)
 class PostPagesTests(TestCase):
     @classmethod
     def setUpClass(cls):
@@ -28,6 +44,7 @@ class PostPagesTests(TestCase):
         )
 
     def setUp(self):
+        cache.clear()
         self.guest_client = Client()
         self.authorized_client = Client()
         self.authorized_client.force_login(self.user)
@@ -95,6 +112,22 @@ class PostPagesTests(TestCase):
         object_context = response.context['post']
         self._assert_posts_equal(object_context, self.post)
 
+    def test_post_text_rendered_escaped_with_line_breaks(self):
+        """Страницы выводят экранированный текст с <br>."""
+        post = Post.objects.create(
+            author=self.user, group=self.group, text='<i>Кот</i>\nи пёс'
+        )
+        for url in (
+            reverse('posts:index'),
+            reverse('posts:post_detail', kwargs={'post_id': post.pk}),
+        ):
+            with self.subTest(url=url):
+                response = self.authorized_client.get(url)
+                self.assertContains(
+                    response, '&lt;i&gt;Кот&lt;/i&gt;<br>и пёс'
+                )
+                self.assertNotContains(response, '<i>Кот</i>')
+
     def test_create_post_edit_list_page_show_correct_context(self):
         """Шаблон post_detail сформирован с правильным типом полей."""
         response = self.authorized_client.get(
@@ -137,6 +170,7 @@ class PostPagesTests(TestCase):
                 self.assertIsInstance(form_field, expected)
 
 
+@override_settings(CACHES=LOCMEM_CACHES)
 class PaginatorViewsTest(TestCase):
     @classmethod
     def setUpClass(cls):
@@ -161,6 +195,7 @@ class PaginatorViewsTest(TestCase):
             Post.objects.bulk_create(batch, batch_size)
 
     def setUp(self):
+        cache.clear()
         self.guest_client = Client()
         self.authorized_client = Client()
         self.authorized_client.force_login(self.user)
@@ -170,10 +205,24 @@ class PaginatorViewsTest(TestCase):
         response = self.client.get(reverse('posts:index'))
         self.assertEqual(len(response.context['page_obj']), 10)
 
-    def test_second_index_page_contains_ten_records(self):
-        """Пагинатор 2-ой страницы index."""
-        response = self.client.get(reverse('posts:index') + '?page=2')
-        self.assertEqual(len(response.context['page_obj']), 3)
+    def test_index_pages_by_cursor(self):
+        """index листается курсором ?after= вперёд и ?before= назад."""
+        url = reverse('posts:index')
+        first_page = self.client.get(url).context['page_obj']
+        self.assertTrue(first_page.is_cursor)
+        self.assertTrue(first_page.has_next())
+        response = self.client.get(url, {'after': first_page.next_cursor})
+        second_page = response.context['page_obj']
+        self.assertEqual(len(second_page), 3)
+        self.assertFalse(second_page.has_next())
+        self.assertTrue(set(first_page).isdisjoint(second_page))
+        self.assertContains(
+            response, f'?before={second_page.previous_cursor}'
+        )
+        previous_page = self.client.get(
+            url, {'before': second_page.previous_cursor}
+        ).context['page_obj']
+        self.assertEqual(list(previous_page), list(first_page))
 
     def test_first_group_list_page_contains_ten_records(self):
         """Пагинатор 1-ой страницы group_list."""
@@ -208,6 +257,57 @@ class PaginatorViewsTest(TestCase):
         self.assertEqual(len(response.context['page_obj']), 3)
 
 
+@override_settings(CACHES=LOCMEM_CACHES)
+class CursorPaginatorViewsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.author = User.objects.create_user(username='author')
+        Follow.objects.create(user=cls.user, author=cls.author)
+        cls.posts = [
+            Post.objects.create(
+                author=cls.author,
+                text=f'Тестовый текст {i}'
+            ) for i in range(13)
+        ]
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_follow_index_pages_by_cursor(self):
+        """Курсорная пагинация follow_index вперёд и назад."""
+        url = reverse('posts:follow_index')
+        first_page = self.authorized_client.get(url).context['page_obj']
+        self.assertEqual(len(first_page), 10)
+        self.assertTrue(first_page.has_next())
+        self.assertFalse(first_page.has_previous())
+        second_page = self.authorized_client.get(
+            url, {'after': first_page.next_cursor}
+        ).context['page_obj']
+        self.assertEqual(len(second_page), 3)
+        self.assertFalse(second_page.has_next())
+        self.assertTrue(
+            set(first_page).isdisjoint(second_page)
+        )
+        previous_page = self.authorized_client.get(
+            url, {'before': second_page.previous_cursor}
+        ).context['page_obj']
+        self.assertEqual(list(previous_page), list(first_page))
+
+    def test_invalid_cursor_returns_first_page(self):
+        """Некорректный курсор отдаёт первую страницу."""
+        response = self.authorized_client.get(
+            reverse('posts:follow_index'), {'after': 'мусор'}
+        )
+        self.assertEqual(
+            list(response.context['page_obj']), self.posts[::-1][:10]
+        )
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
 class PostCreateTest(TestCase):
     @classmethod
     def setUpClass(cls):
@@ -226,6 +326,7 @@ class PostCreateTest(TestCase):
         )
 
     def setUp(self):
+        cache.clear()
         self.guest_client = Client()
         self.authorized_client = Client()
         self.authorized_client.force_login(self.user)
@@ -290,6 +391,60 @@ class PostCreateTest(TestCase):
         self.assertIn(comment, response.context['comments'])
 
 
+@override_settings(NUM_COMMENTS_PER_PAGE=3, CACHES=LOCMEM_CACHES)
+class PostCommentsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.post = Post.objects.create(author=cls.user, text='Пост')
+        cls.comments = [
+            Comment.objects.create(
+                post=cls.post, author=cls.user, text=f'Комментарий {i}'
+            ) for i in range(5)
+        ]
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_comments_are_loaded_by_pages(self):
+        """На странице поста - новые комментарии, остальные по курсору."""
+        response = self.authorized_client.get(
+            reverse('posts:post_detail', args=[self.post.pk])
+        )
+        first_page = response.context['comments']
+        self.assertEqual(list(first_page), self.comments[:1:-1])
+        self.assertContains(response, 'data-load-more')
+        response = self.authorized_client.get(
+            reverse('posts:post_comments', args=[self.post.pk]),
+            {'after': first_page.next_cursor}
+        )
+        self.assertEqual(
+            list(response.context['comments']), self.comments[1::-1]
+        )
+        self.assertNotContains(response, 'data-load-more')
+        self.assertNotContains(response, '<html')
+
+    def test_ajax_comment_returns_fragment(self):
+        """AJAX-запрос получает только фрагмент нового комментария."""
+        url = reverse('posts:add_comment', args=[self.post.pk])
+        response = self.authorized_client.post(
+            url, {'text': 'Новый'}, HTTP_X_REQUESTED_WITH='XMLHttpRequest'
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertTemplateUsed(response, 'posts/includes/comment.html')
+        self.assertContains(response, 'Новый', status_code=201)
+        self.assertIn('primary_until', response.cookies)
+        response = self.authorized_client.post(
+            url, {'text': ''}, HTTP_X_REQUESTED_WITH='XMLHttpRequest'
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('text', response.json()['errors'])
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
 class FollowTest(TestCase):
     @classmethod
     def setUpClass(cls):
@@ -304,6 +459,7 @@ class FollowTest(TestCase):
         )
 
     def setUp(self):
+        cache.clear()
         self.authorized_client = Client()
         self.authorized_client.force_login(self.user1)
         self.authorized_client3 = Client()
@@ -357,3 +513,263 @@ class FollowTest(TestCase):
         self.assertIn(post, response.context['page_obj'])
         response = self.authorized_client3.get(reverse('posts:follow_index'))
         self.assertNotIn(post, response.context['page_obj'])
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class TimelineTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='follower')
+        cls.author = User.objects.create_user(username='author')
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_follow_backfills_and_unfollow_prunes_timeline(self):
+        """Подписка дополняет ленту постами автора, отписка очищает её."""
+        post = Post.objects.create(author=self.author, text='Старый пост')
+        self.authorized_client.get(reverse(
+            'posts:profile_follow', kwargs={'username': self.author.username}
+        ))
+        self.assertTrue(
+            TimelineEntry.objects.filter(user=self.user, post=post).exists()
+        )
+        self.authorized_client.get(reverse(
+            'posts:profile_unfollow',
+            kwargs={'username': self.author.username}
+        ))
+        self.assertFalse(
+            TimelineEntry.objects.filter(user=self.user).exists()
+        )
+
+    @override_settings(TIMELINE_MAX_LENGTH=3)
+    def test_timeline_length_is_bounded(self):
+        """Лента подписчика не превышает TIMELINE_MAX_LENGTH."""
+        Follow.objects.create(user=self.user, author=self.author)
+        posts = [
+            Post.objects.create(author=self.author, text=f'Пост {i}')
+            for i in range(5)
+        ]
+        self.assertEqual(
+            list(TimelineEntry.objects.filter(
+                user=self.user
+            ).order_by('-pub_date').values_list('post', flat=True)),
+            [post.pk for post in posts[:1:-1]]
+        )
+
+    @override_settings(TIMELINE_MAX_LENGTH=2)
+    def test_trim_runs_in_batches(self):
+        """Ленты подписчиков обрезаются пакетами по BATCH_SIZE."""
+        followers = [
+            User.objects.create_user(username=f'reader{i}') for i in range(5)
+        ]
+        Follow.objects.bulk_create(
+            Follow(user=follower, author=self.author)
+            for follower in followers
+        )
+        with mock.patch.object(timeline, 'BATCH_SIZE', 2):
+            for i in range(2):
+                Post.objects.create(author=self.author, text=f'Пост {i}')
+            with CaptureQueriesContext(connection) as context:
+                post = Post.objects.create(
+                    author=self.author, text='Новый пост'
+                )
+        deletes = [
+            query for query in context.captured_queries
+            if query['sql'].startswith('DELETE FROM "posts_timelineentry"')
+        ]
+        self.assertEqual(len(deletes), 3)
+        for follower in followers:
+            with self.subTest(follower=follower.username):
+                entries = TimelineEntry.objects.filter(user=follower)
+                self.assertEqual(entries.count(), 2)
+                self.assertTrue(entries.filter(post=post).exists())
+
+    def test_rebuild_timelines_command(self):
+        """Команда rebuild_timelines восстанавливает ленты с нуля."""
+        Follow.objects.create(user=self.user, author=self.author)
+        post = Post.objects.create(author=self.author, text='Пост')
+        TimelineEntry.objects.all().delete()
+        call_command('rebuild_timelines', stdout=StringIO())
+        response = self.authorized_client.get(reverse('posts:follow_index'))
+        self.assertEqual(list(response.context['page_obj']), [post])
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class SimilarPostsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.post = Post.objects.create(author=cls.user, text='Основной')
+        cls.two_tags = Post.objects.create(author=cls.user, text='Два тега')
+        cls.one_tag = Post.objects.create(author=cls.user, text='Один тег')
+        cls.other = Post.objects.create(author=cls.user, text='Другой')
+        cls.two_tags.tags.add('python', 'django')
+        cls.one_tag.tags.add('python')
+        cls.other.tags.add('cooking')
+        cls.post.tags.add('python', 'django')
+
+    def _similar(self):
+        response = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        )
+        return response.context['similar_posts']
+
+    def test_similar_posts_ranked_by_common_tags(self):
+        """Похожие посты упорядочены по числу общих тегов."""
+        self.assertEqual(self._similar(), [self.two_tags, self.one_tag])
+
+    def test_similar_posts_follow_tag_changes(self):
+        """Списки похожих постов обновляются при изменении тегов."""
+        self.other.tags.add('python', 'django')
+        self.two_tags.tags.remove('django')
+        self.assertEqual(
+            self._similar(), [self.other, self.one_tag, self.two_tags]
+        )
+        self.other.tags.clear()
+        self.assertEqual(self._similar(), [self.one_tag, self.two_tags])
+
+    @override_settings(SIMILAR_CANDIDATES_PER_TAG=2)
+    def test_refresh_limits_candidates_per_tag(self):
+        """Правка тегов рассматривает только последние посты тега."""
+        new = Post.objects.create(author=self.user, text='Новый')
+        new.tags.add('python')
+        self.assertEqual(
+            [entry.similar for entry in new.similar_entries.all()],
+            [self.one_tag]
+        )
+
+    def test_rebuild_similar_posts_command(self):
+        """Команда rebuild_similar_posts восстанавливает списки."""
+        SimilarPost.objects.all().delete()
+        call_command('rebuild_similar_posts', stdout=StringIO())
+        self.assertEqual(self._similar(), [self.two_tags, self.one_tag])
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class AsyncPostDetailTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.post = Post.objects.create(author=cls.user, text='Основной')
+        cls.similar = Post.objects.create(author=cls.user, text='Похожий')
+        cls.similar.tags.add('python')
+        cls.post.tags.add('python')
+        Comment.objects.create(
+            post=cls.post, author=cls.user, text='Комментарий'
+        )
+
+    def _request(self, **meta):
+        request = AsyncRequestFactory().get(
+            reverse('posts:post_detail', args=[self.post.pk])
+        )
+        request.META.update(meta)
+        request.user = AnonymousUser()
+        return request
+
+    async def test_async_view_matches_sync_view(self):
+        """Асинхронный вариант отдаёт ту же страницу, что и обычный."""
+        response = await views.post_detail_async(
+            self._request(), self.post.pk
+        )
+        expected = await sync_to_async(self.client.get)(
+            reverse('posts:post_detail', args=[self.post.pk])
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['ETag'], expected['ETag'])
+        self.assertEqual(response.content, expected.content)
+
+    async def test_async_view_not_modified(self):
+        """Совпавший ETag - 304 и у асинхронного варианта."""
+        response = await views.post_detail_async(
+            self._request(), self.post.pk
+        )
+        response = await views.post_detail_async(
+            self._request(HTTP_IF_NONE_MATCH=response['ETag']), self.post.pk
+        )
+        self.assertEqual(response.status_code, 304)
+
+    async def test_async_view_missing_post(self):
+        """Несуществующий пост - 404."""
+        with self.assertRaises(Http404):
+            await views.post_detail_async(self._request(), 10 ** 6)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class SearchTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test',
+            description='Тестовое описание',
+        )
+        cls.cats = Post.objects.create(
+            author=cls.user, group=cls.group,
+            text='Кошки и коты: коты спят, коты едят'
+        )
+        cls.cat = Post.objects.create(
+            author=cls.user, text='Рыжий кот живёт у реки'
+        )
+        cls.dog = Post.objects.create(author=cls.user, text='Собака лает')
+        cls.cat.tags.add('pets')
+
+    def setUp(self):
+        cache.clear()
+
+    def _search(self, **params):
+        response = self.client.get(reverse('posts:search'), params)
+        return response.context['page_obj']
+
+    def test_search_uses_stems_and_ranking(self):
+        """Поиск находит другие словоформы и ранжирует по bm25."""
+        self.assertEqual(
+            list(self._search(q='котами')), [self.cats, self.cat]
+        )
+        self.assertEqual(list(self._search(q='кот река')), [self.cat])
+        self.assertEqual(list(self._search(q='слон')), [])
+
+    def test_search_filters(self):
+        """Результаты фильтруются по группе и тегу."""
+        self.assertEqual(
+            list(self._search(q='кот', group=self.group.slug)), [self.cats]
+        )
+        self.assertEqual(list(self._search(q='кот', tag='pets')), [self.cat])
+        self.assertEqual(list(self._search(q='кот', tag='unknown')), [])
+
+    def test_search_keyset_pagination(self):
+        """Курсор ?after= продолжает выдачу без повторов."""
+        factory = RequestFactory()
+        first = search.search_page('кот', factory.get('/'), per_page=1)
+        self.assertEqual(list(first), [self.cats])
+        self.assertFalse(first.has_previous())
+        self.assertTrue(first.has_next())
+        second = search.search_page(
+            'кот', factory.get('/', {'after': first.next_cursor}), per_page=1
+        )
+        self.assertEqual(list(second), [self.cat])
+        self.assertFalse(second.has_next())
+        self.assertTrue(second.has_previous())
+
+    def test_index_follows_post_changes(self):
+        """Индекс обновляется при изменении и удалении поста."""
+        self.dog.text = 'Собака и кот'
+        self.dog.save()
+        self.assertIn(self.dog, self._search(q='кот'))
+        self.dog.delete()
+        self.assertEqual(len(self._search(q='собака')), 0)
+
+    def test_reindex_search_command(self):
+        """Команда reindex_search пересобирает индекс."""
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {search.TABLE}')
+        self.assertEqual(len(self._search(q='кот')), 0)
+        call_command('reindex_search', stdout=StringIO())
+        self.assertEqual(len(self._search(q='кот')), 2)
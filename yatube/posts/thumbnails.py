@@ -0,0 +1,83 @@
+"""
+Предварительная генерация миниатюр изображений постов.
+
+После сохранения изображения все размеры из THUMBNAIL_GEOMETRIES
+строятся в пуле рабочих процессов, а шаблонный тег {% thumbnail %}
+с теми же параметрами находит готовую миниатюру в хранилище ключей
+sorl-thumbnail и не вызывает Pillow во время запроса.
+
+THUMBNAIL_WORKERS = 0 включает синхронную генерацию (для тестов).
+"""
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import connections, transaction
+
+IMAGE_DIR = 'posts'
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif', '.webp')
+
+_executor = None
+
+
+def _init_worker():
+    django.setup()
+    connections.close_all()
+
+
+def worker_count(workers=None):
+    """Число процессов: workers или THUMBNAIL_WORKERS; 0 - синхронно."""
+    return settings.THUMBNAIL_WORKERS if workers is None else workers
+
+
+def get_executor(workers=None):
+    """
+    Общий для процесса пул генерации миниатюр. При нуле процессов
+    пул не нужен: вызывающий строит миниатюры сам.
+    """
+    global _executor
+    if _executor is None:
+        # spawn, а не fork: дочерние процессы не наследуют открытые
+        # соединения с БД и состояние потоков веб-сервера.
+        _executor = ProcessPoolExecutor(
+            max_workers=worker_count(workers),
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker,
+        )
+    return _executor
+
+
+def generate(name):
+    """Строит миниатюры всех размеров для файла name из хранилища."""
+    from sorl.thumbnail import get_thumbnail
+
+    for geometry, options in settings.THUMBNAIL_GEOMETRIES:
+        get_thumbnail(name, geometry, **options)
+    return name
+
+
+def schedule(name):
+    """
+    Ставит генерацию миниатюр в очередь после фиксации транзакции,
+    в которой сохранён пост.
+    """
+    if not name:
+        return
+    if not worker_count():
+        transaction.on_commit(lambda: generate(name))
+        return
+    transaction.on_commit(lambda: get_executor().submit(generate, name))
+
+
+def existing_images():
+    """Имена изображений, уже загруженных в MEDIA_ROOT/posts/."""
+    if not default_storage.exists(IMAGE_DIR):
+        return []
+    _, files = default_storage.listdir(IMAGE_DIR)
+    return sorted(
+        f'{IMAGE_DIR}/{filename}' for filename in files
+        if os.path.splitext(filename)[1].lower() in IMAGE_EXTENSIONS
+    )
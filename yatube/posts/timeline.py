@@ -0,0 +1,127 @@
+"""
+Материализованные ленты подписок (fan-out on write).
+
+При публикации пост раскладывается в ленты всех подписчиков автора,
+при подписке лента дополняется последними постами автора, при отписке -
+очищается от них. Длина ленты ограничена TIMELINE_MAX_LENGTH.
+"""
+from collections import defaultdict
+
+from django.conf import settings
+from django.db.models import OuterRef, Subquery
+
+from .models import Follow, Post, TimelineEntry
+from .pagination import cursor_pagination
+from .utils import chunked
+
+BATCH_SIZE = 1000
+
+
+def trim(user_ids):
+    """
+    Удаляет из лент пользователей записи сверх TIMELINE_MAX_LENGTH.
+    Пользователи обрабатываются пакетами по BATCH_SIZE, чтобы у автора
+    с большим числом подписчиков не превысить лимит параметров запроса
+    SQLite.
+    """
+    limit = settings.TIMELINE_MAX_LENGTH
+    cutoff = TimelineEntry.objects.filter(
+        user=OuterRef('user')
+    ).order_by('-pub_date').values('pub_date')[limit - 1:limit]
+    for batch in chunked(user_ids, BATCH_SIZE):
+        TimelineEntry.objects.filter(
+            user_id__in=batch,
+            pub_date__lt=Subquery(cutoff)
+        ).delete()
+
+
+def fan_out(post):
+    """Добавляет новый пост в ленты подписчиков его автора."""
+    follower_ids = list(Follow.objects.filter(
+        author_id=post.author_id
+    ).values_list('user_id', flat=True))
+    if not follower_ids:
+        return
+    TimelineEntry.objects.bulk_create(
+        (TimelineEntry(
+            user_id=user_id, post_id=post.pk, pub_date=post.pub_date
+        ) for user_id in follower_ids),
+        BATCH_SIZE,
+        ignore_conflicts=True
+    )
+    trim(follower_ids)
+
+
+def fan_out_many(posts):
+    """Массовый fan_out для пакета постов (импорт)."""
+    followers = defaultdict(list)
+    for author_id, user_id in Follow.objects.filter(
+        author_id__in={post.author_id for post in posts}
+    ).values_list('author_id', 'user_id'):
+        followers[author_id].append(user_id)
+    if not followers:
+        return
+    TimelineEntry.objects.bulk_create(
+        (TimelineEntry(
+            user_id=user_id, post_id=post.pk, pub_date=post.pub_date
+        ) for post in posts for user_id in followers[post.author_id]),
+        BATCH_SIZE,
+        ignore_conflicts=True
+    )
+    trim(set().union(*followers.values()))
+
+
+def backfill(user_id, author_id):
+    """Дополняет ленту пользователя последними постами автора."""
+    posts = Post.objects.filter(author_id=author_id).order_by(
+        '-pub_date'
+    ).values_list('pk', 'pub_date')[:settings.TIMELINE_MAX_LENGTH]
+    TimelineEntry.objects.bulk_create(
+        (TimelineEntry(
+            user_id=user_id, post_id=post_id, pub_date=pub_date
+        ) for post_id, pub_date in posts),
+        BATCH_SIZE,
+        ignore_conflicts=True
+    )
+    trim([user_id])
+
+
+def prune(user_id, author_id):
+    """Убирает из ленты пользователя посты автора."""
+    TimelineEntry.objects.filter(
+        user_id=user_id, post__author_id=author_id
+    ).delete()
+
+
+def rebuild(user_id):
+    """Пересобирает ленту пользователя из его подписок."""
+    TimelineEntry.objects.filter(user_id=user_id).delete()
+    posts = Post.objects.filter(
+        author__following__user_id=user_id
+    ).order_by('-pub_date').values_list(
+        'pk', 'pub_date'
+    )[:settings.TIMELINE_MAX_LENGTH]
+    TimelineEntry.objects.bulk_create(
+        (TimelineEntry(
+            user_id=user_id, post_id=post_id, pub_date=pub_date
+        ) for post_id, pub_date in posts),
+        BATCH_SIZE
+    )
+
+
+def timeline_page(user, request):
+    """
+    Страница ленты подписок: курсорная пагинация по индексу
+    (user, pub_date, post) и догрузка постов страницы по первичному ключу.
+    """
+    page_obj = cursor_pagination(
+        TimelineEntry.objects.filter(user=user), request, id_field='post_id'
+    )
+    post_ids = [entry.post_id for entry in page_obj.object_list]
+    posts = Post.objects.select_related(
+        'author', 'group'
+    ).in_bulk(post_ids)
+    page_obj.object_list = [
+        posts[post_id] for post_id in post_ids if post_id in posts
+    ]
+    return page_obj
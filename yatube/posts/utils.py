@@ -0,0 +1,12 @@
+"""Общие помощники приложения posts."""
+from itertools import islice
+
+
+def chunked(iterable, size):
+    """Разбивает iterable на списки не длиннее size."""
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
@@ -1,85 +1,223 @@
-from django.core.mail import send_mail
-from django.db.models import Count
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import Http404, JsonResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404, render, redirect
 from django.contrib.auth.decorators import login_required
-from django.views.decorators.cache import cache_page
 from taggit.models import Tag
 
+from core.replicas import pins_primary, use_replica
+
+from . import export, outbox, search as post_search, similar, thumbnails
+from .conditional import (
+    aconditional_page, conditional_page, feed_etag, post_etag
+)
+from .counters import get_user_counter
+from .feed_cache import cached_feed
 from .models import Group, Post, User, Follow
-from .forms import PostForm, CommentForm, EmailPostForm
-from .pagination import pagination
+from .forms import PostForm, CommentForm, EmailPostForm, SearchForm
+from .pagination import cursor_page, decode_cursor, pagination
+from .timeline import timeline_page
 
 
-@cache_page(60)
+@use_replica
 def index(request, tag_slug=None):
     """Отображение главной страницы, если передан tag_slug,
     отображается список постов с этим тегом."""
-    posts = Post.objects.all()
+    posts = Post.objects.select_related('author', 'group')
     tag = None
+    scope = 'all'
     if tag_slug:
-        tag = get_object_or_404(Tag, slug=tag_slug)
+        tag = get_object_or_404(
+            Tag.objects.select_related('counter'), slug=tag_slug
+        )
         posts = posts.filter(tags__in=[tag])
-    page_obj = pagination(posts, request)
-    context = {
-        'page_obj': page_obj,
-        'tag': tag
-    }
-    return render(request, 'posts/index.html', context)
+        scope = f'tag:{tag.pk}'
+
+    def build():
+        # Главная - самая длинная лента: курсор вместо COUNT и OFFSET.
+        page_obj = pagination(posts, request, keyset=True)
+        context = {
+            'page_obj': page_obj,
+            'tag': tag
+        }
+        return render(request, 'posts/index.html', context)
+    return conditional_page(
+        request, feed_etag(request, scope),
+        lambda: cached_feed(request, scope, build)
+    )
 
 
+@use_replica
 def group_posts(request, slug):
     """Отображение страницы сообщества."""
     group = get_object_or_404(Group, slug=slug)
-    posts = group.posts.all()
-    page_obj = pagination(posts, request)
-    context = {
-        'group': group,
-        'page_obj': page_obj,
-    }
-    return render(request, 'posts/group_list.html', context)
+
+    def build():
+        posts = group.posts.select_related('author', 'group')
+        page_obj = pagination(posts, request)
+        context = {
+            'group': group,
+            'page_obj': page_obj,
+        }
+        return render(request, 'posts/group_list.html', context)
+    scope = f'group:{group.pk}'
+    return conditional_page(
+        request, feed_etag(request, scope),
+        lambda: cached_feed(request, scope, build)
+    )
 
 
+@use_replica
 def profile(request, username):
     """Отображение страницы профиля автора."""
-    author = get_object_or_404(User, username=username)
-    posts = author.posts.all()
-    page_obj = pagination(posts, request)
+    author = get_object_or_404(
+        User.objects.select_related('counters'), username=username
+    )
+
+    def build():
+        posts = author.posts.select_related('author', 'group')
+        page_obj = pagination(posts, request)
+        context = {
+            'author': author,
+            'counters': get_user_counter(author),
+            'page_obj': page_obj,
+        }
+        if request.user.is_authenticated and Follow.objects.filter(
+                author=author, user=request.user
+        ).exists():
+            context['following'] = True
+        return render(request, 'posts/profile.html', context)
+    scope = f'author:{author.pk}'
+    return conditional_page(
+        request, feed_etag(request, scope),
+        lambda: cached_feed(request, scope, build)
+    )
+
+
+def search(request):
+    """Полнотекстовый поиск по постам с фильтрами по группе и тегу."""
+    form = SearchForm(request.GET or None)
+    page_obj = None
+    tag = None
+    if form.is_valid():
+        if form.cleaned_data['tag']:
+            tag = Tag.objects.filter(slug=form.cleaned_data['tag']).first()
+        if form.cleaned_data['tag'] and tag is None:
+            page_obj = post_search.SearchPage([], None, False)
+        else:
+            page_obj = post_search.search_page(
+                form.cleaned_data['q'],
+                request,
+                group=form.cleaned_data['group'],
+                tag=tag
+            )
+    query = request.GET.copy()
+    query.pop('after', None)
     context = {
-        'author': author,
+        'form': form,
         'page_obj': page_obj,
+        'query_string': query.urlencode(),
     }
-    if request.user.is_authenticated and Follow.objects.filter(
-            author=author, user=request.user
-    ).exists():
-        context['following'] = True
-    return render(request, 'posts/profile.html', context)
+    return render(request, 'posts/search.html', context)
 
 
+@use_replica
 def post_detail(request, post_id):
     """Отображение страницы поста, списка похожих
     статей (по тегам), добавление комментария."""
-    post = get_object_or_404(Post, id=post_id)
-    form = CommentForm()
-    comments = post.comments.all()
-    counter = post.author.posts.count()
-    post_tags_ids = post.tags.values_list('id', flat=True)
-    similar_posts = Post.objects.filter(
-        tags__in=post_tags_ids
-    ).exclude(id=post.id)
-    similar_posts = similar_posts.annotate(
-        same_tags=Count('tags')
-    ).order_by('-same_tags', '-pub_date')[:3]
+    return conditional_page(
+        request, post_etag(request, post_id),
+        lambda: render_post_detail(request, post_id)
+    )
+
+
+def render_post_detail(request, post_id):
+    post = get_object_or_404(
+        Post.objects.select_related('author__counters', 'group'),
+        id=post_id
+    )
+    comments = comments_page(post)
+    counter = get_user_counter(post.author)
+    similar_posts = similar.similar_posts(post)
+    return render(
+        request,
+        'posts/post_detail.html',
+        post_detail_context(post, comments, counter, similar_posts)
+    )
+
+
+def comments_page(post, after=None):
+    """
+    Страница комментариев поста, новые сверху. На странице поста
+    выводится первая страница, следующие подгружает post_comments.
+    """
+    return cursor_page(
+        post.comments.select_related('author'),
+        after=after,
+        per_page=settings.NUM_COMMENTS_PER_PAGE,
+        date_field='created',
+    )
+
+
+@use_replica
+def post_comments(request, post_id):
+    """Фрагмент со следующей страницей комментариев («Показать ещё»)."""
+    post = get_object_or_404(Post.objects.only('pk'), id=post_id)
     context = {
         'post': post,
-        'form': form,
+        'comments': comments_page(
+            post, decode_cursor(request.GET.get('after'))
+        ),
+    }
+    return render(request, 'posts/includes/comments.html', context)
+
+
+def post_detail_context(post, comments, counter, similar_posts):
+    return {
+        'post': post,
+        'form': CommentForm(),
         'comments': comments,
-        'counter': counter,
+        'counter': counter.posts_count,
         'similar_posts': similar_posts
     }
-    return render(request, 'posts/post_detail.html', context)
+
+
+@use_replica
+async def post_detail_async(request, post_id):
+    """
+    Асинхронный вариант post_detail для ASGI: после загрузки поста
+    комментарии, похожие посты и счётчик автора запрашиваются
+    одновременно, шаблон рендерится в потоке.
+    """
+    etag = await sync_to_async(post_etag)(request, post_id)
+    return await aconditional_page(
+        request, etag, lambda: arender_post_detail(request, post_id)
+    )
+
+
+async def arender_post_detail(request, post_id):
+    try:
+        post = await Post.objects.select_related(
+            'author__counters', 'group'
+        ).aget(id=post_id)
+    except Post.DoesNotExist:
+        raise Http404
+    comments, similar_posts, counter = await asyncio.gather(
+        sync_to_async(comments_page)(post),
+        similar.asimilar_posts(post),
+        sync_to_async(get_user_counter)(post.author),
+    )
+    return await sync_to_async(render)(
+        request,
+        'posts/post_detail.html',
+        post_detail_context(post, comments, counter, similar_posts)
+    )
 
 
 @login_required
+@pins_primary
 def post_create(request):
     """
     Отображение страницы создания поста -
@@ -93,11 +231,13 @@ def post_create(request):
         new_post = form.save(commit=False)
         new_post.author = request.user
         new_post.save()
+        thumbnails.schedule(new_post.image.name)
         return redirect('posts:profile', request.user)
     return render(request, 'posts/post_create.html', {'form': form})
 
 
 @login_required
+@pins_primary
 def post_edit(request, post_id):
     """
     Отображение страницы редактирования поста -
@@ -113,6 +253,8 @@ def post_edit(request, post_id):
     )
     if form.is_valid():
         form.save()
+        if 'image' in form.changed_data:
+            thumbnails.schedule(post.image.name)
         return redirect('posts:post_detail', post_id)
     return render(
         request,
@@ -122,11 +264,14 @@ def post_edit(request, post_id):
 
 
 @login_required
+@pins_primary
 def add_comment(request, post_id):
     """
     Добавление комментария к посту -
     только для зарегистрированных пользователей.
+    AJAX-запросу возвращается только фрагмент нового комментария.
     """
+    ajax = request.headers.get('X-Requested-With') == 'XMLHttpRequest'
     post = get_object_or_404(Post, id=post_id)
     form = CommentForm(request.POST or None)
     if form.is_valid():
@@ -134,17 +279,24 @@ def add_comment(request, post_id):
         comment.author = request.user
         comment.post = post
         comment.save()
+        if ajax:
+            return render(
+                request, 'posts/includes/comment.html',
+                {'comment': comment}, status=201
+            )
+    elif ajax:
+        return JsonResponse({'errors': form.errors}, status=400)
     return redirect('posts:post_detail', post_id=post_id)
 
 
 @login_required
+@use_replica
 def follow_index(request):
     """
     Отображение страницы с постами автора, на которого подписан пользователь -
     только для зарегистрированных пользователей.
     """
-    posts = Post.objects.filter(author__following__user=request.user)
-    page_obj = pagination(posts, request)
+    page_obj = timeline_page(request.user, request)
     context = {
         'page_obj': page_obj,
     }
@@ -152,6 +304,7 @@ def follow_index(request):
 
 
 @login_required
+@pins_primary
 def profile_follow(request, username):
     """Подписаться на автора."""
     following = get_object_or_404(User, username=username)
@@ -164,6 +317,7 @@ def profile_follow(request, username):
 
 
 @login_required
+@pins_primary
 def profile_unfollow(request, username):
     """Отписаться от автора."""
     get_object_or_404(
@@ -172,8 +326,43 @@ def profile_unfollow(request, username):
     return redirect('posts:profile', request.user)
 
 
+def export_response(request, posts, filename):
+    """Потоковый ответ NDJSON, сжатый gzip, если клиент его принимает."""
+    stream = export.ndjson_lines(export.iter_posts(posts))
+    response = StreamingHttpResponse(
+        content_type='application/x-ndjson; charset=utf-8'
+    )
+    if 'gzip' in request.headers.get('Accept-Encoding', ''):
+        stream = export.gzip_stream(stream)
+        response['Content-Encoding'] = 'gzip'
+    response['Vary'] = 'Accept-Encoding'
+    response['Content-Disposition'] = (
+        f'attachment; filename="{filename}.ndjson"'
+    )
+    response.streaming_content = stream
+    return response
+
+
+@login_required
+def profile_export(request, username):
+    """Выгрузка всех постов автора в NDJSON."""
+    author = get_object_or_404(User, username=username)
+    return export_response(
+        request, export.export_queryset(author=author), author.username
+    )
+
+
+@login_required
+def group_export(request, slug):
+    """Выгрузка всех постов сообщества в NDJSON."""
+    group = get_object_or_404(Group, slug=slug)
+    return export_response(
+        request, export.export_queryset(group=group), group.slug
+    )
+
+
 def post_share(request, post_id):
-    """Отправка поста на почту."""
+    """Отправка поста на почту: письмо ставится в очередь outbox."""
     post = get_object_or_404(Post, id=post_id)
     sent=False
     if request.method == 'POST':
@@ -183,7 +372,7 @@ def post_share(request, post_id):
             post_url = request.build_absolute_uri(post.get_absolut_url())
             subject = f"{cd['name']} ({cd['email']}) рекомендует Вам прочесть {post}"
             message = f"Прочитайте \"{post}\" по ссылке {post_url}\n\n{cd['comments']}"
-            send_mail(subject, message, cd['email'], [cd['to']])
+            outbox.enqueue(subject, message, cd['email'], cd['to'])
             sent = True
     else:
         form = EmailPostForm()
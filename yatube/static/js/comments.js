@@ -0,0 +1,43 @@
+// Подгрузка комментариев («Показать ещё») и отправка комментария
+// без перезагрузки страницы поста.
+(function () {
+  var comments = document.getElementById('comments');
+  if (!comments) {
+    return;
+  }
+  var headers = {'X-Requested-With': 'XMLHttpRequest'};
+
+  comments.addEventListener('click', function (event) {
+    var link = event.target.closest('[data-load-more]');
+    if (!link) {
+      return;
+    }
+    event.preventDefault();
+    fetch(link.href, {headers: headers})
+      .then(function (response) { return response.text(); })
+      .then(function (html) { link.outerHTML = html; });
+  });
+
+  var form = document.querySelector('[data-comment-form]');
+  if (!form) {
+    return;
+  }
+  var errors = form.querySelector('[data-comment-errors]');
+  form.addEventListener('submit', function (event) {
+    event.preventDefault();
+    fetch(form.action, {
+      method: 'POST', body: new FormData(form), headers: headers
+    }).then(function (response) {
+      if (response.status === 201) {
+        return response.text().then(function (html) {
+          comments.insertAdjacentHTML('afterbegin', html);
+          errors.textContent = '';
+          form.reset();
+        });
+      }
+      return response.json().then(function (data) {
+        errors.textContent = Object.values(data.errors).flat().join(' ');
+      });
+    });
+  });
+})();
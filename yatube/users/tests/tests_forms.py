@@ -1,11 +1,14 @@
 from django.contrib.auth import get_user_model
-from django.test import Client, TestCase
+from django.test import Client, TestCase, override_settings
 from django.urls import reverse
 
+from posts.benchmarks import LOCMEM_CACHES
+
 
 User = get_user_model()
 
 
+@override_settings(CACHES=LOCMEM_CACHES)
 class UsersCreateFormTests(TestCase):
     def setUp(self):
         self.guest_client = Client()
@@ -32,6 +32,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -51,7 +52,7 @@ ROOT_URLCONF = 'yatube.urls'
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'core.metrics.TimedDjangoTemplates',
         'DIRS': [TEMPLATES_DIR],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -68,6 +69,9 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'yatube.wsgi.application'
 
+# Асинхронные варианты представлений; включается точкой входа asgi.py.
+ASYNC_VIEWS = os.environ.get('YATUBE_ASYNC_VIEWS') == '1'
+
 
 DATABASES = {
     'default': {
@@ -76,6 +80,46 @@ DATABASES = {
     }
 }
 
+# Реплики только для чтения (core.replicas): пути к копиям базы через
+# запятую. В тестах реплики зеркалируют основную базу.
+DATABASE_REPLICAS = []
+for number, path in enumerate(filter(None, os.environ.get(
+        'DATABASE_REPLICA_PATHS', '').split(',')), 1):
+    DATABASES[f'replica{number}'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': path,
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(f'replica{number}')
+
+DATABASE_ROUTERS = ['core.replicas.ReplicaRouter']
+
+# Сколько секунд после изменения браузер читает из основной базы.
+REPLICA_STICKY_SECONDS = 10
+
+# Профиль базы данных. 'production' включает постоянные соединения с
+# проверкой перед повторным использованием и настройки SQLite из
+# SQLITE_PRAGMAS, которые core.db применяет к каждому новому соединению.
+DATABASE_PROFILE = os.environ.get('YATUBE_DB_PROFILE', 'development')
+SQLITE_PRODUCTION_PRAGMAS = {
+    # Читатели не ждут писателя, писатель не ждёт читателей.
+    'journal_mode': 'WAL',
+    # В режиме WAL не нарушает целостность базы при сбое.
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,
+    # Отрицательное значение - размер в КиБ: 64 МиБ.
+    'cache_size': -64 * 1024,
+    # Ждать блокировку до 5 с вместо ошибки "database is locked".
+    'busy_timeout': 5000,
+    'temp_store': 'MEMORY',
+}
+SQLITE_PRAGMAS = {}
+if DATABASE_PROFILE == 'production':
+    SQLITE_PRAGMAS = SQLITE_PRODUCTION_PRAGMAS
+    for database in DATABASES.values():
+        database['CONN_MAX_AGE'] = 600
+        database['CONN_HEALTH_CHECKS'] = True
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -117,10 +161,58 @@ EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
 NUM_POST_PER_PAGE = 10
 
+NUM_COMMENTS_PER_PAGE = 20
+
+TIMELINE_MAX_LENGTH = 1000
+
+SIMILAR_POSTS_COUNT = 3
+# Сколько последних постов каждого тега рассматривает обновление
+# похожих постов при правке тегов (posts.similar.refresh).
+SIMILAR_CANDIDATES_PER_TAG = 500
+
+POST_CARD_CACHE_TIMEOUT = 60 * 60 * 24
+
+FEED_CACHE_TIMEOUT = 60 * 60 * 6
+
+# Размеры миниатюр, которые генерируются сразу после загрузки
+# изображения. Параметры должны совпадать с тегами {% thumbnail %}
+# в шаблонах, иначе миниатюра будет построена заново при рендеринге.
+THUMBNAIL_GEOMETRIES = [
+    ('960x339', {'crop': 'center', 'upscale': True}),
+]
+
+# Число процессов генерации миниатюр; 0 - синхронно в текущем процессе.
+THUMBNAIL_WORKERS = int(os.environ.get('THUMBNAIL_WORKERS', 2))
+
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
-CASHES = {
+CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
+        'BACKEND': 'core.cache.TwoTierCache',
+        'OPTIONS': {
+            'SHARED': 'shared',
+            'LOCAL_PREFIXES': ('post-card', 'feed-page'),
+            'LOCAL_MAX_ENTRIES': 2000,
+            'LOCAL_TIMEOUT': 300,
+        },
+    },
+    # incr счётчиков поколений должен быть атомарным: для файлового кеша
+    # TwoTierCache берёт блокировку файла в его каталоге, для базы данных
+    # нужен INCR_LOCK_FILE в OPTIONS default (см. core.cache).
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache'),
+        'TIMEOUT': 60 * 60 * 24,
+        'OPTIONS': {
+            'MAX_ENTRIES': 100000,
+        },
+    },
 }
+
+# Снимки метрик процессов (core.metrics), общие для всех воркеров.
+METRICS_DIR = os.environ.get('METRICS_DIR', os.path.join(BASE_DIR, 'metrics'))
+METRICS_FLUSH_INTERVAL = 5
+
+# Токен для /internal/metrics/ и /internal/cache-stats/ (заголовок
+# Authorization: Bearer <токен>); пустой - только для сотрудников.
+INTERNAL_TOKEN = os.environ.get('INTERNAL_TOKEN', '')